@@ -0,0 +1,101 @@
+import os
+import re
+import hashlib
+import logging
+import json
+import time
+import threading
+from app.config import ONBELLEK_MAKS_KAYIT
+from app.storage import ICERIK_ADI_DESENI
+from app.metrics import metrikler
+from app.shared_state import durum
+
+logger = logging.getLogger(__name__)
+
+# YouTube video kimliğini farklı URL biçimlerinden yakalamak için
+YOUTUBE_ID_DESENI = re.compile(r'(?:v=|youtu\.be/|shorts/|embed/|live/)([A-Za-z0-9_-]{11})')
+# Okunan kayıtların son kullanım zamanları en fazla bu aralıkla (ve her yazmada) toplu olarak diske yazılır (sn)
+ERISIM_YAZMA_ARALIGI = 30
+
+
+class SonucOnbellegi:
+    """
+    Araç sonuçlarını kaynak parmak izine göre saklayan LRU önbellek. Kayıtlar paylaşılan SQLite deposunda
+    tutulur; aynı makinedeki tüm işçi süreçleri aynı önbelleği görür.
+
+    Okumalar yazma yapmaz: isabetlerin son kullanım zamanı bellekte toplanır ve ERISIM_YAZMA_ARALIGI'nda
+    bir, ayrıca her koy() çağrısında tahliyeden önce tek işlemde yazılır. Metotlar senkrondur, thread'de
+    çalıştırın (bkz. app/summary_tiers.py).
+    """
+
+    def __init__(self, maks_kayit: int = ONBELLEK_MAKS_KAYIT):
+        self.maks_kayit = maks_kayit
+        self._erisimler = {}        # anahtar -> henüz yazılmamış son kullanım zamanı
+        self._kilit = threading.Lock()
+        self._son_yazma = time.time()
+
+    def al(self, anahtar: str):
+        satir = durum.calistir("SELECT deger FROM onbellek WHERE anahtar = ?", (anahtar,)).fetchone()
+        if satir is None:
+            return None
+        # Son kullanım zamanı (LRU sırası) toplu yazılmak üzere not edilir
+        with self._kilit:
+            self._erisimler[anahtar] = time.time()
+            yaz = time.time() - self._son_yazma >= ERISIM_YAZMA_ARALIGI
+        if yaz:
+            with durum.islem() as baglanti:
+                self._erisimleri_yaz(baglanti)
+        return json.loads(satir[0])
+
+    def _erisimleri_yaz(self, baglanti):
+        with self._kilit:
+            bekleyen, self._erisimler = self._erisimler, {}
+            self._son_yazma = time.time()
+        baglanti.executemany("UPDATE onbellek SET erisim = MAX(erisim, ?) WHERE anahtar = ?",
+                             [(zaman, anahtar) for anahtar, zaman in bekleyen.items()])
+
+    def koy(self, anahtar: str, deger: dict):
+        with durum.islem() as baglanti:
+            self._erisimleri_yaz(baglanti)
+            baglanti.execute("INSERT OR REPLACE INTO onbellek (anahtar, deger, erisim) VALUES (?, ?, ?)",
+                             (anahtar, json.dumps(deger, ensure_ascii=False), time.time()))
+            silinen = baglanti.execute(
+                "DELETE FROM onbellek WHERE anahtar IN "
+                "(SELECT anahtar FROM onbellek ORDER BY erisim DESC LIMIT -1 OFFSET ?)", (self.maks_kayit,)).rowcount
+        if silinen:
+            logger.debug("Önbellekten en eski %s kayıt çıkarıldı", silinen)
+
+    def kayit_sayisi(self) -> int:
+        return durum.calistir("SELECT COUNT(*) FROM onbellek").fetchone()[0]
+
+
+# Tüm araçların paylaştığı tek önbellek örneği
+onbellek = SonucOnbellegi()
+metrikler.olcer_ekle("edumcp_onbellek_kayit_sayisi", "Sonuç önbelleğindeki kayıt sayısı", onbellek.kayit_sayisi)
+
+
+def dosya_parmak_izi(dosya_yolu: str) -> str:
+    """Dosya içeriğinin SHA-256 özetini parça parça okuyarak hesaplar (senkron, thread'de çalıştırın)."""
+    # İçerik adresli depodaki dosyaların adı zaten içerik özetidir, yeniden okumaya gerek yok
+    eslesme = ICERIK_ADI_DESENI.match(os.path.basename(dosya_yolu))
+    if eslesme:
+        return f"sha256:{eslesme.group(1)}"
+
+    ozet = hashlib.sha256()
+    with open(dosya_yolu, "rb") as f:
+        for parca in iter(lambda: f.read(1024 * 1024), b""):
+            ozet.update(parca)
+    return f"sha256:{ozet.hexdigest()}"
+
+
+def video_url_anahtari(video_url: str) -> str:
+    """Aynı videoyu gösteren farklı URL biçimlerini tek bir anahtara indirger."""
+    eslesme = YOUTUBE_ID_DESENI.search(video_url)
+    if eslesme:
+        return f"yt:{eslesme.group(1)}"
+    return f"url:{video_url.strip()}"
+
+
+def onbellek_anahtari(arac: str, kaynak: str, katman: str, hedef_dil: str) -> str:
+    """Araç, kaynak, özet katmanı ve hedef dilden önbellek anahtarı üretir."""
+    return f"{arac}|{kaynak}|{katman}|{hedef_dil.strip().lower()}"
@@ -0,0 +1,224 @@
+import asyncio
+import logging
+import threading
+import contextvars
+import anyio
+from fastmcp.exceptions import ToolError
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from app.metrics import metrikler, Sayac
+
+logger = logging.getLogger(__name__)
+
+# Araç çağrısı sürerken istemcinin HTTP bağlantısının kontrol edilme aralığı (sn)
+BAGLANTI_KONTROL_ARALIGI = 1
+
+_belirtec = contextvars.ContextVar("iptal_belirteci", default=None)
+
+iptal_edilen_isler = metrikler.kaydet(Sayac(
+    "edumcp_iptal_edilen_is_toplam", "Sonucunu bekleyen istemci kalmadığı için durdurulan işler", ("arac", "kapsam")))
+birakilan_threadler = metrikler.kaydet(Sayac(
+    "edumcp_birakilan_thread_toplam", "Çağıran iptal edildiği için sonucu beklenmeden bırakılan worker thread'ler", ("fonksiyon",)))
+
+# Çağıranı vazgeçtiği halde hâlâ çalışan thread'ler. Bırakılan thread anyio'nun thread sınırından düşer ama
+# çağrı kendi zaman aşımına ya da ağ vazgeçene kadar thread'i, bağlantıyı ve kotayı tutmaya devam eder.
+_sahipsiz = {"sayi": 0}
+_sahipsiz_kilit = threading.Lock()
+metrikler.olcer_ekle("edumcp_sahipsiz_thread", "Çağıranı vazgeçtiği halde hâlâ çalışan worker thread sayısı",
+                     lambda: _sahipsiz["sayi"])
+
+
+class IptalEdildi(Exception):
+    """Çağıran iptal edildiği için thread içinde durdurulan iş."""
+
+
+class IptalBelirteci:
+    """Async taraftaki iptali worker thread'e (ve onun açtığı alt thread'lere) ileten işaret."""
+
+    def __init__(self):
+        self._olay = threading.Event()
+
+    def iptal_et(self):
+        self._olay.set()
+
+    @property
+    def iptal_edildi(self) -> bool:
+        return self._olay.is_set()
+
+
+def iptal_edildi_mi() -> bool:
+    """Bu thread'i başlatan çağrı iptal edildi mi (thread_calistir dışında her zaman False)."""
+    belirtec = _belirtec.get()
+    return belirtec is not None and belirtec.iptal_edildi
+
+
+def iptal_kancasi(hata_sinifi=IptalEdildi):
+    """
+    Bu thread'in iptal belirtecine bağlı, iptalde hata_sinifi yükselten kanca (yt-dlp progress_hooks için).
+    Belirteç burada yakalanır; yt-dlp'nin parça indirme thread'leri bağlam değişkenlerini görmese de kanca
+    iptali fark eder.
+    """
+    belirtec = _belirtec.get()
+
+    def kanca(_durum=None):
+        if belirtec is not None and belirtec.iptal_edildi:
+            raise hata_sinifi("İş iptal edildi")
+    return kanca
+
+
+class ThreadSiniri:
+    """
+    Bir grup engelleyici çağrının (ör. zaman aşımı verilemeyen Gemini dosya çağrıları) aynı anda tuttuğu
+    thread sayısını, çağıranı vazgeçmiş olanlar dahil sınırlar. anyio'nun sınırlayıcısı bırakılan thread'in
+    payını hemen geri verir; bu sınırda pay ancak thread gerçekten bitince geri alınır, asılı çağrılar
+    sınırı doldurunca yenileri thread açmak yerine sırada bekler.
+    """
+
+    def __init__(self, kapasite: int):
+        self.kapasite = kapasite
+        self._semafor = asyncio.Semaphore(kapasite)
+        self.kullanilan = 0
+
+    async def al(self):
+        await self._semafor.acquire()
+        self.kullanilan += 1
+
+    def birak(self):
+        self.kullanilan -= 1
+        self._semafor.release()
+
+
+def _loopta(dongu, fonksiyon, *args):
+    try:
+        dongu.call_soon_threadsafe(fonksiyon, *args)
+    except RuntimeError:
+        # Kapanışta döngü thread'den önce kapanmış olabilir
+        pass
+
+
+async def thread_calistir(fonksiyon, *args, iptal_edilince=None, sinir: ThreadSiniri = None):
+    """
+    `fonksiyon(*args)`'ı worker thread'de çalıştırır. Çağıran iptal edilirse thread'in bitmesi beklenmez:
+    thread'e iptal işareti verilir (iptal_kancasi() kullanan indirmeler kendiliğinden durur) ve çağıran
+    hemen serbest kalır. Thread yine de bir değer üretirse (ör. iptalden hemen sonra tamamlanan yükleme)
+    değer event loop'ta iptal_edilince(deger) ile serbest bırakılır.
+
+    Bırakmak kaynakları serbest bırakmaz: çağrı kendi zaman aşımına kadar thread'i ve bağlantıyı tutar. Bu
+    yüzden fonksiyona mümkünse kalan süreyle sınırlı bir zaman aşımı verilmelidir (bkz.
+    deadlines.cagri_zaman_asimi); verilemiyorsa `sinir` ile asılı çağrıların tutabileceği thread sayısı
+    sınırlanır. Bırakılıp hâlâ çalışan thread'ler edumcp_sahipsiz_thread ölçeriyle izlenir.
+    """
+    dongu = asyncio.get_running_loop()
+    belirtec = IptalBelirteci()
+    kilit = threading.Lock()
+    uretilen = []
+    durum = {"basladi": False, "bitti": False, "sahipsiz": False}
+
+    def calis():
+        with kilit:
+            if belirtec.iptal_edildi:
+                # Çağıran thread başlamadan vazgeçti; sınır payı iptal tarafında geri verildi
+                return None
+            durum["basladi"] = True
+        try:
+            deger = fonksiyon(*args)
+        finally:
+            with kilit:
+                durum["bitti"] = True
+                sahipsiz = durum["sahipsiz"]
+            if sahipsiz:
+                with _sahipsiz_kilit:
+                    _sahipsiz["sayi"] -= 1
+            if sinir is not None:
+                _loopta(dongu, sinir.birak)
+        with kilit:
+            if not belirtec.iptal_edildi:
+                uretilen.append(deger)
+                return deger
+        if iptal_edilince is not None:
+            _loopta(dongu, iptal_edilince, deger)
+        return deger
+
+    if sinir is not None:
+        await sinir.al()
+    jeton = _belirtec.set(belirtec)
+    try:
+        return await anyio.to_thread.run_sync(calis, abandon_on_cancel=True)
+    except asyncio.CancelledError:
+        with kilit:
+            belirtec.iptal_et()
+            basladi, calisiyor = durum["basladi"], durum["basladi"] and not durum["bitti"]
+            durum["sahipsiz"] = calisiyor
+        if calisiyor:
+            with _sahipsiz_kilit:
+                _sahipsiz["sayi"] += 1
+            # functools.partial ile sarılan çağrılar asıl fonksiyonun adıyla sayılır
+            birakilan_threadler.artir(getattr(getattr(fonksiyon, "func", fonksiyon), "__name__", "bilinmiyor"))
+        elif not basladi and sinir is not None:
+            sinir.birak()
+        if uretilen and iptal_edilince is not None:
+            iptal_edilince(uretilen[0])
+        raise
+    finally:
+        _belirtec.reset(jeton)
+
+
+def _yalnizca_kapali_akis(hata: BaseException) -> bool:
+    alt_hatalar = getattr(hata, "exceptions", None)
+    if alt_hatalar is not None:
+        return all(_yalnizca_kapali_akis(alt) for alt in alt_hatalar)
+    return isinstance(hata, anyio.ClosedResourceError)
+
+
+class KopukYanitFiltresi(logging.Filter):
+    """
+    Durumsuz HTTP'de bağlantısı kopan isteğin hata yanıtı kapalı akışa yazılamaz ve MCP kütüphanesi bunu
+    traceback'li "Stateless session crashed" hatası olarak loglar. Yalnızca kapalı akıştan kaynaklanan bu
+    kayıtlar tek satırlık INFO kaydına indirilir; diğer oturum hataları olduğu gibi kalır.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        hata = record.exc_info[1] if record.exc_info else None
+        if hata is not None and _yalnizca_kapali_akis(hata):
+            record.levelno, record.levelname = logging.INFO, "INFO"
+            record.msg, record.args = "Kopmuş bağlantının yanıtı atıldı (durumsuz MCP oturumu)", ()
+            record.exc_info, record.exc_text = None, None
+        return True
+
+
+logging.getLogger("mcp.server.streamable_http_manager").addFilter(KopukYanitFiltresi())
+
+
+class BaglantiKopunca(Middleware):
+    """
+    İstemcinin HTTP bağlantısı koptuğunda (ya da oturum kapandığında) sürmekte olan araç çağrısını iptal eder.
+
+    MCP iptal bildirimi (notifications/cancelled) çağrıyı zaten iptal eder; bağlantısı bildirim göndermeden
+    kopan istemcinin çağrısı ise bu ara katman olmadan sonuna kadar yürür. İptal tek uçuş görevine,
+    oradan indirme, yükleme, işleme bekleme ve üretim aşamalarına iletilir.
+    """
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        try:
+            from fastmcp.server.dependencies import get_http_request
+            istek = get_http_request()
+        except RuntimeError:
+            # stdio: istemci ayrıldığında süreç kapanır
+            return await call_next(context)
+
+        with anyio.CancelScope() as kapsam:
+            async def izle():
+                while not await istek.is_disconnected():
+                    await anyio.sleep(BAGLANTI_KONTROL_ARALIGI)
+                kapsam.cancel()
+
+            async with anyio.create_task_group() as grup:
+                grup.start_soon(izle)
+                try:
+                    return await call_next(context)
+                finally:
+                    grup.cancel_scope.cancel()
+        # Buraya yalnızca izleyici kapsamı iptal ettiğinde gelinir. İstek bir hata yanıtıyla tamamlanır:
+        # iptal istisnası yükseltilirse MCP katmanı isteği yanıtsız bırakır ve oturumun süren istekler
+        # listesinden hiç silinmez. Yanıt kapalı akışa yazılamadığı için taşıma katmanında düşer.
+        logger.info("İstemci bağlantısı koptu, araç çağrısı iptal edildi: %s", context.message.name)
+        raise ToolError("istemci bağlantısı koptu")
@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import contextvars
+import anyio
+from app.config import KONTROL_NOKTASI_SURESI
+from app.metrics import metrikler, Sayac
+from app.shared_state import durum
+from app.reaper import uzak_dosya_temizleyici
+
+logger = logging.getLogger(__name__)
+
+_aktif = contextvars.ContextVar("kontrol_noktasi", default=None)
+
+devam_edilen_asamalar = metrikler.kaydet(Sayac(
+    "edumcp_kontrol_noktasi_devam_toplam", "Kontrol noktasından devam edilerek yeniden yapılmayan aşamalar", ("arac", "asama")))
+
+
+def _uzak_dosya(veri: dict):
+    return (veri.get("yukleme") or {}).get("uzak_dosya")
+
+
+class KontrolNoktasi:
+    """
+    Bir işin tamamlanan aşama çıktıları (ör. {"yukleme": {"uzak_dosya": ...}, "parcalar": {...}}).
+
+    Her kayıt paylaşılan durum deposuna hemen yazılır. İş yeniden başladığında tamamlanmış aşamalar
+    atlanır. Bu yeniden başlama sunucu ya da işçi yeniden başlatıldıktan sonra olabilir, istemcinin aynı
+    çağrıyı tekrarlamasıyla da olabilir.
+    """
+
+    def __init__(self, anahtar: str, arac: str, veri: dict):
+        self.anahtar = anahtar
+        self.arac = arac
+        self.veri = veri
+        self._kilit = asyncio.Lock()
+
+    def _yaz(self, metin: str):
+        durum.calistir("INSERT OR REPLACE INTO kontrol_noktalari (anahtar, arac, veri, sahip, zaman) VALUES (?, ?, ?, ?, ?)",
+                       (self.anahtar, self.arac, metin, os.getpid(), time.time()))
+
+    async def kaydet(self, asama: str, deger):
+        self.veri[asama] = deger
+        # Eşzamanlı parça kayıtları sırayla yazılır; yazma iptalde de tamamlanır ki kayıt ile uzak dosya tutarlı kalsın
+        with anyio.CancelScope(shield=True):
+            async with self._kilit:
+                await anyio.to_thread.run_sync(self._yaz, json.dumps(self.veri, ensure_ascii=False))
+
+
+def asama_ciktisi(asama: str):
+    """Yürüyen işin bu aşama için kaydettiği çıktı; kontrol noktası yoksa ya da aşama tamamlanmadıysa None."""
+    kayit = _aktif.get()
+    if kayit is None or kayit.veri.get(asama) is None:
+        return None
+    devam_edilen_asamalar.artir(kayit.arac, asama)
+    return kayit.veri[asama]
+
+
+async def asama_kaydet(asama: str, deger):
+    """Tamamlanan aşamanın çıktısını yürüyen işin kontrol noktasına yazar (kontrol noktası yoksa bir şey yapmaz)."""
+    kayit = _aktif.get()
+    if kayit is not None:
+        await kayit.kaydet(asama, deger)
+
+
+def dosyayi_tutuyor(dosya_adi: str) -> bool:
+    """Uzak dosya yürüyen işin kontrol noktasında mı (iş bitene ya da kayıt eskiyene kadar silinmez)."""
+    kayit = _aktif.get()
+    return kayit is not None and _uzak_dosya(kayit.veri) == dosya_adi
+
+
+def _yukle(anahtar: str, arac: str):
+    satir = durum.calistir("SELECT veri, sahip, zaman FROM kontrol_noktalari WHERE anahtar = ?", (anahtar,)).fetchone()
+    if satir is None:
+        return KontrolNoktasi(anahtar, arac, {})
+    veri, sahip, zaman = satir
+    if sahip is not None and sahip != os.getpid() and sahip in durum.canli_isciler():
+        # Aynı iş başka bir canlı süreçte yürüyor; onun kayıtları ezilmez
+        return None
+    if zaman < time.time() - KONTROL_NOKTASI_SURESI:
+        return KontrolNoktasi(anahtar, arac, {})
+    return KontrolNoktasi(anahtar, arac, json.loads(veri))
+
+
+def _serbest_birak(anahtar: str):
+    durum.calistir("UPDATE kontrol_noktalari SET sahip = NULL WHERE anahtar = ? AND sahip = ?", (anahtar, os.getpid()))
+
+
+def _sil(anahtar: str):
+    durum.calistir("DELETE FROM kontrol_noktalari WHERE anahtar = ?", (anahtar,))
+
+
+async def kontrol_noktasiyla(anahtar: str, arac: str, fonksiyon):
+    """
+    `fonksiyon()` işini `anahtar` kontrol noktasıyla yürütür. İş sonuçlanırsa kayıt silinir ve tuttuğu uzak
+    dosya bırakılır; bu, hata yanıtı için de geçerlidir. İş yarıda kesilirse kayıt saklanır. Kesilme
+    kapanış, iptal ya da süre aşımından olabilir. Aynı iş KONTROL_NOKTASI_SURESI içinde yeniden başlarsa
+    kalan aşamalardan devam eder.
+    """
+    kayit = await anyio.to_thread.run_sync(_yukle, anahtar, arac)
+    if kayit is None:
+        return await fonksiyon()
+    if kayit.veri:
+        logger.info("%s işi kontrol noktasından devam ediyor (tamamlanan aşamalar: %s)", arac, ", ".join(kayit.veri))
+    jeton = _aktif.set(kayit)
+    try:
+        sonuc = await fonksiyon()
+    except asyncio.CancelledError:
+        if kayit.veri:
+            with anyio.CancelScope(shield=True):
+                await anyio.to_thread.run_sync(_serbest_birak, anahtar)
+            logger.info("%s işi yarıda kaldı, kontrol noktası saklandı (%s)", arac, ", ".join(kayit.veri))
+        raise
+    except Exception:
+        await _tamamla(kayit)
+        raise
+    finally:
+        _aktif.reset(jeton)
+    await _tamamla(kayit)
+    return sonuc
+
+
+async def _tamamla(kayit: KontrolNoktasi):
+    if not kayit.veri:
+        return
+    with anyio.CancelScope(shield=True):
+        await anyio.to_thread.run_sync(_sil, kayit.anahtar)
+    if _uzak_dosya(kayit.veri):
+        uzak_dosya_temizleyici.birak(_uzak_dosya(kayit.veri))
+
+
+def tutulan_dosyalar() -> set:
+    """Saklanan kontrol noktalarının tuttuğu uzak dosyalar (senkron, thread'de çalıştırın)."""
+    return {ad for ad in (_uzak_dosya(json.loads(veri)) for (veri,) in durum.calistir("SELECT veri FROM kontrol_noktalari")) if ad}
+
+
+def eskileri_temizle() -> list:
+    """
+    KONTROL_NOKTASI_SURESI'nden eski, yürüten süreci kalmamış kayıtları siler ve tuttukları uzak dosyaların
+    adlarını döndürür (senkron, thread'de çalıştırın).
+    """
+    sinir = time.time() - KONTROL_NOKTASI_SURESI
+    canli = set(durum.canli_isciler())
+    with durum.islem() as baglanti:
+        satirlar = [(anahtar, veri) for anahtar, veri, sahip in baglanti.execute(
+            "SELECT anahtar, veri, sahip FROM kontrol_noktalari WHERE zaman < ?", (sinir,)) if sahip not in canli]
+        baglanti.executemany("DELETE FROM kontrol_noktalari WHERE anahtar = ?", [(anahtar,) for anahtar, _ in satirlar])
+    return [ad for ad in (_uzak_dosya(json.loads(veri)) for _, veri in satirlar) if ad]
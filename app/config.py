@@ -1,16 +1,134 @@
 import os
 from dotenv import load_dotenv
 import logging
-import google.generativeai as genai
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
-    logging.error("GEMINI_API_KEY bulunamadı. Lütfen .env dosyasını kontrol edin.")
-    # Uygulamanın başlamasını engelleyebilirsiniz veya sadece uyarı verebilirsiniz.
-    exit() 
-else:
-    genai.configure(api_key=GEMINI_API_KEY)
-    logging.info("Gemini API başarıyla yapılandırıldı")
+    # Sunucu yine de açılır (metrikler, dosya yükleme); Gemini gerektiren araçlar çağrıldığında hata döner.
+    # Gemini, ilk kullanımda app.lazy_imports tarafından yapılandırılır.
+    logger.error("GEMINI_API_KEY bulunamadı. Lütfen .env dosyasını kontrol edin.")
+
+# Tüm araçların paylaştığı ortak dosya klasörü (içerik adresli depo kökü)
+SHARED_UPLOADS_DIR = os.getenv("SHARED_UPLOADS_DIR", "shared_uploads")
+# Ortak klasör için disk kotası; aşıldığında en uzun süredir kullanılmayan dosyalar silinir
+DEPO_KOTA_BAYT = int(float(os.getenv("DEPO_KOTA_MB", "10240")) * 1024 * 1024)
+
+# Sonuç önbelleğinde tutulacak en fazla kayıt sayısı
+ONBELLEK_MAKS_KAYIT = int(os.getenv("ONBELLEK_MAKS_KAYIT", "256"))
+
+# Toplu araçlarda bir istemcinin aynı anda hatta bulunabilecek dosya sayısı (istemci başına); yürüyen iş
+# sayısını ayrıca adil zamanlayıcı sınırlar (ADIL_ESZAMANLILIK, ISTEMCI_MAKS_ESZAMANLILIK)
+TOPLU_ESZAMANLILIK = int(os.getenv("TOPLU_ESZAMANLILIK", "8"))
+TOPLU_MAKS_DOSYA = int(os.getenv("TOPLU_MAKS_DOSYA", "100"))
+
+# Ortak klasöre gelen dosyalar için arka planda önceden özet hazırlama (varsayılan: kapalı)
+ONISITMA_AKTIF = os.getenv("ONISITMA_AKTIF", "0").lower() in ("1", "true", "evet")
+ONISITMA_TARAMA_ARALIGI = float(os.getenv("ONISITMA_TARAMA_ARALIGI", "5"))
+ONISITMA_HEDEF_DIL = os.getenv("ONISITMA_HEDEF_DIL", "otomatik")
+
+# Gemini'ye yüklenen dosyaların arka planda toplu silinmesi ve sahipsiz dosya taraması
+UZAK_DOSYA_PARTI_BOYUTU = int(os.getenv("UZAK_DOSYA_PARTI_BOYUTU", "20"))
+UZAK_DOSYA_TARAMA_ARALIGI = float(os.getenv("UZAK_DOSYA_TARAMA_ARALIGI", "1800"))
+UZAK_DOSYA_MAKS_YAS = float(os.getenv("UZAK_DOSYA_MAKS_YAS", "7200"))
+# Açılış taraması bu kadar saniye ertelenir; Gemini kütüphanesinin yüklenmesi sunucunun hazır olmasını geciktirmez
+UZAK_DOSYA_ILK_TARAMA_GECIKMESI = float(os.getenv("UZAK_DOSYA_ILK_TARAMA_GECIKMESI", "10"))
+
+# İstek bazlı izleme: her araç çağrısının aşamaları dönen JSONL dosyasına span olarak yazılır
+IZLEME_AKTIF = os.getenv("IZLEME_AKTIF", "1").lower() in ("1", "true", "evet")
+IZ_DOSYASI = os.getenv("IZ_DOSYASI", os.path.join("izler", "izler.jsonl"))
+IZ_DOSYA_MAKS_BAYT = int(float(os.getenv("IZ_DOSYA_MAKS_MB", "50")) * 1024 * 1024)
+IZ_DOSYA_YEDEK_SAYISI = int(os.getenv("IZ_DOSYA_YEDEK_SAYISI", "5"))
+
+# Loglama: kuyruk tabanlı arka plan yazıcı, modül bazlı seviyeler ve debug örneklemesi
+LOG_SEVIYESI = os.getenv("LOG_SEVIYESI", "INFO").upper()
+# Örn: "app.tools.video_summarizer=DEBUG,yt_dlp=WARNING"
+LOG_MODUL_SEVIYELERI = os.getenv("LOG_MODUL_SEVIYELERI", "yt_dlp=WARNING,httpx=WARNING,httpcore=WARNING")
+LOG_BICIMI = os.getenv("LOG_BICIMI", "json").lower()
+LOG_DOSYASI = os.getenv("LOG_DOSYASI", "")
+LOG_KUYRUK_BOYUTU = int(os.getenv("LOG_KUYRUK_BOYUTU", "10000"))
+# Aynı kaynak satırından saniyede izin verilen en fazla DEBUG kaydı (0: sınırsız)
+LOG_DEBUG_ORNEKLEME_HIZI = float(os.getenv("LOG_DEBUG_ORNEKLEME_HIZI", "5"))
+
+# Trafik kaydı (varsayılan: kapalı): araç çağrılarının anonimleştirilmiş parametreleri, girdi boyutları ve
+# aşama süreleri tekrar oynatma (benchmarks/tekrar_oynat.py) için JSONL dosyasına yazılır
+TRAFIK_KAYDI_AKTIF = os.getenv("TRAFIK_KAYDI_AKTIF", "0").lower() in ("1", "true", "evet")
+TRAFIK_KAYIT_DOSYASI = os.getenv("TRAFIK_KAYIT_DOSYASI", os.path.join("trafik", "trafik.jsonl"))
+TRAFIK_KAYIT_ORNEKLEME_ORANI = float(os.getenv("TRAFIK_KAYIT_ORNEKLEME_ORANI", "1"))
+# Parametre özetleri için gizli tuz; boşsa her süreç başlangıcında rastgele üretilir
+TRAFIK_KAYIT_TUZU = os.getenv("TRAFIK_KAYIT_TUZU", "")
+TRAFIK_DOSYA_MAKS_BAYT = int(float(os.getenv("TRAFIK_DOSYA_MAKS_MB", "100")) * 1024 * 1024)
+
+# Model yönlendirme: ucuz katmanlar hızlı modelle, derin analiz pro modelle üretilir (bkz. app/model_routing.py)
+MODEL_HIZLI = os.getenv("MODEL_HIZLI", "gemini-1.5-flash-latest")
+MODEL_PRO = os.getenv("MODEL_PRO", "gemini-1.5-pro-latest")
+# Varsayılan rota tablosunun yerine kullanılacak JSON dosyası (boşsa yerleşik tablo)
+MODEL_ROTA_DOSYASI = os.getenv("MODEL_ROTA_DOSYASI", "")
+# Kota/aşırı yük hatası veren modelin bu süre boyunca yedeklerden sonraya bırakılması (sn)
+MODEL_SOGUMA_SURESI = float(os.getenv("MODEL_SOGUMA_SURESI", "60"))
+
+# Ön planlama: girdi tokenları ağ işinden önce yerel olarak tahmin edilip strateji seçilir (bkz. app/planner.py)
+PLAN_BAGLAM_TOKEN = int(os.getenv("PLAN_BAGLAM_TOKEN", "1000000"))
+PLAN_MAKS_CIKIS_TOKEN = int(os.getenv("PLAN_MAKS_CIKIS_TOKEN", "8192"))
+# Bu kadar tokenın altındaki metin katmanlı PDF'ler kisa/genis özet için yüklenmeden, metin olarak gönderilir
+PLAN_METIN_ESIGI_TOKEN = int(os.getenv("PLAN_METIN_ESIGI_TOKEN", "32000"))
+
+# Çok süreçli çalışma: 1'den büyükse uvicorn aynı soketi dinleyen bu kadar işçi süreci başlatır (bkz. app/server.py)
+SUNUCU_ISCI_SAYISI = int(os.getenv("SUNUCU_ISCI_SAYISI", "1"))
+SUNUCU_HOST = os.getenv("SUNUCU_HOST", "0.0.0.0")
+SUNUCU_PORT = int(os.getenv("SUNUCU_PORT", "8000"))
+# Önbellek, uzak dosya kaydı, sabitlemeler ve görev kiralarının tutulduğu, tüm süreçlerin paylaştığı SQLite dosyası
+DURUM_VERITABANI = os.getenv("DURUM_VERITABANI", "durum/edumcp.db")
+# İşçilerin canlılık sinyali ve metrik anlığı yayınlama aralığı (sn)
+ISCI_NABIZ_ARALIGI = float(os.getenv("ISCI_NABIZ_ARALIGI", "5"))
+
+# Kalıcı iş kuyruğu: açıkken medya araçları işi kuyruğa bırakır, ağır iş `python -m app.worker` süreçlerinde yürür
+IS_KUYRUGU_AKTIF = os.getenv("IS_KUYRUGU_AKTIF", "0").lower() in ("1", "true", "evet")
+# Aracın sonucu bekleyeceği en uzun süre (sn); aşılırsa iş kimliği döner, sonuç is_durumu ile alınır
+IS_BEKLEME_SURESI = float(os.getenv("IS_BEKLEME_SURESI", "600"))
+IS_ISCI_ESZAMANLILIK = int(os.getenv("IS_ISCI_ESZAMANLILIK", "4"))
+IS_YOKLAMA_ARALIGI = float(os.getenv("IS_YOKLAMA_ARALIGI", "0.5"))
+# İşçi bu süre boyunca kirasını yenilemezse (çöktüyse) iş başka bir işçiye verilir
+IS_KIRA_SURESI = float(os.getenv("IS_KIRA_SURESI", "60"))
+IS_MAKS_DENEME = int(os.getenv("IS_MAKS_DENEME", "3"))
+# Tamamlanan işlerin sonuçları bu süre sonra kuyruktan silinir (sn)
+IS_SAKLAMA_SURESI = float(os.getenv("IS_SAKLAMA_SURESI", "86400"))
+
+# Gemini kotası: tüm araçların ve süreçlerin paylaştığı token kovası (bkz. app/rate_limiter.py). 0: sınırsız
+KOTA_RPM = float(os.getenv("KOTA_RPM", "1000"))
+KOTA_TPM = float(os.getenv("KOTA_TPM", "4000000"))
+KOTA_YUKLEME_MB_DK = float(os.getenv("KOTA_YUKLEME_MB_DK", "1024"))
+# Kovanın biriktirebileceği pay, bu kadar saniyelik kotaya eşittir (ani yük toleransı)
+KOTA_PATLAMA_SURESI = float(os.getenv("KOTA_PATLAMA_SURESI", "10"))
+
+# Adil paylaşım: medya işleri istemci başına sıralardan ağırlıklı deficit round-robin ile yürütülür (bkz. app/fair_scheduler.py)
+# Süreçte aynı anda yürüyen en fazla medya işi (0: zamanlayıcı kapalı) ve bir istemcinin en fazla yürüyen işi
+ADIL_ESZAMANLILIK = int(os.getenv("ADIL_ESZAMANLILIK", "8"))
+ISTEMCI_MAKS_ESZAMANLILIK = int(os.getenv("ISTEMCI_MAKS_ESZAMANLILIK", "4"))
+# İstemci payları, örn: "ogretmen-a=3,toplu-aktarim=0.5" (belirtilmeyen istemcinin ağırlığı 1)
+ISTEMCI_AGIRLIKLARI = os.getenv("ISTEMCI_AGIRLIKLARI", "")
+# İstemci kimliğinin okunduğu HTTP başlığı; yoksa yetki jetonu, MCP oturumu ya da istemci adresi kullanılır
+ISTEMCI_KIMLIK_BASLIGI = os.getenv("ISTEMCI_KIMLIK_BASLIGI", "x-istemci-kimligi").lower()
+
+# Süre sınırları: araç çağrısının toplam süresi (sn), aşamalara paylaştırılır (bkz. app/deadlines.py).
+# Araçların sure_siniri_sn parametresi bunları çağrı başına değiştirir; SURE_SINIRI_MAKS istenebilecek en uzun süredir
+SURE_SINIRI_PDF = float(os.getenv("SURE_SINIRI_PDF", "300"))
+SURE_SINIRI_SES = float(os.getenv("SURE_SINIRI_SES", "600"))
+SURE_SINIRI_VIDEO = float(os.getenv("SURE_SINIRI_VIDEO", "900"))
+SURE_SINIRI_SORU = float(os.getenv("SURE_SINIRI_SORU", "120"))
+SURE_SINIRI_MAKS = float(os.getenv("SURE_SINIRI_MAKS", "3600"))
+# yt-dlp bağlantılarının soket zaman aşımı (sn); çağrının kalan süresiyle ayrıca kırpılır
+YTDLP_SOKET_ZAMAN_ASIMI = float(os.getenv("YTDLP_SOKET_ZAMAN_ASIMI", "30"))
+# Zaman aşımı verilemeyen Gemini dosya çağrılarının (upload_file, get_file) bırakılanlar dahil aynı anda
+# tutabileceği en fazla thread sayısı
+GEMINI_DOSYA_THREAD_SINIRI = int(os.getenv("GEMINI_DOSYA_THREAD_SINIRI", "16"))
+
+# Yarıda kalan işlerin tamamlanan aşamaları (uzak dosya, parça sonuçları) bu süre saklanır; aynı iş yeniden
+# başlarsa kaldığı yerden devam eder (sn, bkz. app/checkpoints.py)
+KONTROL_NOKTASI_SURESI = float(os.getenv("KONTROL_NOKTASI_SURESI", "1800"))
+# Kapanışta (SIGTERM) yürüyen işlerin bitmesi için beklenen en uzun süre; sonra işler kontrol noktasıyla bırakılır (sn)
+KAPANIS_BEKLEME_SURESI = float(os.getenv("KAPANIS_BEKLEME_SURESI", "60"))
@@ -0,0 +1,143 @@
+import json
+import math
+import time
+import logging
+import contextvars
+from contextlib import contextmanager
+import anyio
+from app.config import SURE_SINIRI_PDF, SURE_SINIRI_SES, SURE_SINIRI_VIDEO, SURE_SINIRI_SORU, SURE_SINIRI_MAKS
+from app.metrics import metrikler, Sayac
+
+logger = logging.getLogger(__name__)
+
+VARSAYILAN_SURELER = {"pdf": SURE_SINIRI_PDF, "ses": SURE_SINIRI_SES, "video": SURE_SINIRI_VIDEO, "soru": SURE_SINIRI_SORU}
+
+# Araçların süre sınırı konan aşamaları (sırayla) ve payları. Bir aşama, kalan sürenin kendisi ve sonraki
+# aşamaların payları toplamına oranla kendi payı kadarını alır: atlanan aşamanın payı sonrakilere kalır, son
+# aşama kalanın tamamını alır. Listede olmayan aşamalar yalnızca toplam süreyle sınırlıdır.
+ASAMA_PAYLARI = {
+    "pdf": (("planlama", 1), ("yukleme", 2), ("isleme_bekleme", 2), ("uretim", 5)),
+    "ses": (("planlama", 1), ("yukleme", 2), ("isleme_bekleme", 2), ("uretim", 5)),
+    "video": (("planlama", 1), ("altyazi", 1), ("indirme", 4), ("yukleme", 2), ("isleme_bekleme", 2), ("uretim", 4)),
+    "soru": (("web_arama", 1), ("uretim", 4)),
+}
+
+_butce = contextvars.ContextVar("sure_butcesi", default=None)
+
+sure_asimlari = metrikler.kaydet(Sayac(
+    "edumcp_sure_asimi_toplam", "Süre sınırını aşan araç çağrıları ve aşamaları", ("arac", "asama")))
+
+
+class SureAsimi(Exception):
+    """Araç çağrısının (asama verilmişse o aşamanın) süre sınırı doldu."""
+
+    def __init__(self, arac: str, asama: str = None, sure: float = None):
+        self.arac = arac
+        self.asama = asama
+        self.sure = sure
+        if asama is None:
+            mesaj = "İşlem süre sınırında tamamlanamadı"
+        else:
+            mesaj = f"{asama} aşaması süre sınırını aştı"
+        if sure is not None:
+            mesaj += f" ({sure:.1f} sn)"
+        super().__init__(mesaj)
+
+
+class Butce:
+    """Çağrının bitmesi gereken an (time.time(); kuyruktaki işle birlikte başka sürece de taşınır)."""
+
+    def __init__(self, arac: str, son_tarih: float):
+        self.arac = arac
+        self.son_tarih = son_tarih
+
+    def kalan(self) -> float:
+        return self.son_tarih - time.time()
+
+
+@contextmanager
+def butce_olarak(arac: str, sure_siniri_sn: float = 0, son_tarih: float = None):
+    """
+    Bloğun içindeki aşamaları `son_tarih` ya da şu andan sure_siniri_sn saniye sonrasıyla sınırlar. Süre
+    verilmezse aracın varsayılanı kullanılır; istenen süre SURE_SINIRI_MAKS ile kırpılır. İç içe bütçelerde
+    (toplu çağrı içindeki dosya) erken dolan geçerlidir.
+    """
+    if son_tarih is None:
+        sure = sure_siniri_sn if sure_siniri_sn and sure_siniri_sn > 0 else VARSAYILAN_SURELER.get(arac, 0)
+        if sure > 0:
+            son_tarih = time.time() + min(sure, SURE_SINIRI_MAKS)
+    dis = _butce.get()
+    if dis is not None and (son_tarih is None or dis.son_tarih < son_tarih):
+        son_tarih = dis.son_tarih
+    if son_tarih is None:
+        yield None
+        return
+    butce = Butce(arac, son_tarih)
+    jeton = _butce.set(butce)
+    try:
+        yield butce
+    finally:
+        _butce.reset(jeton)
+
+
+def kalan_sure() -> float:
+    """Geçerli bütçede kalan süre (sn); bütçe yoksa sonsuz."""
+    butce = _butce.get()
+    return math.inf if butce is None else butce.kalan()
+
+
+def cagri_zaman_asimi(ust_sinir: float = math.inf):
+    """
+    Arka uç çağrısına verilecek zaman aşımı (sn): bütçede kalan süre, ust_sinir ile kırpılır, en az 1 sn.
+    Bütçe de üst sınır da yoksa None (çağrının kendi varsayılanı).
+    """
+    sure = min(kalan_sure(), ust_sinir)
+    return None if math.isinf(sure) else max(sure, 1)
+
+
+def aktif_son_tarih():
+    butce = _butce.get()
+    return None if butce is None else butce.son_tarih
+
+
+def asama_payi(arac: str, asama_adi: str, kalan: float) -> float:
+    paylar = ASAMA_PAYLARI.get(arac, ())
+    adlar = [ad for ad, _ in paylar]
+    if asama_adi not in adlar:
+        return kalan
+    sonrakiler = [pay for _, pay in paylar[adlar.index(asama_adi):]]
+    return kalan * sonrakiler[0] / sum(sonrakiler)
+
+
+@contextmanager
+def asama_siniri(arac: str, asama_adi: str):
+    """
+    Bloğu aşamanın süre payıyla sınırlar; süre dolarsa blok iptal edilir (thread'deki indirme durur, yükleme
+    ve model çağrısı beklenmez) ve SureAsimi yükseltilir. Bütçe yoksa blok sınırsız çalışır.
+
+    Örnek:
+        with asama("pdf", "yukleme"), asama_siniri("pdf", "yukleme"):
+            pdf_file = await dosya_yukle(...)
+    """
+    butce = _butce.get()
+    if butce is None:
+        yield
+        return
+    sure = asama_payi(arac, asama_adi, butce.kalan())
+    if sure <= 0:
+        sure_asimlari.artir(arac, asama_adi)
+        raise SureAsimi(arac)
+    with anyio.move_on_after(sure) as kapsam:
+        yield
+    if kapsam.cancelled_caught:
+        sure_asimlari.artir(arac, asama_adi)
+        logger.warning("%s aracının %s aşaması %.1f sn süre sınırını aştı", arac, asama_adi, sure)
+        raise SureAsimi(arac, asama_adi, sure)
+
+
+def sure_asimi_yaniti(hata: SureAsimi) -> str:
+    yanit = {"durum": "Hata", "mesaj": f"{hata}. Daha uzun bir sure_siniri_sn ile ya da daha küçük bir dosyayla yeniden deneyin.",
+             "zaman_asimi": True}
+    if hata.asama is not None:
+        yanit["asama"] = hata.asama
+    return json.dumps(yanit, ensure_ascii=False)
@@ -0,0 +1,188 @@
+import time
+import asyncio
+import hashlib
+import logging
+import contextvars
+from collections import deque
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from app.config import ADIL_ESZAMANLILIK, ISTEMCI_MAKS_ESZAMANLILIK, ISTEMCI_AGIRLIKLARI, ISTEMCI_KIMLIK_BASLIGI
+from app.metrics import metrikler, Histogram
+
+logger = logging.getLogger(__name__)
+
+# MCP dışından gelen işler (ön ısıtma gibi sunucu içi çağrılar) bu istemciden sayılır
+SUNUCU = "sunucu"
+# İşin istemcinin payından düşülen maliyeti; uzun medya işleri sırayı daha çabuk tüketir
+MALIYETLER = {"pdf": 1, "ses": 2, "video": 4}
+# Ağırlığı 1 olan istemcinin her turda kazandığı pay
+KUANTUM = 4
+
+_istemci = contextvars.ContextVar("istemci", default=None)
+
+adil_bekleme = metrikler.kaydet(Histogram(
+    "edumcp_adil_bekleme_saniye", "Medya işinin istemci sırasında beklediği süre", ("arac",)))
+
+
+def agirliklari_ayristir(metin: str) -> dict:
+    """"ogretmen-a=3,ogrenci=1" biçimindeki ayarı istemci -> ağırlık sözlüğüne çevirir."""
+    agirliklar = {}
+    for parca in (metin or "").split(","):
+        ad, _, deger = parca.partition("=")
+        if ad.strip() and deger.strip():
+            try:
+                agirliklar[ad.strip()] = max(float(deger), 0.1)
+            except ValueError:
+                logger.warning("Geçersiz istemci ağırlığı yok sayıldı: %s", parca)
+    return agirliklar
+
+
+AGIRLIKLAR = agirliklari_ayristir(ISTEMCI_AGIRLIKLARI)
+
+
+def agirlik(istemci: str) -> float:
+    return AGIRLIKLAR.get(istemci, 1.0)
+
+
+def aktif_istemci() -> str:
+    return _istemci.get() or SUNUCU
+
+
+def _istemci_kimligi(context: MiddlewareContext) -> str:
+    """
+    Çağrıyı yapan istemcinin kimliği: ISTEMCI_KIMLIK_BASLIGI başlığı, yoksa erişim jetonunun özeti, MCP
+    oturumu ve son olarak istemci adresi. Durumsuz HTTP'de her istek yeni oturum açtığından başlık önerilir.
+    """
+    try:
+        from fastmcp.server.dependencies import get_http_request
+        istek = get_http_request()
+    except RuntimeError:
+        istek = None
+    if istek is not None:
+        if istek.headers.get(ISTEMCI_KIMLIK_BASLIGI):
+            return istek.headers[ISTEMCI_KIMLIK_BASLIGI].strip()[:64]
+        yetki = istek.headers.get("authorization", "")
+        if yetki:
+            return "jeton:" + hashlib.sha256(yetki.encode("utf-8")).hexdigest()[:12]
+        if istek.headers.get("mcp-session-id"):
+            return "oturum:" + istek.headers["mcp-session-id"]
+        if istek.client is not None:
+            return "adres:" + istek.client.host
+    if context.fastmcp_context is not None:
+        try:
+            return "oturum:" + context.fastmcp_context.session_id
+        except Exception:
+            pass
+    return SUNUCU
+
+
+class IstemciKimligi(Middleware):
+    """Araç çağrısının istemci kimliğini belirler; çağrının başlattığı medya işleri bu istemcinin sırasına girer."""
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        belirtec = _istemci.set(_istemci_kimligi(context))
+        try:
+            return await call_next(context)
+        finally:
+            _istemci.reset(belirtec)
+
+
+class AdilZamanlayici:
+    """
+    Medya işlerini istemci başına kuyruklardan ağırlıklı deficit round-robin ile yürüten zamanlayıcı.
+
+    Aynı anda en fazla `eszamanlilik` iş yürür; bir istemcinin yürüyen işi `istemci_siniri` ile sınırlıdır.
+    Sırası gelen istemci her turda ağırlığı kadar pay (KUANTUM × ağırlık) kazanır ve işin maliyeti kadar
+    pay harcar; 40 video gönderen istemci, tek PDF isteyen diğer istemcilerin önüne geçemez.
+    """
+
+    def __init__(self, eszamanlilik: int = ADIL_ESZAMANLILIK, istemci_siniri: int = ISTEMCI_MAKS_ESZAMANLILIK):
+        self.eszamanlilik = eszamanlilik
+        self.istemci_siniri = istemci_siniri
+        self._kuyruklar = {}        # istemci -> deque[(maliyet, future)]
+        self._sira = deque()        # bekleyen işi olan istemciler (round-robin sırası)
+        self._pay = {}              # istemci -> biriken pay (deficit)
+        self._yurutulen = {}        # istemci -> yürüyen iş sayısı
+
+    def _dagit(self):
+        bosta = 0
+        while self._sira and sum(self._yurutulen.values()) < self.eszamanlilik and bosta < len(self._sira):
+            istemci = self._sira[0]
+            kuyruk = self._kuyruklar[istemci]
+            while kuyruk and kuyruk[0][1].done():
+                # Beklerken iptal edilen iş
+                kuyruk.popleft()
+            if not kuyruk:
+                self._sira.popleft()
+                del self._kuyruklar[istemci]
+                self._pay.pop(istemci, None)
+                continue
+            if self._yurutulen.get(istemci, 0) >= self.istemci_siniri:
+                self._sira.rotate(-1)
+                bosta += 1
+                continue
+            maliyet, gelecek = kuyruk[0]
+            if self._pay.get(istemci, 0) < maliyet:
+                # Payı yetmeyen istemci bu turun payını alıp sırayı bir sonrakine bırakır
+                self._pay[istemci] = self._pay.get(istemci, 0) + KUANTUM * agirlik(istemci)
+                if self._pay[istemci] < maliyet:
+                    self._sira.rotate(-1)
+                continue
+            kuyruk.popleft()
+            self._pay[istemci] -= maliyet
+            self._yurutulen[istemci] = self._yurutulen.get(istemci, 0) + 1
+            gelecek.set_result(None)
+            bosta = 0
+            if not kuyruk or self._pay[istemci] < kuyruk[0][0]:
+                self._sira.rotate(-1)
+
+    def _birak(self, istemci: str):
+        self._yurutulen[istemci] -= 1
+        if not self._yurutulen[istemci]:
+            del self._yurutulen[istemci]
+        self._dagit()
+
+    async def yurut(self, arac: str, fonksiyon):
+        """`fonksiyon()` işini çağıran istemcinin sırası geldiğinde yürütür ve sonucunu döndürür."""
+        if self.eszamanlilik <= 0:
+            return await fonksiyon()
+        istemci = aktif_istemci()
+        gelecek = asyncio.get_running_loop().create_future()
+        if istemci not in self._kuyruklar:
+            self._kuyruklar[istemci] = deque()
+            self._sira.append(istemci)
+        self._kuyruklar[istemci].append((MALIYETLER.get(arac, 1), gelecek))
+        baslangic = time.monotonic()
+        self._dagit()
+        try:
+            await gelecek
+        except asyncio.CancelledError:
+            if gelecek.done() and not gelecek.cancelled():
+                # Sıra verildiği anda iptal edildi; yer bir sonrakine bırakılır
+                self._birak(istemci)
+            else:
+                self._dagit()
+            raise
+        bekleme = time.monotonic() - baslangic
+        adil_bekleme.gozlemle(bekleme, arac)
+        if bekleme > 1:
+            logger.info("%s işi istemci sırasında %.1f sn bekledi (%s)", arac, bekleme, istemci)
+        try:
+            return await fonksiyon()
+        finally:
+            self._birak(istemci)
+
+    def bekleyen_sayisi(self) -> int:
+        return sum(1 for kuyruk in self._kuyruklar.values() for _, gelecek in kuyruk if not gelecek.done())
+
+    def yurutulen_sayisi(self) -> int:
+        return sum(self._yurutulen.values())
+
+    def istemci_sayisi(self) -> int:
+        return len(set(self._kuyruklar) | set(self._yurutulen))
+
+
+# Süreçteki tüm medya işlerinin paylaştığı zamanlayıcı
+adil_zamanlayici = AdilZamanlayici()
+metrikler.olcer_ekle("edumcp_adil_bekleyen", "İstemci sıralarında bekleyen medya işi sayısı", adil_zamanlayici.bekleyen_sayisi)
+metrikler.olcer_ekle("edumcp_adil_yurutulen", "Adil zamanlayıcıda yürüyen medya işi sayısı", adil_zamanlayici.yurutulen_sayisi)
+metrikler.olcer_ekle("edumcp_adil_istemci", "İşi bekleyen ya da yürüyen istemci sayısı", adil_zamanlayici.istemci_sayisi)
@@ -0,0 +1,87 @@
+import os
+import asyncio
+import logging
+from app.lazy_imports import genai
+from app.reaper import uzak_dosya_temizleyici
+from app.config import GEMINI_DOSYA_THREAD_SINIRI
+from app.cancellation import thread_calistir, ThreadSiniri
+from app.metrics import metrikler
+from app.tracing import ozellik_ekle
+from app.rate_limiter import kota_sinirlayici, oncelik_sinifi
+from app.checkpoints import asama_ciktisi, asama_kaydet, dosyayi_tutuyor
+
+logger = logging.getLogger(__name__)
+
+# Eski SDK'nın upload_file/get_file çağrıları zaman aşımı almaz; süre dolunca bırakılan çağrı ağ vazgeçene kadar
+# thread'ini tutar. Bu çağrılar ayrı bir sınırla yürür: asılı olanlar sınırı doldurursa yenileri thread
+# açmak yerine sırada bekler (ve kendi aşama süreleri dolunca zaman aşımı alır).
+dosya_thread_siniri = ThreadSiniri(GEMINI_DOSYA_THREAD_SINIRI)
+metrikler.olcer_ekle("edumcp_gemini_dosya_thread", "Gemini dosya çağrılarının tuttuğu thread sayısı (bırakılanlar dahil)",
+                     lambda: dosya_thread_siniri.kullanilan)
+
+
+async def dosya_yukle(arac: str, dosya_yolu: str, mime_type: str):
+    """
+    Dosyayı (yükleme kotasından pay alarak) Gemini File API'ye yükler ve temizleyiciye aktif dosya olarak kaydeder.
+    Çağıran yükleme sürerken iptal edilirse, yükleme tamamlandığında uzak dosya hemen silinmeye bırakılır.
+
+    Yüklenen dosya işin kontrol noktasına yazılır; yarıda kalıp yeniden başlayan iş, uzak dosya hâlâ
+    kullanılabiliyorsa yeniden yüklemez.
+    """
+    onceki = asama_ciktisi("yukleme")
+    if onceki is not None:
+        yuklenen = await _onceki_yukleme(arac, onceki["uzak_dosya"])
+        if yuklenen is not None:
+            logger.info("Dosya daha önce yüklenmiş, yükleme atlandı: %s", yuklenen.name)
+            return yuklenen
+
+    await kota_sinirlayici.izin(oncelik_sinifi(arac), bayt=os.path.getsize(dosya_yolu))
+
+    def upload():
+        return genai.upload_file(path=dosya_yolu, mime_type=mime_type)
+
+    yuklenen = await thread_calistir(upload, iptal_edilince=dosyayi_birak, sinir=dosya_thread_siniri)
+    await uzak_dosya_temizleyici.kaydet(yuklenen.name)
+    ozellik_ekle(uzak_dosya=yuklenen.name)
+    await asama_kaydet("yukleme", {"uzak_dosya": yuklenen.name})
+    return yuklenen
+
+
+async def _onceki_yukleme(arac: str, dosya_adi: str):
+    """Kontrol noktasındaki uzak dosya; silinmiş ya da işlenememişse None."""
+    try:
+        await kota_sinirlayici.izin(oncelik_sinifi(arac))
+        yuklenen = await thread_calistir(genai.get_file, dosya_adi, sinir=dosya_thread_siniri)
+    except Exception as e:
+        logger.info("Önceki yükleme kullanılamıyor, dosya yeniden yüklenecek (%s): %s", dosya_adi, e)
+        return None
+    if yuklenen.state.name == "FAILED":
+        uzak_dosya_temizleyici.birak(dosya_adi)
+        return None
+    await uzak_dosya_temizleyici.kaydet(yuklenen.name)
+    ozellik_ekle(uzak_dosya=yuklenen.name, kontrol_noktasindan=True)
+    return yuklenen
+
+
+async def islenmesini_bekle(arac: str, yuklenen, max_bekleme_suresi: int, kontrol_araligi: int = 5):
+    """Dosya PROCESSING durumundan çıkana ya da süre dolana kadar bekler, son durumu döndürür."""
+    gecen_sure = 0
+    kontrol_sayisi = 0
+    while yuklenen.state.name == "PROCESSING" and gecen_sure < max_bekleme_suresi:
+        await asyncio.sleep(kontrol_araligi)
+        gecen_sure += kontrol_araligi
+        kontrol_sayisi += 1
+        logger.debug("İşleme devam ediyor... (%s saniye geçti)", gecen_sure)
+        await kota_sinirlayici.izin(oncelik_sinifi(arac))
+        yuklenen = await thread_calistir(genai.get_file, yuklenen.name, sinir=dosya_thread_siniri)
+    ozellik_ekle(kontrol_sayisi=kontrol_sayisi, son_durum=yuklenen.state.name)
+    return yuklenen
+
+
+def dosyayi_birak(yuklenen):
+    """
+    İşi biten uzak dosyayı arka planda silinmek üzere temizleyiciye bırakır. İşin kontrol noktasındaki dosya
+    burada bırakılmaz; iş sonuçlanınca kontrol noktasıyla birlikte bırakılır (bkz. app/checkpoints.py).
+    """
+    if yuklenen is not None and not dosyayi_tutuyor(yuklenen.name):
+        uzak_dosya_temizleyici.birak(yuklenen.name)
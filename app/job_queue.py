@@ -0,0 +1,299 @@
+import json
+import time
+import uuid
+import asyncio
+import logging
+import importlib
+import anyio
+from app.config import (IS_KUYRUGU_AKTIF, IS_BEKLEME_SURESI, IS_KIRA_SURESI, IS_MAKS_DENEME, IS_SAKLAMA_SURESI,
+                        ISTEMCI_MAKS_ESZAMANLILIK)
+from app.metrics import metrikler, Histogram
+from app.shared_state import durum
+from app.single_flight import tek_ucus, istek_anahtari, birlesen_istekler
+from app.rate_limiter import ONCELIKLER, oncelik_sinifi
+from app.fair_scheduler import adil_zamanlayici, aktif_istemci, agirlik
+from app.cancellation import iptal_edilen_isler
+from app.checkpoints import kontrol_noktasiyla
+from app.deadlines import butce_olarak, kalan_sure, aktif_son_tarih, SureAsimi, sure_asimi_yaniti, sure_asimlari
+
+logger = logging.getLogger(__name__)
+
+# Kuyruğa alınabilen işler: araç adı -> "modül:logic fonksiyonu" (işçi sürecinde ilk kullanımda içe aktarılır)
+ISLEYICILER = {
+    "pdf": "app.tools.pdf_summarizer:_pdf_ozetle_logic",
+    "ses": "app.tools.audio_transcriber:_ses_transkript_logic",
+    "video": "app.tools.video_summarizer:_videoyu_ozetle_logic",
+}
+
+BEKLIYOR, CALISIYOR, TAMAMLANDI, HATA, IPTAL = "bekliyor", "calisiyor", "tamamlandi", "hata", "iptal"
+BITMIS = (TAMAMLANDI, HATA, IPTAL)
+IPTAL_SONUCU = json.dumps({"durum": "Hata", "mesaj": "İş, sonucu bekleyen istemci kalmadığı için iptal edildi."},
+                          ensure_ascii=False)
+# Süre sınırı dolan çağrının sonucu, işin iptali ve bekleyenlerin ayrılması için bu kadar ek süre beklenir (sn)
+SURE_TOLERANSI = 2
+
+
+def isleyici(arac: str):
+    modul_adi, _, fonksiyon_adi = ISLEYICILER[arac].partition(":")
+    return getattr(importlib.import_module(modul_adi), fonksiyon_adi)
+
+
+class IsKuyrugu:
+    """
+    Paylaşılan durum deposundaki kalıcı iş kuyruğu.
+
+    MCP sunucusu işi kuyruğa ekleyip sonucunu bekler; ağır indirme/yükleme/üretim `python -m app.worker`
+    süreçlerinde yürür. İşçi aldığı işin kirasını düzenli olarak yeniler; işçi çökerse kira dolunca iş
+    başka bir işçiye verilir. Sunucu yeniden başlasa da kuyruktaki ve yürüyen işler kaybolmaz.
+
+    İşler istemciler arasında adil paylaştırılır: işçi, yürüyen işi ağırlığına göre en az olan istemcinin
+    (eşitlikte en uzun süredir iş başlatılmamış olanın) sıradaki işini alır; bir istemcinin tüm işçilerdeki
+    yürüyen işi istemci_siniri ile sınırlıdır.
+
+    Her iş, sonucunu bekleyen sunucu süreçlerini sayar. Son bekleyen de iptal edilirse (istemci bağlantıyı
+    kesti) bekleyen iş hiç başlatılmaz, yürüyen işe iptal işareti konur ve işçi onu yarıda bırakır.
+
+    İşler ekleyen çağrının süre sınırını (son_tarih) taşır; işçi aşamaları bu sınıra göre paylaştırır, süresi
+    kuyrukta dolan iş hiç başlatılmaz. Kuyruğa geri bırakılan iş, istek anahtarındaki kontrol noktasından
+    devam eder (bkz. app/checkpoints.py).
+    """
+
+    def __init__(self, kira_suresi: float = IS_KIRA_SURESI, maks_deneme: int = IS_MAKS_DENEME,
+                 saklama_suresi: float = IS_SAKLAMA_SURESI, istemci_siniri: int = ISTEMCI_MAKS_ESZAMANLILIK):
+        self.kira_suresi = kira_suresi
+        self.maks_deneme = maks_deneme
+        self.saklama_suresi = saklama_suresi
+        self.istemci_siniri = istemci_siniri
+
+    def ekle(self, arac: str, parametreler: dict, anahtar: str = None, sinif: str = None, istemci: str = None,
+             son_tarih: float = None) -> str:
+        """
+        İşi kuyruğa ekler (çağıranı bekleyen olarak sayar) ve kimliğini döndürür. Aynı anahtarlı bir iş (başka
+        bir sunucu sürecinden de olsa) hâlâ bekliyor ya da yürüyorsa yeni iş eklenmez, onun kimliği döner. İşçiler işleri kota öncelik
+        sınıfına (sinif), aynı sınıfta istemciler arası adil sıraya göre alır.
+        """
+        sinif = sinif or oncelik_sinifi(arac)
+        istemci = istemci or aktif_istemci()
+        with durum.islem() as baglanti:
+            if anahtar is not None:
+                satir = baglanti.execute(
+                    "SELECT kimlik FROM isler WHERE anahtar = ? AND durum IN (?, ?) AND iptal = 0 LIMIT 1",
+                    (anahtar, BEKLIYOR, CALISIYOR)).fetchone()
+                if satir is not None:
+                    baglanti.execute("UPDATE isler SET bekleyen = bekleyen + 1 WHERE kimlik = ?", (satir[0],))
+                    logger.info("Aynı iş kuyrukta, ona bağlanıldı: %s (%s)", satir[0], arac)
+                    birlesen_istekler.artir(arac, "kuyruk")
+                    return satir[0]
+            kimlik = uuid.uuid4().hex
+            baglanti.execute(
+                "INSERT INTO isler (kimlik, arac, parametreler, anahtar, sinif, oncelik, istemci, durum, olusturma, "
+                "bekleyen, son_tarih) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?)",
+                (kimlik, arac, json.dumps(parametreler, ensure_ascii=False), anahtar, sinif, ONCELIKLER[sinif],
+                 istemci, BEKLIYOR, time.time(), son_tarih))
+        logger.info("İş kuyruğa eklendi: %s (%s)", kimlik, arac)
+        return kimlik
+
+    def al(self, sahip: int):
+        """
+        Sıradaki işi (ya da kirası dolmuş yarım işi) sahip sürece verir; iş yoksa None döner
+        (senkron, thread'de çalıştırın).
+        """
+        while True:
+            simdi = time.time()
+            with durum.islem() as baglanti:
+                istemci = self._siradaki_istemci(baglanti, simdi)
+                if istemci is None:
+                    return None
+                satir = baglanti.execute(
+                    "SELECT kimlik, arac, parametreler, anahtar, sinif, olusturma, deneme, iptal, son_tarih FROM isler "
+                    "WHERE (durum = ? OR (durum = ? AND kira_bitis < ?)) AND istemci IS ? "
+                    "ORDER BY oncelik, olusturma LIMIT 1", (BEKLIYOR, CALISIYOR, simdi, istemci[0])).fetchone()
+                kimlik, arac, parametreler, anahtar, sinif, olusturma, deneme, iptal, son_tarih = satir
+                if iptal:
+                    # İptal işareti konmuş işin işçisi durmuş; yeniden başlatılmaz
+                    baglanti.execute("UPDATE isler SET durum = ?, sonuc = ?, bitis = ? WHERE kimlik = ?",
+                                     (IPTAL, IPTAL_SONUCU, simdi, kimlik))
+                    continue
+                if son_tarih is not None and son_tarih <= simdi:
+                    # Çağıranın süre sınırı iş kuyruktayken doldu; sonucu artık beklenmiyor
+                    baglanti.execute("UPDATE isler SET durum = ?, sonuc = ?, bitis = ? WHERE kimlik = ?",
+                                     (HATA, sure_asimi_yaniti(SureAsimi(arac, "kuyruk")), simdi, kimlik))
+                    sure_asimlari.artir(arac, "kuyruk")
+                    continue
+                if deneme >= self.maks_deneme:
+                    # İş her denemede işçiyi çökertmiş; sonsuza kadar yeniden denenmez
+                    sonuc = json.dumps({"durum": "Hata", "mesaj": f"İş {deneme} denemede tamamlanamadı (işçi durdu)."},
+                                       ensure_ascii=False)
+                    baglanti.execute("UPDATE isler SET durum = ?, sonuc = ?, bitis = ? WHERE kimlik = ?",
+                                     (HATA, sonuc, simdi, kimlik))
+                    continue
+                baglanti.execute(
+                    "UPDATE isler SET durum = ?, sahip = ?, baslama = ?, kira_bitis = ?, deneme = deneme + 1 "
+                    "WHERE kimlik = ?", (CALISIYOR, sahip, simdi, simdi + self.kira_suresi, kimlik))
+            if deneme:
+                logger.warning("Yarım kalan iş yeniden alındı: %s (%s. deneme)", kimlik, deneme + 1)
+            is_kuyrugu_bekleme.gozlemle(simdi - olusturma, arac)
+            return {"kimlik": kimlik, "arac": arac, "anahtar": anahtar or kimlik, "sinif": sinif,
+                    "parametreler": json.loads(parametreler), "son_tarih": son_tarih}
+
+    def _siradaki_istemci(self, baglanti, simdi: float):
+        """
+        İşi alınacak istemci (tek elemanlı demet) ya da None: en iyi öncelikli işi olan, sınırın altındaki
+        istemciler arasından yürüyen işi ağırlığına oranla en az, eşitlikte en uzun süredir beklemede olan.
+        """
+        adaylar = baglanti.execute(
+            "SELECT istemci, MIN(oncelik) FROM isler WHERE durum = ? OR (durum = ? AND kira_bitis < ?) "
+            "GROUP BY istemci", (BEKLIYOR, CALISIYOR, simdi)).fetchall()
+        if not adaylar:
+            return None
+        yurutulen = {istemci: (adet, son) for istemci, adet, son in baglanti.execute(
+            "SELECT istemci, COUNT(*), MAX(baslama) FROM isler WHERE durum = ? AND kira_bitis >= ? GROUP BY istemci",
+            (CALISIYOR, simdi))}
+        uygunlar = []
+        for istemci, oncelik in adaylar:
+            adet, son = yurutulen.get(istemci, (0, 0))
+            if adet < self.istemci_siniri:
+                uygunlar.append((oncelik, adet / agirlik(istemci or ""), son or 0, istemci))
+        if not uygunlar:
+            return None
+        return (min(uygunlar, key=lambda aday: aday[:3])[3],)
+
+    def kirayi_uzat(self, kimlik: str, sahip: int) -> bool:
+        """Kirayı uzatır; işin iptali istendiyse True döner."""
+        with durum.islem() as baglanti:
+            baglanti.execute("UPDATE isler SET kira_bitis = ? WHERE kimlik = ? AND sahip = ? AND durum = ?",
+                             (time.time() + self.kira_suresi, kimlik, sahip, CALISIYOR))
+            satir = baglanti.execute("SELECT iptal FROM isler WHERE kimlik = ?", (kimlik,)).fetchone()
+        return bool(satir and satir[0])
+
+    def bitir(self, kimlik: str, sahip: int, sonuc: str, basarili: bool = True, iptal: bool = False):
+        is_durumu = IPTAL if iptal else (TAMAMLANDI if basarili else HATA)
+        durum.calistir("UPDATE isler SET durum = ?, sonuc = ?, bitis = ? WHERE kimlik = ? AND sahip = ?",
+                       (is_durumu, sonuc, time.time(), kimlik, sahip))
+
+    def bekleyen_ayrildi(self, kimlik: str):
+        """
+        Sonucu bekleyen bir sunucu çağrısı iptal edildi. Başka bekleyen kalmadıysa bekleyen iş iptal edilir,
+        yürüyen işe işçinin kira yenilemesinde göreceği iptal işareti konur.
+        """
+        with durum.islem() as baglanti:
+            baglanti.execute("UPDATE isler SET bekleyen = bekleyen - 1 WHERE kimlik = ?", (kimlik,))
+            satir = baglanti.execute("SELECT arac, durum, bekleyen FROM isler WHERE kimlik = ?", (kimlik,)).fetchone()
+            if satir is None or satir[2] > 0 or satir[1] in BITMIS:
+                return
+            arac, is_durumu, _ = satir
+            if is_durumu == BEKLIYOR:
+                baglanti.execute("UPDATE isler SET durum = ?, sonuc = ?, bitis = ? WHERE kimlik = ?",
+                                 (IPTAL, IPTAL_SONUCU, time.time(), kimlik))
+            else:
+                baglanti.execute("UPDATE isler SET iptal = 1 WHERE kimlik = ?", (kimlik,))
+        logger.info("Sonucu bekleyen istemci kalmadı, iş iptal edildi: %s (%s)", kimlik, is_durumu)
+        iptal_edilen_isler.artir(arac, "kuyruk")
+
+    def geri_birak(self, kimlik: str, sahip: int):
+        """Kapanan işçinin bitiremediği işi deneme sayısını artırmadan kuyruğa geri koyar."""
+        durum.calistir("UPDATE isler SET durum = ?, sahip = NULL, kira_bitis = NULL, deneme = deneme - 1 "
+                       "WHERE kimlik = ? AND sahip = ? AND durum = ?", (BEKLIYOR, kimlik, sahip, CALISIYOR))
+
+    def bilgi(self, kimlik: str):
+        satir = durum.calistir(
+            "SELECT arac, durum, sonuc, olusturma, baslama, bitis, deneme FROM isler WHERE kimlik = ?",
+            (kimlik,)).fetchone()
+        if satir is None:
+            return None
+        arac, is_durumu, sonuc, olusturma, baslama, bitis, deneme = satir
+        bilgi = {"is_kimligi": kimlik, "arac": arac, "is_durumu": is_durumu, "deneme": deneme,
+                 "kuyrukta_bekleme_sn": round((baslama or time.time()) - olusturma, 3)}
+        if is_durumu == BEKLIYOR:
+            bilgi["sira"] = durum.calistir("SELECT COUNT(*) FROM isler WHERE durum = ? AND olusturma <= ?",
+                                           (BEKLIYOR, olusturma)).fetchone()[0]
+        if bitis is not None and baslama is not None:
+            bilgi["calisma_sn"] = round(bitis - baslama, 3)
+        if sonuc is not None:
+            bilgi["sonuc"] = sonuc
+        return bilgi
+
+    def sayilar(self) -> dict:
+        return dict(durum.calistir("SELECT durum, COUNT(*) FROM isler GROUP BY durum").fetchall())
+
+    def eskileri_temizle(self) -> int:
+        sinir = time.time() - self.saklama_suresi
+        return durum.calistir("DELETE FROM isler WHERE durum IN (?, ?, ?) AND bitis < ?", (*BITMIS, sinir)).rowcount
+
+    def _durum_ve_sonuc(self, kimlik: str):
+        return durum.calistir("SELECT durum, sonuc FROM isler WHERE kimlik = ?", (kimlik,)).fetchone()
+
+    async def sonucu_bekle(self, kimlik: str, zaman_asimi: float) -> str | None:
+        """İş bitene kadar kuyruğu yoklar ve sonuç metnini döndürür; zaman aşımında None döner."""
+        bekleme = 0.1
+        with anyio.move_on_after(zaman_asimi):
+            while True:
+                # Başka bir süreç yazma kilidini tutarken event loop beklemesin
+                satir = await anyio.to_thread.run_sync(self._durum_ve_sonuc, kimlik)
+                if satir is not None and satir[0] in BITMIS:
+                    return satir[1]
+                await asyncio.sleep(bekleme)
+                bekleme = min(bekleme * 1.5, 1.0)
+        return None
+
+
+# Tüm araçların paylaştığı kuyruk örneği
+is_kuyrugu = IsKuyrugu()
+is_kuyrugu_bekleme = metrikler.kaydet(Histogram(
+    "edumcp_is_kuyruk_bekleme_saniye", "İşin kuyruğa eklenmesinden bir işçinin almasına kadar geçen süre", ("arac",)))
+metrikler.olcer_ekle("edumcp_is_kuyrugu_bekleyen", "İş kuyruğunda bekleyen iş sayısı",
+                     lambda: is_kuyrugu.sayilar().get(BEKLIYOR, 0))
+metrikler.olcer_ekle("edumcp_is_kuyrugu_calisan", "İşçilerde yürüyen iş sayısı",
+                     lambda: is_kuyrugu.sayilar().get(CALISIYOR, 0))
+
+
+async def isi_yurut(arac: str, sure_siniri_sn: float = 0, **parametreler) -> str:
+    """
+    Medya aracının işini yürütür. Çağrının süre sınırı (sure_siniri_sn, 0 ise aracın varsayılanı; bkz.
+    app/deadlines.py) aşamalara paylaştırılır.
+
+    İş kuyruğu kapalıysa iş doğrudan bu süreçte çalışır. Sınır dolduğunda çağıran en geç SURE_TOLERANSI
+    sonra zaman aşımı yanıtı alır ve başka bekleyeni kalmayan iş iptal edilir. Aynı kaynak ve parametrelerle
+    eşzamanlı gelen çağrılar tek yürütmede birleştirilir (bkz. app/single_flight.py).
+
+    İş kuyruğu açıksa iş kuyruğa eklenir ve sonucu IS_BEKLEME_SURESI ile kalan sürenin küçüğü kadar
+    beklenir. Süre aşılırsa iş iptal edilmez: istemciye iş kimliği döner, sonuç is_durumu aracıyla alınır.
+    İş işçide kendi son tarihine kadar yürür. Özdeş çağrılar (başka sunucu süreçlerinden de) kuyrukta
+    aynı işe bağlanır; her çağıran kendi süre sınırına göre bekler.
+
+    İşler çağıran istemcinin sırasına girer (bkz. app/fair_scheduler.py). Yarıda kalan işin tamamlanmış
+    aşamaları istek anahtarıyla saklanır; aynı çağrı tekrarlanırsa iş kaldığı yerden devam eder.
+    """
+    anahtar = istek_anahtari(arac, parametreler)
+    with butce_olarak(arac, sure_siniri_sn):
+        kalan = kalan_sure()
+        if kalan > 0:
+            if IS_KUYRUGU_AKTIF:
+                return await _kuyruk_uzerinden(arac, parametreler, anahtar, min(IS_BEKLEME_SURESI, kalan))
+            with anyio.move_on_after(kalan + SURE_TOLERANSI):
+                return await tek_ucus.yurut(arac, anahtar, lambda: adil_zamanlayici.yurut(
+                    arac, lambda: kontrol_noktasiyla(anahtar, arac, lambda: isleyici(arac)(**parametreler))))
+    # Sıra, kuyruk ya da aşama içinde yanıt üretilemeden süre doldu
+    logger.warning("%s çağrısı süre sınırında tamamlanamadı", arac)
+    sure_asimlari.artir(arac, "toplam")
+    return sure_asimi_yaniti(SureAsimi(arac))
+
+
+async def _kuyruk_uzerinden(arac: str, parametreler: dict, anahtar: str, bekleme_suresi: float) -> str:
+    kimlik = await anyio.to_thread.run_sync(is_kuyrugu.ekle, arac, parametreler, anahtar,
+                                            oncelik_sinifi(arac), aktif_istemci(), aktif_son_tarih())
+    try:
+        sonuc = await is_kuyrugu.sonucu_bekle(kimlik, bekleme_suresi)
+    except asyncio.CancelledError:
+        # Süre aşımında iş kimliği istemciye döner ve iş sürer; yalnızca iptal edilen bekleyen ayrılmış sayılır
+        with anyio.CancelScope(shield=True):
+            await anyio.to_thread.run_sync(is_kuyrugu.bekleyen_ayrildi, kimlik)
+        raise
+    if sonuc is not None:
+        return sonuc
+    return json.dumps({
+        "durum": "Kuyrukta",
+        "is_kimligi": kimlik,
+        "mesaj": f"İş {int(bekleme_suresi)} sn içinde tamamlanmadı, arka planda sürüyor. "
+                 "Sonucu is_durumu aracıyla bu iş kimliğini vererek alın.",
+    }, ensure_ascii=False)
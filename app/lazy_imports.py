@@ -0,0 +1,66 @@
+import time
+import logging
+import importlib
+import threading
+import anyio
+
+logger = logging.getLogger(__name__)
+
+
+class TembelModul:
+    """
+    Ağır bir bağımlılığın yerine geçen vekil: modül ilk öznitelik erişiminde içe aktarılır, sonraki
+    erişimler doğrudan gerçek modüle gider. Böylece araç şemaları açılışta kaydedilir ama
+    google.generativeai, yt_dlp gibi paketler sadece aracın ilk çağrısında yüklenir.
+    """
+
+    def __init__(self, ad: str, yuklenince=None):
+        self._ad = ad
+        self._yuklenince = yuklenince
+        self._modul = None
+        self._kilit = threading.Lock()
+
+    @property
+    def yuklendi(self) -> bool:
+        return self._modul is not None
+
+    def yukle(self):
+        if self._modul is None:
+            with self._kilit:
+                if self._modul is None:
+                    baslangic = time.perf_counter()
+                    modul = importlib.import_module(self._ad)
+                    if self._yuklenince is not None:
+                        self._yuklenince(modul)
+                    self._modul = modul
+                    logger.info("%s ilk kullanımda yüklendi (%.0f ms)", self._ad, (time.perf_counter() - baslangic) * 1000)
+        return self._modul
+
+    def __getattr__(self, ad):
+        return getattr(self.yukle(), ad)
+
+    def __repr__(self):
+        return f"<TembelModul {self._ad} {'yüklü' if self.yuklendi else 'yüklenmedi'}>"
+
+
+def _gemini_yapilandir(modul):
+    from app.config import GEMINI_API_KEY
+    if GEMINI_API_KEY:
+        modul.configure(api_key=GEMINI_API_KEY)
+        logger.info("Gemini API başarıyla yapılandırıldı")
+
+
+genai = TembelModul("google.generativeai", yuklenince=_gemini_yapilandir)
+yt_dlp = TembelModul("yt_dlp")
+requests = TembelModul("requests")
+PyPDF2 = TembelModul("PyPDF2")
+
+
+async def hazirla(*moduller):
+    """
+    Henüz yüklenmemiş modülleri worker thread'de yükler. Araçların ilk adımıdır; ilk çağrıdaki
+    içe aktarma süresi event loop'u (ve diğer oturumları) bloklamaz.
+    """
+    for modul in moduller:
+        if not modul.yuklendi:
+            await anyio.to_thread.run_sync(modul.yukle)
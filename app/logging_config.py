@@ -0,0 +1,205 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from datetime import datetime, timezone
+from app.config import (LOG_SEVIYESI, LOG_MODUL_SEVIYELERI, LOG_BICIMI, LOG_DOSYASI, LOG_KUYRUK_BOYUTU,
+                        LOG_DEBUG_ORNEKLEME_HIZI)
+
+METIN_BICIMI = '%(asctime)s - %(levelname)s - %(name)s:%(funcName)s:%(lineno)d - %(message)s'
+
+_dinleyici = None
+
+
+class JsonBicimlendirici(logging.Formatter):
+    """Log kaydını tek satırlık JSON'a çevirir; mesaj burada, yani yazıcı thread'inde biçimlenir."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        kayit = {
+            "zaman": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "seviye": record.levelname,
+            "logger": record.name,
+            "fonksiyon": record.funcName,
+            "satir": record.lineno,
+            "mesaj": record.getMessage(),
+        }
+        iz = getattr(record, "iz_kimligi", None)
+        if iz:
+            kayit["iz_kimligi"] = iz
+        if record.exc_info:
+            kayit["istisna"] = self.formatException(record.exc_info)
+        return json.dumps(kayit, ensure_ascii=False, default=str)
+
+
+class IzKimligiFiltresi(logging.Filter):
+    """Kayda o anki isteğin iz kimliğini ekler; contextvar yalnızca kaydı üreten thread'de okunabilir."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        from app.tracing import iz_kimligi
+        record.iz_kimligi = iz_kimligi()
+        return True
+
+
+class DebugOrnekleyici(logging.Filter):
+    """
+    DEBUG kayıtlarını kaynak satır başına saniyede en fazla `hiz` adetle sınırlar.
+
+    Yoğun yük altında aynı debug satırı (ör. poll döngüsü) saniyede yüzlerce kez üretilebilir;
+    fazlası kuyruğa hiç girmeden atılır. INFO ve üzeri kayıtlar örneklenmez.
+    """
+
+    def __init__(self, hiz: float):
+        super().__init__()
+        self.hiz = hiz
+        self._kovalar = {}      # (dosya, satır) -> [kalan jeton, son dolum zamanı]
+        self._kilit = threading.Lock()
+        self.atilan = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.hiz <= 0:
+            return True
+        anahtar = (record.pathname, record.lineno)
+        simdi = time.monotonic()
+        with self._kilit:
+            kova = self._kovalar.get(anahtar)
+            if kova is None:
+                kova = self._kovalar[anahtar] = [self.hiz, simdi]
+            kova[0] = min(self.hiz, kova[0] + (simdi - kova[1]) * self.hiz)
+            kova[1] = simdi
+            if kova[0] < 1:
+                self.atilan += 1
+                return False
+            kova[0] -= 1
+            return True
+
+
+class BloklamayanKuyrukIsleyici(QueueHandler):
+    """
+    Kayıtları sınırlı bir kuyruğa bırakan, kuyruk doluysa beklemek yerine kaydı atan işleyici.
+
+    Standart QueueHandler mesajı kaydı üreten thread'de biçimler; süreç içi kuyrukta buna gerek
+    olmadığından biçimleme (f-string yerine % argümanları dahil) tamamen yazıcı thread'ine bırakılır.
+    """
+
+    def __init__(self, kuyruk):
+        super().__init__(kuyruk)
+        self.atilan = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.atilan += 1
+
+
+class JsonSatiri:
+    """Yazıcı thread'inde, kuyruktan okunurken JSON'a çevrilen kayıt (iz ve trafik dosyaları için)."""
+
+    __slots__ = ("kayit",)
+
+    def __init__(self, kayit: dict):
+        self.kayit = kayit
+
+    def __str__(self):
+        return json.dumps(self.kayit, ensure_ascii=False, default=str)
+
+
+def jsonl_yazicisi(ad: str, dosya: str, maks_bayt: int, yedek_sayisi: int) -> logging.Logger:
+    """
+    Satır satır JSON yazan, boyuta göre dönen bir dosya logger'ı kurar; kayıtlar uygulama loglarına karışmaz.
+    Dosya yazımı uygulama loglarında olduğu gibi kuyruk üzerinden arka plan thread'inde yapılır.
+    Kullanım: yazici.info("%s", JsonSatiri(kayit))
+    """
+    yazici = logging.getLogger(ad)
+    yazici.setLevel(logging.INFO)
+    yazici.propagate = False
+    if not yazici.handlers:
+        klasor = os.path.dirname(dosya)
+        if klasor:
+            os.makedirs(klasor, exist_ok=True)
+        dosya_isleyici = RotatingFileHandler(dosya, maxBytes=maks_bayt, backupCount=yedek_sayisi, encoding="utf-8")
+        dosya_isleyici.setFormatter(logging.Formatter("%(message)s"))
+        kuyruk = queue.Queue(maxsize=LOG_KUYRUK_BOYUTU)
+        yazici.addHandler(BloklamayanKuyrukIsleyici(kuyruk))
+        dinleyici = QueueListener(kuyruk, dosya_isleyici)
+        dinleyici.start()
+        atexit.register(dinleyici.stop)
+    return yazici
+
+
+class YtDlpLogger:
+    """yt-dlp çıktısını stdout yerine uygulama log hattına yönlendirir (ydl_opts['logger'])."""
+
+    def __init__(self):
+        self._logger = logging.getLogger("yt_dlp")
+
+    def debug(self, mesaj):
+        # yt-dlp info mesajlarını da debug() ile "[info] " önekiyle gönderir
+        if mesaj.startswith("[debug] "):
+            self._logger.debug("%s", mesaj)
+        else:
+            self._logger.info("%s", mesaj)
+
+    def info(self, mesaj):
+        self._logger.info("%s", mesaj)
+
+    def warning(self, mesaj):
+        self._logger.warning("%s", mesaj)
+
+    def error(self, mesaj):
+        self._logger.error("%s", mesaj)
+
+
+def _modul_seviyelerini_uygula(tanim: str):
+    """"app.tools=DEBUG,yt_dlp=WARNING" biçimindeki tanımı logger seviyelerine uygular."""
+    for parca in filter(None, (p.strip() for p in tanim.split(","))):
+        ad, _, seviye = parca.partition("=")
+        if ad and seviye:
+            logging.getLogger(ad.strip()).setLevel(seviye.strip().upper())
+
+
+def loglamayi_kur():
+    """
+    Kök logger'ı kuyruk tabanlı, bloklamayan hatta bağlar. Birden fazla çağrılırsa ilk kurulum korunur.
+
+    Uygulama thread'leri (event loop, anyio worker'ları) yalnızca kaydı kuyruğa bırakır; biçimleme ve
+    stderr/dosya yazımı arka plandaki QueueListener thread'inde yapılır.
+    """
+    global _dinleyici
+    if _dinleyici is not None:
+        return
+
+    bicimlendirici = JsonBicimlendirici() if LOG_BICIMI == "json" else logging.Formatter(METIN_BICIMI)
+    hedefler = [logging.StreamHandler(sys.stderr)]
+    if LOG_DOSYASI:
+        klasor = os.path.dirname(LOG_DOSYASI)
+        if klasor:
+            os.makedirs(klasor, exist_ok=True)
+        hedefler.append(RotatingFileHandler(LOG_DOSYASI, maxBytes=50 * 1024 * 1024, backupCount=5, encoding="utf-8"))
+    for hedef in hedefler:
+        hedef.setFormatter(bicimlendirici)
+
+    kuyruk = queue.Queue(maxsize=LOG_KUYRUK_BOYUTU)
+    kuyruk_isleyici = BloklamayanKuyrukIsleyici(kuyruk)
+    kuyruk_isleyici.addFilter(DebugOrnekleyici(LOG_DEBUG_ORNEKLEME_HIZI))
+    kuyruk_isleyici.addFilter(IzKimligiFiltresi())
+
+    kok = logging.getLogger()
+    for eski in list(kok.handlers):
+        kok.removeHandler(eski)
+    kok.addHandler(kuyruk_isleyici)
+    kok.setLevel(LOG_SEVIYESI)
+    _modul_seviyelerini_uygula(LOG_MODUL_SEVIYELERI)
+
+    _dinleyici = QueueListener(kuyruk, *hedefler, respect_handler_level=True)
+    _dinleyici.start()
+    # Kapanışta kuyrukta kalan kayıtlar yazılır
+    atexit.register(_dinleyici.stop)
@@ -0,0 +1,290 @@
+import os
+import json
+import time
+import functools
+import threading
+from contextlib import contextmanager
+from app import tracing, traffic_recorder
+
+# Aşama süreleri için saniye cinsinden kova sınırları (yt-dlp indirmeleri dakikalar sürebilir)
+SURE_KOVALARI = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+# Yüklenen bayt için kova sınırları (1 KB - 500 MB)
+BAYT_KOVALARI = tuple(1024 * 4 ** i for i in range(11))
+# Tek çağrıdaki token sayısı için kova sınırları
+TOKEN_KOVALARI = (100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 1000000)
+
+
+def _etiket_metni(etiket_adlari: tuple, degerler: tuple, ek: dict = None) -> str:
+    ciftler = list(zip(etiket_adlari, degerler)) + list((ek or {}).items())
+    if not ciftler:
+        return ""
+    kacisli = (str(d).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, d in ciftler)
+    return "{" + ",".join(f'{ad}="{d}"' for (ad, _), d in zip(ciftler, kacisli)) + "}"
+
+
+class Sayac:
+    """Sadece artan sayaç (Prometheus counter)."""
+
+    tur = "counter"
+
+    def __init__(self, ad: str, aciklama: str, etiketler: tuple = ()):
+        self.ad = ad
+        self.aciklama = aciklama
+        self.etiketler = etiketler
+        self._degerler = {}
+        self._kilit = threading.Lock()
+
+    def artir(self, *etiket_degerleri, miktar: float = 1):
+        with self._kilit:
+            self._degerler[etiket_degerleri] = self._degerler.get(etiket_degerleri, 0) + miktar
+
+    def satirlar(self) -> list:
+        with self._kilit:
+            return [f"{self.ad}{_etiket_metni(self.etiketler, e)} {d}" for e, d in sorted(self._degerler.items())]
+
+
+class Histogram:
+    """Kümülatif kovalı dağılım ölçer (Prometheus histogram)."""
+
+    tur = "histogram"
+
+    def __init__(self, ad: str, aciklama: str, etiketler: tuple = (), kovalar: tuple = SURE_KOVALARI):
+        self.ad = ad
+        self.aciklama = aciklama
+        self.etiketler = etiketler
+        self.kovalar = tuple(sorted(kovalar))
+        self._seriler = {}      # etiket değerleri -> [kova sayıları, toplam, adet]
+        self._kilit = threading.Lock()
+
+    def gozlemle(self, deger: float, *etiket_degerleri):
+        with self._kilit:
+            seri = self._seriler.get(etiket_degerleri)
+            if seri is None:
+                seri = self._seriler[etiket_degerleri] = [[0] * len(self.kovalar), 0.0, 0]
+            for i, sinir in enumerate(self.kovalar):
+                if deger <= sinir:
+                    seri[0][i] += 1
+            seri[1] += deger
+            seri[2] += 1
+
+    def satirlar(self) -> list:
+        satirlar = []
+        with self._kilit:
+            for e, (kova_sayilari, toplam, adet) in sorted(self._seriler.items()):
+                for sinir, sayi in zip(self.kovalar, kova_sayilari):
+                    satirlar.append(f"{self.ad}_bucket{_etiket_metni(self.etiketler, e, {'le': sinir})} {sayi}")
+                satirlar.append(f"{self.ad}_bucket{_etiket_metni(self.etiketler, e, {'le': '+Inf'})} {adet}")
+                satirlar.append(f"{self.ad}_sum{_etiket_metni(self.etiketler, e)} {toplam}")
+                satirlar.append(f"{self.ad}_count{_etiket_metni(self.etiketler, e)} {adet}")
+        return satirlar
+
+
+class AnlikOlcer:
+    """Değeri her okumada bir fonksiyondan alınan ölçer - kuyruk derinliği, depo istatistikleri gibi."""
+
+    def __init__(self, ad: str, aciklama: str, fonksiyon, tur: str = "gauge"):
+        self.ad = ad
+        self.aciklama = aciklama
+        self.fonksiyon = fonksiyon
+        self.tur = tur
+
+    def satirlar(self) -> list:
+        try:
+            return [f"{self.ad} {float(self.fonksiyon())}"]
+        except Exception:
+            return []
+
+
+_aktarim = threading.local()
+
+
+def aktarim_basina(fonksiyon):
+    """
+    Birden çok ölçerin ortak kaynağını (ör. depo istatistikleri) tek bir dışa aktarım boyunca bir kez
+    hesaplatan sarmalayıcı döndürür. Dışa aktarım dışında her çağrıda fonksiyon yeniden çalışır.
+    """
+    @functools.wraps(fonksiyon)
+    def sarmalayici():
+        onbellek = getattr(_aktarim, "onbellek", None)
+        if onbellek is None:
+            return fonksiyon()
+        if sarmalayici not in onbellek:
+            onbellek[sarmalayici] = fonksiyon()
+        return onbellek[sarmalayici]
+    return sarmalayici
+
+
+class MetrikKayitDefteri:
+    def __init__(self):
+        self._metrikler = {}
+        self._kilit = threading.Lock()
+
+    def kaydet(self, metrik):
+        with self._kilit:
+            # Aynı adla tekrar kayıt (ör. izleyicinin yeniden oluşturulması) öncekinin yerine geçer
+            self._metrikler[metrik.ad] = metrik
+        return metrik
+
+    def olcer_ekle(self, ad: str, aciklama: str, fonksiyon, tur: str = "gauge"):
+        return self.kaydet(AnlikOlcer(ad, aciklama, fonksiyon, tur))
+
+    def disa_aktar(self) -> str:
+        """
+        Tüm metrikleri Prometheus metin biçiminde (0.0.4) döndürür. Anlık ölçerler SQLite ve disk okuyabildiği
+        için olay döngüsünden değil thread'den çağırın.
+        """
+        with self._kilit:
+            metrikler = list(self._metrikler.values())
+        satirlar = []
+        _aktarim.onbellek = {}
+        try:
+            for metrik in metrikler:
+                satirlar.append(f"# HELP {metrik.ad} {metrik.aciklama}")
+                satirlar.append(f"# TYPE {metrik.ad} {metrik.tur}")
+                satirlar.extend(metrik.satirlar())
+        finally:
+            _aktarim.onbellek = None
+        return "\n".join(satirlar) + "\n"
+
+
+def _isci_etiketi_ekle(satir: str, pid) -> str:
+    seri, _, deger = satir.rpartition(" ")
+    if seri.endswith("}"):
+        return f'{seri[:-1]},isci="{pid}"}} {deger}'
+    return f'{seri}{{isci="{pid}"}} {deger}'
+
+
+def anliklari_birlestir(anliklar: dict) -> str:
+    """
+    Çok süreçli çalışmada işçilerin metrik metinlerini (pid -> metin) tek çıktıda birleştirir. Her örneğe
+    isci="<pid>" etiketi eklenir; HELP/TYPE satırları metrik başına bir kez yazılır.
+    """
+    aileler = {}        # metrik adı -> [başlık satırları, örnek satırları]
+    for pid, metin in sorted(anliklar.items()):
+        aile, yeni = None, False
+        for satir in metin.splitlines():
+            if satir.startswith("# HELP "):
+                ad = satir.split(" ", 3)[2]
+                aile = aileler.get(ad)
+                if aile is None:
+                    aile = aileler[ad] = [[satir], []]
+                    yeni = True
+                else:
+                    yeni = False
+            elif satir.startswith("#"):
+                if yeni:
+                    aile[0].append(satir)
+            elif satir and aile is not None:
+                aile[1].append(_isci_etiketi_ekle(satir, pid))
+    return "\n".join(satir for basliklar, ornekler in aileler.values() for satir in basliklar + ornekler) + "\n"
+
+
+# Tüm modüllerin paylaştığı kayıt defteri
+metrikler = MetrikKayitDefteri()
+
+asama_suresi = metrikler.kaydet(Histogram(
+    "edumcp_asama_suresi_saniye", "Araç hattındaki her aşamanın süresi (saniye)", ("arac", "asama", "sonuc")))
+yuklenen_bayt = metrikler.kaydet(Histogram(
+    "edumcp_yuklenen_bayt", "Gemini File API'ye yüklenen dosya boyutu (bayt)", ("arac",), BAYT_KOVALARI))
+token_sayisi = metrikler.kaydet(Histogram(
+    "edumcp_token_sayisi", "Tek model çağrısındaki giriş/çıkış token sayısı", ("arac", "yon"), TOKEN_KOVALARI))
+token_toplam = metrikler.kaydet(Sayac(
+    "edumcp_token_toplam", "Model çağrılarında harcanan toplam token", ("arac", "yon")))
+onbellek_istekleri = metrikler.kaydet(Sayac(
+    "edumcp_onbellek_istek_toplam", "Sonuç önbelleği sorguları (isabet, turetildi, iskalama)", ("arac", "sonuc")))
+arac_cagrilari = metrikler.kaydet(Sayac(
+    "edumcp_arac_cagri_toplam", "Araç çağrıları ve sonuç durumları", ("arac", "durum")))
+plan_kararlari = metrikler.kaydet(Sayac(
+    "edumcp_plan_karari_toplam", "Ön planlayıcının seçtiği stratejiler", ("arac", "strateji")))
+model_cagrilari = metrikler.kaydet(Sayac(
+    "edumcp_model_cagri_toplam", "Model bazında üretim çağrıları (basarili, hata, yedege_gecis)", ("arac", "model", "sonuc")))
+
+
+def _islem_bellegi() -> float:
+    """Sürecin o anki yerleşik bellek kullanımı (bayt); Linux dışında tepe değer kullanılır."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource  # Windows'ta yok; bu durumda ölçer boş döner
+        tepe = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS bayt, Linux KB döndürür
+        return tepe if os.uname().sysname == "Darwin" else tepe * 1024
+
+
+metrikler.olcer_ekle("edumcp_islem_cpu_saniye_toplam", "Sürecin harcadığı toplam CPU süresi (kullanıcı + sistem)",
+                     lambda: sum(os.times()[:2]), "counter")
+metrikler.olcer_ekle("edumcp_islem_bellek_bayt", "Sürecin yerleşik bellek kullanımı (bayt)", _islem_bellegi)
+metrikler.olcer_ekle("edumcp_islem_thread_sayisi", "Süreçteki thread sayısı (anyio worker'ları dahil)", threading.active_count)
+
+
+@contextmanager
+def asama(arac: str, asama_adi: str, **ozellikler):
+    """
+    Bloğun süresini aşama histogramına yazar ve aynı blok için isteğin izinde bir span açar;
+    blok istisna ile çıkarsa sonuc="hata" etiketlenir. Açılan span döndürülür.
+
+    Örnek:
+        with asama("pdf", "yukleme", mime_type="application/pdf") as s:
+            pdf_file = await dosya_yukle(...)
+            s.ozellik_ekle(uzak_dosya=pdf_file.name)
+    """
+    baslangic = time.perf_counter()
+    sonuc = "basarili"
+    aktif = None
+    try:
+        with tracing.span(f"{arac}.{asama_adi}", **ozellikler) as aktif:
+            yield aktif
+    except BaseException:
+        sonuc = "hata"
+        raise
+    finally:
+        sure = time.perf_counter() - baslangic
+        asama_suresi.gozlemle(sure, arac, asama_adi, sonuc)
+        # Blok içinde span'a sonradan eklenen özellikler (ör. indirilen dosya boyutu) de kayda geçer
+        traffic_recorder.asama_ekle(arac, asama_adi, sure, sonuc, aktif.ozellikler if aktif else ozellikler)
+
+
+def token_kullanimini_kaydet(arac: str, yanit):
+    """Model yanıtındaki usage_metadata'dan giriş/çıkış token sayılarını kaydeder."""
+    kullanim = getattr(yanit, "usage_metadata", None)
+    if kullanim is None:
+        return
+    for yon, alan in (("giris", "prompt_token_count"), ("cikis", "candidates_token_count")):
+        adet = getattr(kullanim, alan, None)
+        if adet:
+            token_sayisi.gozlemle(adet, arac, yon)
+            token_toplam.artir(arac, yon, miktar=adet)
+            traffic_recorder.token_ekle(yon, adet)
+
+
+def arac_olcumu(arac: str):
+    """
+    Aracın _..._logic fonksiyonunu sarar: toplam süreyi "toplam" aşaması olarak, dönen JSON'daki
+    durumu da çağrı sayacına yazar. Araç, toplu işlem ve ön ısıtma çağrılarının hepsi ölçülür.
+    Her çağrı bir iz (trace) başlatır; aşama span'ları bu izin altında toplanır.
+    """
+    def dekorator(fonksiyon):
+        @functools.wraps(fonksiyon)
+        async def sarmalayici(*args, **kwargs):
+            baslangic = time.perf_counter()
+            durum = "Hata"
+            try:
+                with tracing.span(f"{arac}.cagri", arac=arac, **{k: str(v)[:200] for k, v in kwargs.items()}) as kok:
+                    sonuc = await fonksiyon(*args, **kwargs)
+                    try:
+                        cevap = json.loads(sonuc)
+                        durum = cevap.get("durum", "Bilinmiyor")
+                    except (TypeError, ValueError, AttributeError):
+                        cevap, durum = {}, "Bilinmiyor"
+                    if durum != "Başarılı":
+                        # Araçlar hataları istisna yerine JSON ile döndürür; izde de hata olarak görünsün
+                        kok.durum = "hata"
+                        kok.hata = cevap.get("mesaj")
+                    return sonuc
+            finally:
+                sonuc_etiketi = "basarili" if durum == "Başarılı" else "hata"
+                asama_suresi.gozlemle(time.perf_counter() - baslangic, arac, "toplam", sonuc_etiketi)
+                arac_cagrilari.artir(arac, durum)
+        return sarmalayici
+    return dekorator
@@ -0,0 +1,31 @@
+import os
+import anyio
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, JSONResponse
+from app.server import mcp
+from app.config import SUNUCU_ISCI_SAYISI, IS_KUYRUGU_AKTIF
+from app.metrics import metrikler, anliklari_birlestir
+from app.shared_state import durum
+from app.rate_limiter import kota_sinirlayici
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrikleri_getir(request: Request) -> PlainTextResponse:
+    """
+    Aşama süreleri, yüklenen bayt, token kullanımı, önbellek isabetleri ve kuyruk derinliklerini
+    Prometheus metin biçiminde döndürür. MCP uç noktasıyla aynı HTTP uygulamasında (:8000/metrics) sunulur.
+    Çok süreçli çalışmada ya da iş kuyruğu açıkken isteği hangi süreç karşılarsa karşılasın tüm canlı
+    sunucu ve kuyruk işçilerinin metrikleri, isci="<pid>" etiketiyle birlikte döner.
+    """
+    metin = await anyio.to_thread.run_sync(metrikler.disa_aktar)
+    if SUNUCU_ISCI_SAYISI > 1 or IS_KUYRUGU_AKTIF:
+        anliklar = await anyio.to_thread.run_sync(durum.metrik_anliklari)
+        metin = anliklari_birlestir(anliklar | {os.getpid(): metin})
+    return PlainTextResponse(metin, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@mcp.custom_route("/kota", methods=["GET"])
+async def kota_butcesi(request: Request) -> JSONResponse:
+    """Gemini istek/token/yükleme kovalarında kalan payı ve kota için sırada bekleyen çağrı sayısını döndürür."""
+    butce = await anyio.to_thread.run_sync(kota_sinirlayici.butce)
+    return JSONResponse(butce)
@@ -0,0 +1,133 @@
+import json
+import time
+import functools
+import logging
+import anyio
+from app.lazy_imports import genai
+from app import tracing
+from app.config import MODEL_HIZLI, MODEL_PRO, MODEL_ROTA_DOSYASI, MODEL_SOGUMA_SURESI
+from app.metrics import model_cagrilari
+from app.rate_limiter import kota_sinirlayici, oncelik_sinifi, token_tahmini
+from app.cancellation import thread_calistir
+from app.deadlines import kalan_sure, cagri_zaman_asimi
+
+logger = logging.getLogger(__name__)
+
+# Kurallar sırayla denenir, ilk eşleşen kural kullanılır. "modeller" listesinin ilki birincil model,
+# kalanlar kota/aşırı yük hatasında sırayla denenen yedeklerdir. "hizli" ve "pro" takma adları
+# MODEL_HIZLI / MODEL_PRO değerlerine çözülür; tam model adı da yazılabilir.
+# Koşullar (hepsi isteğe bağlı): katman (ozet_tipi/cikti_tipi), zorluk, maks_girdi_mb, maks_soru_sayisi.
+VARSAYILAN_ROTALAR = [
+    {"arac": "pdf", "katman": ["kisa"], "modeller": ["hizli", "pro"]},
+    {"arac": "pdf", "katman": ["genis"], "maks_girdi_mb": 10, "modeller": ["hizli", "pro"]},
+    {"arac": "ses", "katman": ["transkript"], "modeller": ["hizli", "pro"]},
+    {"arac": "video", "katman": ["kisa"], "modeller": ["hizli", "pro"]},
+    {"arac": "soru", "zorluk": ["kolay", "orta"], "maks_soru_sayisi": 10, "modeller": ["hizli", "pro"]},
+    {"arac": "*", "modeller": ["pro", "hizli"]},
+]
+
+MODEL_TAKMA_ADLARI = {"hizli": MODEL_HIZLI, "pro": MODEL_PRO}
+# Başka modele geçmeyi gerektiren geçici hatalar (kota aşımı, aşırı yük, sunucu hatası)
+GECICI_HATA_KODLARI = {429, 500, 503}
+GECICI_HATA_IFADELERI = ("resource has been exhausted", "quota", "overloaded", "unavailable", "try again later")
+# Yedek modelin denenmesi için çağrının süre bütçesinde kalması gereken en az süre (sn)
+YEDEK_MIN_SURE = 5
+
+# Model adı -> yeniden birincil sayılacağı zaman (time.monotonic)
+_soguma = {}
+
+
+def _rotalari_yukle() -> list:
+    if not MODEL_ROTA_DOSYASI:
+        return VARSAYILAN_ROTALAR
+    try:
+        with open(MODEL_ROTA_DOSYASI, encoding="utf-8") as f:
+            rotalar = json.load(f)
+        logger.info("Model rota tablosu yüklendi: %s (%s kural)", MODEL_ROTA_DOSYASI, len(rotalar))
+        return rotalar
+    except (OSError, ValueError) as e:
+        logger.error("Model rota tablosu okunamadı, varsayılan tablo kullanılıyor: %s", e)
+        return VARSAYILAN_ROTALAR
+
+
+ROTALAR = _rotalari_yukle()
+
+
+def _eslesir(kural: dict, arac: str, katman: str, girdi_boyutu: int, zorluk: str, soru_sayisi: int) -> bool:
+    if kural.get("arac", "*") not in ("*", arac):
+        return False
+    if "katman" in kural and katman not in kural["katman"]:
+        return False
+    if "zorluk" in kural and zorluk not in kural["zorluk"]:
+        return False
+    if "maks_girdi_mb" in kural and girdi_boyutu > kural["maks_girdi_mb"] * 1024 * 1024:
+        return False
+    if "maks_soru_sayisi" in kural and (soru_sayisi or 0) > kural["maks_soru_sayisi"]:
+        return False
+    return True
+
+
+def rota_sec(arac: str, katman: str = None, girdi_boyutu: int = 0, zorluk: str = None, soru_sayisi: int = None) -> list:
+    """İş için denenecek modelleri öncelik sırasıyla döndürür (ilk eleman birincil model)."""
+    for kural in ROTALAR:
+        if _eslesir(kural, arac, katman, girdi_boyutu, zorluk, soru_sayisi):
+            modeller = [MODEL_TAKMA_ADLARI.get(m, m) for m in kural["modeller"]]
+            # Takma adlar aynı modele çözülürse tekrar denenmez
+            modeller = list(dict.fromkeys(modeller))
+            logger.debug("Model rotası - arac: %s, katman: %s, boyut: %s, zorluk: %s -> %s",
+                         arac, katman, girdi_boyutu, zorluk, modeller)
+            return modeller
+    return [MODEL_PRO]
+
+
+def gecici_hata_mi(hata: Exception) -> bool:
+    """Kota aşımı (429) ve aşırı yük/sunucu hatalarını (500, 503) tanır; bu hatalarda yedek modele geçilir."""
+    kod = getattr(hata, "code", None)
+    try:
+        if int(kod) in GECICI_HATA_KODLARI:
+            return True
+    except (TypeError, ValueError):
+        pass
+    metin = str(hata).lower()
+    return any(ifade in metin for ifade in GECICI_HATA_IFADELERI)
+
+
+def _soguyanlari_sona_al(modeller: list) -> list:
+    """Yakın zamanda kota/aşırı yük hatası veren modelleri, soğuma süresi bitene kadar sıranın sonuna alır."""
+    simdi = time.monotonic()
+    hazir = [m for m in modeller if _soguma.get(m, 0) <= simdi]
+    return hazir + [m for m in modeller if m not in hazir]
+
+
+async def icerik_uret(arac: str, modeller: list, icerik, tahmini_token: int = None):
+    """
+    generate_content'i sıradaki modelle çağırır; geçici hatada modeli soğumaya alıp bir sonrakini dener.
+    Geçici olmayan hatalar ve son modelin hatası olduğu gibi yükseltilir. Kullanılan model açık span'a yazılır.
+
+    Her deneme önce ortak kotadan istek ve token payı alır. Dosya içeren çağrılarda tahmini_token (planın
+    giriş + çıkış tahmini) verilmelidir; verilmezse metin parçalarından tahmin edilir. Çağıran iptal
+    edilirse yanıt beklenmez; yedek modeller denenmez. Çağrının süre bütçesinde YEDEK_MIN_SURE'den az
+    kaldıysa yedeğe geçilmez, hata olduğu gibi yükseltilir.
+    """
+    sirali = _soguyanlari_sona_al(modeller)
+    token = tahmini_token or token_tahmini(icerik)
+    for deneme, model_adi in enumerate(sirali, 1):
+        await kota_sinirlayici.izin(oncelik_sinifi(arac), token=token)
+        model = genai.GenerativeModel(model_name=model_adi)
+        try:
+            # Süre dolunca bırakılan çağrı thread'ini ve bağlantısını bütçenin sonunda kendisi de bırakır
+            zaman_asimi = cagri_zaman_asimi()
+            secenekler = {} if zaman_asimi is None else {"request_options": {"timeout": zaman_asimi}}
+            yanit = await thread_calistir(functools.partial(model.generate_content, icerik, **secenekler))
+        except Exception as e:
+            if deneme == len(sirali) or not gecici_hata_mi(e) or kalan_sure() < YEDEK_MIN_SURE:
+                model_cagrilari.artir(arac, model_adi, "hata")
+                raise
+            _soguma[model_adi] = time.monotonic() + MODEL_SOGUMA_SURESI
+            await anyio.to_thread.run_sync(kota_sinirlayici.geri_cekil)
+            model_cagrilari.artir(arac, model_adi, "yedege_gecis")
+            logger.warning("%s modeli kullanılamıyor (%s), %s modeline geçiliyor", model_adi, e, sirali[deneme])
+            continue
+        model_cagrilari.artir(arac, model_adi, "basarili")
+        tracing.ozellik_ekle(model=model.model_name, model_denemesi=deneme)
+        return yanit
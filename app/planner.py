@@ -0,0 +1,295 @@
+import os
+import math
+import wave
+import struct
+import asyncio
+import logging
+import anyio
+from app.config import PLAN_BAGLAM_TOKEN, PLAN_MAKS_CIKIS_TOKEN, PLAN_METIN_ESIGI_TOKEN
+from app.metrics import plan_kararlari, token_kullanimini_kaydet
+from app.model_routing import icerik_uret
+from app.deadlines import kalan_sure, SureAsimi
+from app.checkpoints import asama_ciktisi, asama_kaydet
+from app.lazy_imports import PyPDF2
+
+try:
+    from mutagen import File as MutagenFile
+except ImportError:  # İsteğe bağlı: yoksa süre dosya boyutundan alttan tahmin edilir
+    MutagenFile = None
+
+logger = logging.getLogger(__name__)
+
+STRATEJI_DOGRUDAN = "dogrudan"          # Dosya Gemini'ye yüklenir, tek çağrıda işlenir
+STRATEJI_METIN = "yalnizca_metin"       # Yükleme yapılmaz; yerelde çıkarılan metin (PDF metni, altyazı) gönderilir
+STRATEJI_PARCALI = "parcali"            # Metin parçalara bölünür, parça sonuçları son bir çağrıda birleştirilir
+STRATEJI_RET = "reddet"                 # İstek model sınırlarını aşar; ağ işi yapılmadan hata döner
+
+# Gemini 1.5 belgelerindeki sabit token oranları
+PDF_SAYFA_TOKEN = 258
+SES_SANIYE_TOKEN = 32
+VIDEO_SANIYE_TOKEN = 263
+KARAKTER_BASINA_TOKEN = 0.25
+# Talimat (prompt) metninin payı
+ISTEM_TOKEN = 1500
+# Parçalı üretimde parça çağrılarına ayrılan süre payı; kalanı birleştirme çağrısı içindir
+PARCA_SURE_PAYI = 0.75
+PDF_MAKS_SAYFA = 1000
+SES_MAKS_SANIYE = 9.5 * 3600
+# Dakikada ~150 kelimelik konuşmanın yazıya dökülmüş halinin saniyedeki token karşılığı
+KONUSMA_SANIYE_TOKEN = 3.5
+# Sayfa başına bundan az karakter çıkan PDF'ler taranmış (metin katmanı yok) sayılır
+METIN_KATMANI_ESIGI = 200
+ORNEK_SAYFA_SAYISI = 10
+# Parçalı işlemede her parça bağlamın bu oranını kullanır (talimat ve yanıt payı)
+PARCA_DOLULUK_ORANI = 0.8
+
+# Katman başına tahmini çıktı tokenı (ses transkripti süreyle ayrıca hesaplanır)
+CIKIS_TAHMINI = {
+    "pdf": {"kisa": 600, "genis": 3000, "kapsamli": 4500},
+    "video": {"kisa": 600, "kapsamli": 4500},
+    "ses": {"ozet": 4500},
+}
+VARSAYILAN_CIKIS_TAHMINI = 4500
+# Metinle yetinilebilecek katmanlar: görsel içerik (tablo, grafik, sahne) gerektirmez
+METINLE_YETINEN_KATMANLAR = {"pdf": {"kisa", "genis"}, "video": {"kisa"}}
+
+# Süresi başlıktan okunamayan dosyalar için üst sınır bit hızları (bit/sn). Süre alttan tahmin edilir;
+# böylece sadece kesin olarak sınırı aşan dosyalar reddedilir.
+UST_BIT_HIZLARI = {
+    ".mp3": 320_000, ".m4a": 512_000, ".aac": 512_000, ".ogg": 512_000, ".webm": 8_000_000,
+    ".flac": 4_608_000, ".mkv": 8_000_000, ".avi": 8_000_000, ".flv": 8_000_000,
+}
+VARSAYILAN_UST_BIT_HIZI = 8_000_000
+
+
+def _plan(arac: str, strateji: str, gerekce: str, giris_token: float, cikis_token: float, **ayrintilar) -> dict:
+    plan_kararlari.artir(arac, strateji)
+    plan = {
+        "strateji": strateji,
+        "gerekce": gerekce,
+        "tahmini_giris_token": int(giris_token),
+        "tahmini_cikis_token": int(cikis_token),
+    }
+    plan.update(ayrintilar)
+    logger.info("Plan (%s): %s - %s", arac, strateji, gerekce)
+    return plan
+
+
+def plan_tokeni(plan):
+    """Planın giriş + çıkış token tahmini (kota payı için); plan yoksa None."""
+    if not plan:
+        return None
+    return plan["tahmini_giris_token"] + plan["tahmini_cikis_token"] or None
+
+
+def _cikis_siniri_asiliyor(arac: str, cikis_token: float):
+    return _plan(arac, STRATEJI_RET, f"Tahmini çıktı ({int(cikis_token)} token) model çıktı sınırını "
+                 f"({PLAN_MAKS_CIKIS_TOKEN} token) aşıyor.", 0, cikis_token)
+
+
+def pdf_plani(yol: str, ozet_tipi: str) -> dict:
+    """Sayfa sayısı ve örnek sayfaların metin yoğunluğundan PDF için strateji seçer (senkron, thread'de çağrılır)."""
+    try:
+        okuyucu = PyPDF2.PdfReader(yol)
+        if okuyucu.is_encrypted:
+            return _plan("pdf", STRATEJI_RET, "PDF şifreli; şifresi kaldırılmış bir kopya yükleyin.", 0, 0)
+        sayfa_sayisi = len(okuyucu.pages)
+        ornekler = [okuyucu.pages[i] for i in range(min(sayfa_sayisi, ORNEK_SAYFA_SAYISI))]
+        sayfa_basina_karakter = sum(len(s.extract_text() or "") for s in ornekler) / max(1, len(ornekler))
+    except Exception as e:
+        return _plan("pdf", STRATEJI_RET, f"PDF okunamadı, bozuk olabilir: {e}", 0, 0)
+
+    metin_katmani = sayfa_basina_karakter >= METIN_KATMANI_ESIGI
+    gorsel_token = sayfa_sayisi * PDF_SAYFA_TOKEN + ISTEM_TOKEN
+    metin_token = sayfa_sayisi * sayfa_basina_karakter * KARAKTER_BASINA_TOKEN + ISTEM_TOKEN
+    cikis_token = CIKIS_TAHMINI["pdf"].get(ozet_tipi, VARSAYILAN_CIKIS_TAHMINI)
+    ayrintilar = {"sayfa_sayisi": sayfa_sayisi, "metin_katmani": metin_katmani}
+
+    if cikis_token > PLAN_MAKS_CIKIS_TOKEN:
+        return _cikis_siniri_asiliyor("pdf", cikis_token)
+    if sayfa_sayisi > PDF_MAKS_SAYFA or gorsel_token > PLAN_BAGLAM_TOKEN:
+        if not metin_katmani:
+            return _plan("pdf", STRATEJI_RET, f"{sayfa_sayisi} sayfalık taranmış PDF model sınırlarını aşıyor; "
+                         "belgeyi daha küçük parçalara bölün.", gorsel_token, cikis_token, **ayrintilar)
+        if metin_token <= PLAN_BAGLAM_TOKEN:
+            return _plan("pdf", STRATEJI_METIN, "Belge dosya olarak sınırı aşıyor, metni tek çağrıya sığıyor.",
+                         metin_token, cikis_token, **ayrintilar)
+        parca_sayisi = math.ceil((metin_token - ISTEM_TOKEN) / (PLAN_BAGLAM_TOKEN * PARCA_DOLULUK_ORANI - ISTEM_TOKEN))
+        return _plan("pdf", STRATEJI_PARCALI, f"Belge metni bağlama sığmıyor, {parca_sayisi} parçada işlenecek.",
+                     metin_token, cikis_token * (parca_sayisi + 1), parca_sayisi=parca_sayisi, **ayrintilar)
+    if metin_katmani and ozet_tipi in METINLE_YETINEN_KATMANLAR["pdf"] and metin_token <= PLAN_METIN_ESIGI_TOKEN:
+        return _plan("pdf", STRATEJI_METIN, "Küçük, metin katmanlı belge; yükleme ve işleme beklemesi atlanıyor.",
+                     metin_token, cikis_token, **ayrintilar)
+    return _plan("pdf", STRATEJI_DOGRUDAN, "Belge model sınırları içinde.", gorsel_token, cikis_token, **ayrintilar)
+
+
+def pdf_metni(yol: str) -> str:
+    """PDF'in metin katmanını sayfa işaretleriyle birlikte çıkarır (sayfa özetleri için numaralar korunur)."""
+    okuyucu = PyPDF2.PdfReader(yol)
+    return "\n".join(f"--- Sayfa {i} ---\n{sayfa.extract_text() or ''}" for i, sayfa in enumerate(okuyucu.pages, 1))
+
+
+def metni_parcala(metin: str, parca_sayisi: int) -> list:
+    """Metni sayfa işaretlerinden bölerek yaklaşık eşit uzunlukta parca_sayisi parçaya ayırır."""
+    sayfalar = metin.split("\n--- Sayfa ")
+    hedef = len(metin) / parca_sayisi
+    parcalar, mevcut = [], ""
+    for i, sayfa in enumerate(sayfalar):
+        parca = sayfa if i == 0 else "--- Sayfa " + sayfa
+        if mevcut and len(mevcut) + len(parca) > hedef and len(parcalar) < parca_sayisi - 1:
+            parcalar.append(mevcut)
+            mevcut = ""
+        mevcut += ("\n" if mevcut else "") + parca
+    parcalar.append(mevcut)
+    return parcalar
+
+
+async def parcali_uret(arac: str, modeller: list, istem: str, parcalar: list):
+    """
+    Her parçayı aynı talimatla eşzamanlı işler, sonra parça sonuçlarını aynı JSON biçiminde tek sonuçta
+    birleştirir. (birleştirme yanıtı, eksik bölüm numaraları) döndürülür; tüm çağrıların token kullanımı kaydedilir.
+
+    Süre bütçesi varsa parça çağrılarına kalan sürenin PARCA_SURE_PAYI kadarı verilir; bu sürede bitmeyen
+    parçalar beklenmez ve birleştirme tamamlanan bölümlerle yapılır (kısmi sonuç).
+
+    Biten her parçanın sonucu işin kontrol noktasına yazılır; yarıda kalıp yeniden başlayan iş yalnızca
+    eksik parçaları işler.
+    """
+    onceki = asama_ciktisi("parcalar")
+    # JSON anahtarları metindir; parça sayısı değiştiyse (farklı plan) önceki sonuçlar kullanılmaz
+    sonuclar = {int(sira): metin for sira, metin in onceki["sonuclar"].items()} \
+        if onceki and onceki["adet"] == len(parcalar) else {}
+
+    async def parca_isle(sira: int, parca: str):
+        yanit = await icerik_uret(arac, modeller, [istem, f"Bu, belgenin {sira}/{len(parcalar)}. bölümüdür:\n\n{parca}"])
+        token_kullanimini_kaydet(arac, yanit)
+        sonuclar[sira] = yanit.text
+        await asama_kaydet("parcalar", {"adet": len(parcalar), "sonuclar": sonuclar})
+
+    gorevler = [asyncio.create_task(parca_isle(i, p)) for i, p in enumerate(parcalar, 1) if i not in sonuclar]
+    try:
+        if gorevler:
+            with anyio.move_on_after(kalan_sure() * PARCA_SURE_PAYI):
+                await asyncio.wait(gorevler, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        for gorev in gorevler:
+            gorev.cancel()
+    for gorev in gorevler:
+        if gorev.done() and not gorev.cancelled():
+            # Başarısız parçanın hatası yükseltilir
+            gorev.result()
+    sonuclar = dict(sorted(sonuclar.items()))
+    eksik = [sira for sira in range(1, len(parcalar) + 1) if sira not in sonuclar]
+    if not sonuclar:
+        raise SureAsimi(arac, "parca_uretimi")
+    birlestirme = "\n\n".join(f"### Bölüm {i} analizi\n{s}" for i, s in sonuclar.items())
+    if eksik:
+        logger.warning("%s/%s bölüm süre sınırında işlenemedi, kısmi sonuç birleştiriliyor: %s", len(eksik), len(parcalar), eksik)
+        birlestirme += (f"\n\nNot: {', '.join(map(str, eksik))}. bölüm(ler) süre sınırı nedeniyle analiz edilemedi; "
+                        "analizde belgenin bu bölümlerinin kapsanmadığını belirt.")
+    yanit = await icerik_uret(arac, modeller, [
+        istem,
+        "Aşağıda aynı belgenin bölümleri için ayrı ayrı çıkarılmış analizler var. Bunları tüm belgeyi kapsayan "
+        "tek bir analizde, yukarıdaki JSON formatında birleştir:\n\n" + birlestirme,
+    ])
+    return yanit, eksik
+
+
+def _mp4_suresi(yol: str):
+    """MP4/MOV dosyasının süresini moov/mvhd kutusundan okur; bulunamazsa None."""
+    with open(yol, "rb") as f:
+        dosya_sonu = os.fstat(f.fileno()).st_size
+        konum, bitis = 0, dosya_sonu
+        while konum + 8 <= bitis:
+            f.seek(konum)
+            boyut, tur = struct.unpack(">I4s", f.read(8))
+            baslik = 8
+            if boyut == 1:
+                boyut = struct.unpack(">Q", f.read(8))[0]
+                baslik = 16
+            elif boyut == 0:
+                boyut = bitis - konum
+            if boyut < baslik:
+                return None
+            if tur == b"moov":
+                # moov'un içindeki kutulara in
+                konum, bitis = konum + baslik, konum + boyut
+                continue
+            if tur == b"mvhd":
+                surum = f.read(1)[0]
+                f.read(3)
+                if surum == 1:
+                    f.read(16)
+                    zaman_olcegi, sure = struct.unpack(">IQ", f.read(12))
+                else:
+                    f.read(8)
+                    zaman_olcegi, sure = struct.unpack(">II", f.read(8))
+                return sure / zaman_olcegi if zaman_olcegi else None
+            konum += boyut
+    return None
+
+
+def medya_suresi(yol: str):
+    """
+    Ses/video süresini (saniye, yöntem) olarak döndürür. Başlıktan okunamazsa dosya boyutu ve üst sınır
+    bit hızından alttan tahmin edilir (yöntem "tahmin"); gerçek süre bundan kısa olamaz.
+    """
+    uzanti = os.path.splitext(yol)[1].lower()
+    try:
+        if uzanti == ".wav":
+            with wave.open(yol, "rb") as w:
+                return w.getnframes() / w.getframerate(), "baslik"
+        if uzanti in (".mp4", ".mov", ".m4a"):
+            sure = _mp4_suresi(yol)
+            if sure:
+                return sure, "baslik"
+        if MutagenFile is not None:
+            bilgi = MutagenFile(yol)
+            if bilgi is not None and getattr(bilgi, "info", None) and bilgi.info.length:
+                return bilgi.info.length, "baslik"
+    except Exception as e:
+        logger.debug("Medya başlığı okunamadı (%s): %s", yol, e)
+    bit_hizi = UST_BIT_HIZLARI.get(uzanti, VARSAYILAN_UST_BIT_HIZI)
+    return os.path.getsize(yol) * 8 / bit_hizi, "tahmin"
+
+
+def ses_plani(sure: float, sure_yontemi: str, cikti_tipi: str) -> dict:
+    giris_token = sure * SES_SANIYE_TOKEN + ISTEM_TOKEN
+    if cikti_tipi == "transkript":
+        cikis_token = 300 + sure * KONUSMA_SANIYE_TOKEN
+    else:
+        cikis_token = CIKIS_TAHMINI["ses"].get(cikti_tipi, VARSAYILAN_CIKIS_TAHMINI)
+    ayrintilar = {"sure_saniye": round(sure), "sure_yontemi": sure_yontemi}
+
+    if sure > SES_MAKS_SANIYE or giris_token > PLAN_BAGLAM_TOKEN:
+        return _plan("ses", STRATEJI_RET, f"{round(sure / 60)} dakikalık kayıt model bağlam sınırını aşıyor; "
+                     "kaydı daha kısa parçalara bölün.", giris_token, cikis_token, **ayrintilar)
+    if cikis_token > PLAN_MAKS_CIKIS_TOKEN:
+        azami_dakika = int((PLAN_MAKS_CIKIS_TOKEN - 300) / KONUSMA_SANIYE_TOKEN / 60)
+        return _plan("ses", STRATEJI_RET, f"{round(sure / 60)} dakikalık kaydın tam transkripti model çıktı sınırını "
+                     f"aşar; cikti_tipi='ozet' kullanın ya da kaydı {azami_dakika} dakikalık parçalara bölün.",
+                     giris_token, cikis_token, **ayrintilar)
+    return _plan("ses", STRATEJI_DOGRUDAN, "Kayıt model sınırları içinde.", giris_token, cikis_token, **ayrintilar)
+
+
+def video_plani(sure: float, sure_yontemi: str, ozet_tipi: str, altyazi_var: bool = False) -> dict:
+    """
+    Video süresinden strateji seçer. URL'li videolarda altyazı varsa, kısa özet ya da bağlama sığmayan
+    uzun videolar için indirme ve yükleme yerine altyazı metni kullanılır.
+    """
+    giris_token = sure * VIDEO_SANIYE_TOKEN + ISTEM_TOKEN
+    cikis_token = CIKIS_TAHMINI["video"].get(ozet_tipi, VARSAYILAN_CIKIS_TAHMINI)
+    ayrintilar = {"sure_saniye": round(sure), "sure_yontemi": sure_yontemi}
+
+    if cikis_token > PLAN_MAKS_CIKIS_TOKEN:
+        return _cikis_siniri_asiliyor("video", cikis_token)
+    if giris_token > PLAN_BAGLAM_TOKEN:
+        if altyazi_var:
+            return _plan("video", STRATEJI_METIN, "Video bağlama sığmıyor; altyazı metni özetlenecek.",
+                         sure * KONUSMA_SANIYE_TOKEN + ISTEM_TOKEN, cikis_token, **ayrintilar)
+        return _plan("video", STRATEJI_RET, f"{round(sure / 60)} dakikalık video model bağlam sınırını aşıyor "
+                     "ve altyazısı yok; daha kısa bir video deneyin.", giris_token, cikis_token, **ayrintilar)
+    if altyazi_var and ozet_tipi in METINLE_YETINEN_KATMANLAR["video"]:
+        return _plan("video", STRATEJI_METIN, "Kısa özet için altyazı yeterli; indirme ve yükleme atlanıyor.",
+                     sure * KONUSMA_SANIYE_TOKEN + ISTEM_TOKEN, cikis_token, **ayrintilar)
+    return _plan("video", STRATEJI_DOGRUDAN, "Video model sınırları içinde.", giris_token, cikis_token, **ayrintilar)
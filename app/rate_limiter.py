@@ -0,0 +1,151 @@
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+import contextvars
+from contextlib import contextmanager
+import anyio
+from app.config import KOTA_RPM, KOTA_TPM, KOTA_YUKLEME_MB_DK, KOTA_PATLAMA_SURESI
+from app.metrics import metrikler, Histogram
+from app.shared_state import durum
+
+logger = logging.getLogger(__name__)
+
+# Öncelik sınıfları (küçük sayı önce): etkileşimli soru üretimi > PDF > ses > video ve arka plan işleri
+ONCELIKLER = {"soru": 0, "pdf": 1, "ses": 2, "video": 3, "arka_plan": 3}
+ARKA_PLAN = "arka_plan"
+# Dağıtıcı, başka süreçlerin tüketimini de görmek için bekleme süresini bu kadarla sınırlar (sn)
+MAKS_YOKLAMA = 0.5
+# Model çağrısına metin olarak giden parça için token tahmini ve çıktı payı
+KARAKTER_BASINA_TOKEN = 0.25
+VARSAYILAN_CIKIS_TOKEN = 2048
+
+_sinif = contextvars.ContextVar("kota_sinifi", default=None)
+
+kota_bekleme = metrikler.kaydet(Histogram(
+    "edumcp_kota_bekleme_saniye", "Gemini çağrısının kota sırasında beklediği süre", ("sinif",)))
+
+
+def oncelik_sinifi(arac: str) -> str:
+    """Çağrının kota sınıfı: sinif_olarak() ile verilen sınıf, yoksa aracın kendi sınıfı."""
+    return _sinif.get() or (arac if arac in ONCELIKLER else ARKA_PLAN)
+
+
+@contextmanager
+def sinif_olarak(sinif: str):
+    """Bu blokta (ve içinde başlatılan görevlerde) yapılan Gemini çağrılarını verilen sınıftan sayar."""
+    belirtec = _sinif.set(sinif)
+    try:
+        yield
+    finally:
+        _sinif.reset(belirtec)
+
+
+def token_tahmini(icerik) -> int:
+    """Metin parçalarından giriş tokenı ve varsayılan çıktı payı; dosyalar için araç planındaki tahmin verilmelidir."""
+    parcalar = icerik if isinstance(icerik, (list, tuple)) else [icerik]
+    karakter = sum(len(p) for p in parcalar if isinstance(p, str))
+    return int(karakter * KARAKTER_BASINA_TOKEN) + VARSAYILAN_CIKIS_TOKEN
+
+
+class KotaSinirlayici:
+    """
+    Gemini istek, token ve yükleme bayt kotalarını tüm araçlar ve süreçler arasında paylaştıran token kovası.
+
+    Kova seviyeleri paylaşılan durum deposunda tutulur; aynı makinedeki sunucu ve kuyruk işçilerinin toplamı
+    kotayı aşmaz. Süreç içinde bekleyen çağrılar öncelik sırasıyla (aynı sınıfta geliş sırasıyla) geçer:
+    toplu video içe aktarımı etkileşimli soru üretimini bekletmez. Kovanın kapasitesinden büyük bir istek
+    (ör. uzun video) kova dolduğunda geçer ve seviyeyi eksiye düşürür; sonraki çağrılar borç kapanana kadar bekler.
+    """
+
+    def __init__(self, rpm: float = KOTA_RPM, tpm: float = KOTA_TPM, yukleme_mb_dk: float = KOTA_YUKLEME_MB_DK,
+                 patlama_suresi: float = KOTA_PATLAMA_SURESI):
+        # kova adı -> (kapasite, saniyelik dolum hızı); 0 verilen kota uygulanmaz
+        self.kovalar = {}
+        for ad, dakikalik in (("istek", rpm), ("token", tpm), ("bayt", yukleme_mb_dk * 1024 * 1024)):
+            if dakikalik > 0:
+                hiz = dakikalik / 60
+                self.kovalar[ad] = (max(hiz * patlama_suresi, 1), hiz)
+        self._bekleyenler = []          # (öncelik, sıra, miktarlar, future) yığını
+        self._sira = itertools.count()
+        self._dagitici_gorevi = None
+
+    def _tuket(self, miktarlar: dict) -> float:
+        """
+        Kovaları geçen süre kadar doldurur; tüm kovalarda yeterli pay varsa miktarları düşüp 0, yoksa gereken
+        bekleme süresini döndürür (senkron, thread'de çalıştırın).
+        """
+        simdi = time.time()
+        with durum.islem() as baglanti:
+            kayitli = {ad: (seviye, zaman) for ad, seviye, zaman in baglanti.execute("SELECT ad, seviye, zaman FROM kota_kovalari")}
+            seviyeler, bekleme = {}, 0.0
+            for ad, (kapasite, hiz) in self.kovalar.items():
+                seviye, zaman = kayitli.get(ad, (kapasite, simdi))
+                seviyeler[ad] = min(kapasite, seviye + (simdi - zaman) * hiz)
+                gereken = min(miktarlar.get(ad, 0), kapasite)
+                if gereken > seviyeler[ad]:
+                    bekleme = max(bekleme, (gereken - seviyeler[ad]) / hiz)
+            if bekleme == 0:
+                for ad in seviyeler:
+                    seviyeler[ad] -= miktarlar.get(ad, 0)
+            baglanti.executemany("INSERT OR REPLACE INTO kota_kovalari (ad, seviye, zaman) VALUES (?, ?, ?)",
+                                 [(ad, seviye, simdi) for ad, seviye in seviyeler.items()])
+        return bekleme
+
+    async def _dagitici(self):
+        while self._bekleyenler:
+            _, _, miktarlar, gelecek = self._bekleyenler[0]
+            if gelecek.done():
+                # Beklerken iptal edilen çağrı
+                heapq.heappop(self._bekleyenler)
+                continue
+            bekleme = await anyio.to_thread.run_sync(self._tuket, miktarlar)
+            if bekleme == 0:
+                heapq.heappop(self._bekleyenler)
+                if not gelecek.done():
+                    gelecek.set_result(None)
+            else:
+                await asyncio.sleep(min(bekleme, MAKS_YOKLAMA))
+
+    async def izin(self, sinif: str, istek: int = 1, token: int = 0, bayt: int = 0):
+        """Çağrı için kotadan pay ayrılana kadar bekler; yüksek öncelikli sınıflar önce geçer."""
+        if not self.kovalar:
+            return
+        baslangic = time.monotonic()
+        gelecek = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._bekleyenler, (ONCELIKLER.get(sinif, ONCELIKLER[ARKA_PLAN]), next(self._sira),
+                                           {"istek": istek, "token": token, "bayt": bayt}, gelecek))
+        if self._dagitici_gorevi is None or self._dagitici_gorevi.done():
+            self._dagitici_gorevi = asyncio.get_running_loop().create_task(self._dagitici(), name="kota-dagitici")
+        await gelecek
+        bekleme = time.monotonic() - baslangic
+        kota_bekleme.gozlemle(bekleme, sinif)
+        if bekleme > 1:
+            logger.info("Gemini çağrısı kota için %.1f sn bekledi (%s)", bekleme, sinif)
+
+    def geri_cekil(self):
+        """Sağlayıcı kota/aşırı yük hatası verdiğinde istek kovasını boşaltır; tüm süreçler dolum hızına iner."""
+        if "istek" in self.kovalar:
+            durum.calistir("INSERT OR REPLACE INTO kota_kovalari (ad, seviye, zaman) VALUES ('istek', 0, ?)", (time.time(),))
+
+    def butce(self) -> dict:
+        """Kovalardaki güncel pay ve süreç içinde sırada bekleyen çağrı sayısı."""
+        simdi = time.time()
+        kayitli = {ad: (seviye, zaman) for ad, seviye, zaman in durum.calistir("SELECT ad, seviye, zaman FROM kota_kovalari")}
+        kovalar = {}
+        for ad, (kapasite, hiz) in self.kovalar.items():
+            seviye, zaman = kayitli.get(ad, (kapasite, simdi))
+            kovalar[ad] = {"kalan": round(min(kapasite, seviye + (simdi - zaman) * hiz), 1),
+                           "kapasite": round(kapasite, 1), "dakikalik": round(hiz * 60, 1)}
+        bekleyen = sum(1 for *_, gelecek in self._bekleyenler if not gelecek.done())
+        return {"kovalar": kovalar, "bekleyen": bekleyen}
+
+
+# Tüm Gemini çağrılarının paylaştığı sınırlayıcı
+kota_sinirlayici = KotaSinirlayici()
+for _kova, _aciklama in (("istek", "istek"), ("token", "token"), ("bayt", "yükleme baytı")):
+    metrikler.olcer_ekle(f"edumcp_kota_{_kova}_kalan", f"Gemini kotasında kalan {_aciklama} payı",
+                         lambda kova=_kova: kota_sinirlayici.butce()["kovalar"].get(kova, {}).get("kalan", 0))
+metrikler.olcer_ekle("edumcp_kota_bekleyen", "Gemini kotası için sırada bekleyen çağrı sayısı",
+                     lambda: kota_sinirlayici.butce()["bekleyen"])
@@ -0,0 +1,153 @@
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime, timezone
+import anyio
+from app.lazy_imports import genai
+from app.config import UZAK_DOSYA_PARTI_BOYUTU, UZAK_DOSYA_TARAMA_ARALIGI, UZAK_DOSYA_MAKS_YAS, UZAK_DOSYA_ILK_TARAMA_GECIKMESI
+from app.metrics import metrikler
+from app.shared_state import durum
+from app.rate_limiter import kota_sinirlayici, ARKA_PLAN
+from app import tracing
+
+logger = logging.getLogger(__name__)
+
+
+class UzakDosyaTemizleyici:
+    """
+    Gemini'ye yüklenen dosyaların silinmesini kullanıcı isteğinin kritik yolundan çıkarır.
+
+    Araçlar işleri bitince (başarılı ya da hatalı) dosya adını kuyruğa bırakır; arka plandaki silici
+    kuyruğu partiler halinde boşaltır. Açılışta ve periyodik olarak yapılan tarama, hiçbir işin
+    kullanmadığı ve yeterince eskimiş sahipsiz dosyaları da temizler.
+
+    Kullanımdaki dosyalar paylaşılan durum deposuna kaydedilir; çok süreçli çalışmada tarama bir
+    işçinin kullandığı dosyayı silmez ve kira sayesinde aynı anda tek bir işçi tarama yapar.
+    """
+
+    def __init__(self, parti_boyutu: int = UZAK_DOSYA_PARTI_BOYUTU, tarama_araligi: float = UZAK_DOSYA_TARAMA_ARALIGI,
+                 maks_yas: float = UZAK_DOSYA_MAKS_YAS, ilk_tarama_gecikmesi: float = UZAK_DOSYA_ILK_TARAMA_GECIKMESI):
+        self.parti_boyutu = parti_boyutu
+        self.tarama_araligi = tarama_araligi
+        self.maks_yas = maks_yas
+        self.ilk_tarama_gecikmesi = ilk_tarama_gecikmesi
+        self._kuyruk = asyncio.Queue()
+        self._izler = {}             # dosya adı -> bırakan isteğin span'ı (silme izi o isteğe bağlanır)
+        self._silici_gorevi = None
+        self._tarama_gorevi = None
+
+    async def kaydet(self, dosya_adi: str):
+        """Yüklenen dosyayı aktif olarak işaretler; taramalar aktif dosyalara dokunmaz."""
+        with anyio.CancelScope(shield=True):
+            await anyio.to_thread.run_sync(self._kaydet, dosya_adi)
+
+    def _kaydet(self, dosya_adi: str):
+        durum.calistir("INSERT OR REPLACE INTO uzak_dosyalar (ad, pid, zaman) VALUES (?, ?, ?)",
+                       (dosya_adi, os.getpid(), time.time()))
+
+    def birak(self, dosya_adi: str):
+        """
+        Dosyayı beklemeden silme kuyruğuna ekler. Aktif listeden çıkarma, olay döngüsünü bloklamamak için
+        silicinin partisiyle birlikte thread'de yapılır; o ana kadar kayıt dosyayı taramalardan korumaya devam eder.
+        """
+        self._izler[dosya_adi] = tracing.aktif_span()
+        self._kuyruk.put_nowait(dosya_adi)
+        self._siliciyi_baslat()
+
+    def _siliciyi_baslat(self):
+        if self._silici_gorevi is None or self._silici_gorevi.done():
+            self._silici_gorevi = asyncio.get_running_loop().create_task(self._silici(), name="uzak-dosya-silici")
+
+    async def _tek_sil(self, dosya_adi: str) -> bool:
+        with tracing.span("uzak_dosya.silme", baglam=self._izler.pop(dosya_adi, None), uzak_dosya=dosya_adi) as silme:
+            try:
+                await kota_sinirlayici.izin(ARKA_PLAN)
+                await anyio.to_thread.run_sync(genai.delete_file, dosya_adi)
+                return True
+            except Exception as e:
+                logger.warning("API'den dosya silme hatası (%s): %s", dosya_adi, e)
+                silme.durum, silme.hata = "hata", str(e)
+                return False
+
+    async def _silici(self):
+        while True:
+            parti = [await self._kuyruk.get()]
+            # Kısa bir süre daha bekleyip aynı partiye eklenecek dosyaları topla. wait_for(get()) yerine
+            # sabit pencere kullanılır; wait_for iptal isteğini yutabildiği için kapanışta görev asılı kalıyordu.
+            await asyncio.sleep(0.5)
+            while len(parti) < self.parti_boyutu and not self._kuyruk.empty():
+                parti.append(self._kuyruk.get_nowait())
+            await anyio.to_thread.run_sync(self._kayitlari_sil, parti)
+            sonuclar = await asyncio.gather(*(self._tek_sil(ad) for ad in dict.fromkeys(parti)))
+            logger.info("Uzak dosya silme partisi tamamlandı: %s/%s dosya silindi", sum(sonuclar), len(sonuclar))
+            for _ in parti:
+                self._kuyruk.task_done()
+
+    @staticmethod
+    def _kayitlari_sil(dosya_adlari: list):
+        with durum.islem() as baglanti:
+            baglanti.executemany("DELETE FROM uzak_dosyalar WHERE ad = ?", [(ad,) for ad in dosya_adlari])
+
+    def aktif_dosyalar(self) -> set:
+        """Herhangi bir işçide bir işin kullandığı uzak dosyalar; maks_yas'tan eski kayıtlar çöken işlerden kalmıştır."""
+        sinir = time.time() - self.maks_yas
+        return {ad for (ad,) in durum.calistir("SELECT ad FROM uzak_dosyalar WHERE zaman > ?", (sinir,))}
+
+    async def supur(self) -> int:
+        """Aktif olmayan ve maks_yas süresinden eski uzak dosyaları silme kuyruğuna ekler."""
+        try:
+            await kota_sinirlayici.izin(ARKA_PLAN)
+            dosyalar = await anyio.to_thread.run_sync(lambda: list(genai.list_files()))
+        except Exception as e:
+            logger.warning("Uzak dosyalar listelenemedi: %s", e)
+            return 0
+
+        from app.checkpoints import tutulan_dosyalar
+        simdi = datetime.now(timezone.utc)
+        # Yarıda kalan işlerin kontrol noktasındaki dosyalar da, iş sürdürülene ya da kayıt eskiyene kadar korunur
+        aktif = await anyio.to_thread.run_sync(self.aktif_dosyalar) | await anyio.to_thread.run_sync(tutulan_dosyalar)
+        eklenen = 0
+        for dosya in dosyalar:
+            if dosya.name in aktif:
+                continue
+            olusturma = getattr(dosya, "create_time", None)
+            if olusturma is not None and (simdi - olusturma).total_seconds() < self.maks_yas:
+                continue
+            self._kuyruk.put_nowait(dosya.name)
+            eklenen += 1
+        if eklenen:
+            logger.info("Sahipsiz uzak dosya taraması: %s dosya silme kuyruğuna eklendi", eklenen)
+            self._siliciyi_baslat()
+        return eklenen
+
+    async def _periyodik_tarama(self):
+        # Sunucu bağlantı kabul etmeye başlamadan Gemini kütüphanesi yüklenmesin
+        await asyncio.sleep(self.ilk_tarama_gecikmesi)
+        while True:
+            # Çok süreçli çalışmada taramayı kirayı tutan tek işçi yapar; o işçi çökerse kira dolunca başkası devralır
+            if await anyio.to_thread.run_sync(durum.kira_al, "uzak_dosya_tarama", self.tarama_araligi * 2):
+                from app.checkpoints import eskileri_temizle
+                for dosya_adi in await anyio.to_thread.run_sync(eskileri_temizle):
+                    self.birak(dosya_adi)
+                await self.supur()
+            await asyncio.sleep(self.tarama_araligi)
+
+    def baslat(self):
+        """Silici ve açılış + periyodik tarama görevlerini başlatır."""
+        self._siliciyi_baslat()
+        if self._tarama_gorevi is None or self._tarama_gorevi.done():
+            self._tarama_gorevi = asyncio.get_running_loop().create_task(self._periyodik_tarama(), name="uzak-dosya-tarama")
+
+    async def bosalt(self, zaman_asimi: float = 10):
+        """Kapanışta kuyrukta bekleyen silmelerin bitmesini en fazla zaman_asimi kadar bekler."""
+        with anyio.move_on_after(zaman_asimi):
+            await self._kuyruk.join()
+
+
+# Tüm araçların paylaştığı temizleyici örneği
+uzak_dosya_temizleyici = UzakDosyaTemizleyici()
+metrikler.olcer_ekle("edumcp_uzak_silme_kuyrugu", "Silinmeyi bekleyen Gemini dosyası sayısı",
+                     lambda: uzak_dosya_temizleyici._kuyruk.qsize())
+metrikler.olcer_ekle("edumcp_uzak_aktif_dosya", "Şu anda bir işin kullandığı Gemini dosyası sayısı",
+                     lambda: len(uzak_dosya_temizleyici.aktif_dosyalar()))
@@ -1,8 +1,15 @@
+import os
 import logging
 import asyncio
+from contextlib import asynccontextmanager
 from fastmcp import FastMCP
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s')
+from app.logging_config import loglamayi_kur
+
+logger = logging.getLogger(__name__)
+
+# Kuyruk tabanlı, bloklamayan log hattı (seviyeler ve biçim LOG_* ortam değişkenleriyle ayarlanır)
+loglamayi_kur()
 
 # FastMCP sunucusunu başlat
 mcp = FastMCP(
@@ -11,11 +18,95 @@ mcp = FastMCP(
     exclude_tags={"private", "beta"}
 )
 
+# Event loop görevleri yalnızca zayıf referansla tutar; arka plan görevleri burada saklanır
+_arka_plan_gorevleri = []
+
+
+def uygulamayi_hazirla():
+    """Araçları, ek HTTP uç noktalarını ve ara katmanları kaydeder (tek ve çok süreçli çalışmada ortak)."""
+    from app.config import TRAFIK_KAYDI_AKTIF
+    import app.tools
+    # Akışlı dosya yükleme uç noktasını aynı HTTP uygulamasına ekle
+    import app.upload_api
+    # Prometheus biçiminde aşama/token/önbellek metrikleri (/metrics)
+    import app.metrics_api
+    # Medya işlerinin istemciler arasında adil paylaştırılması için çağıran istemcinin kimliği
+    from app.fair_scheduler import IstemciKimligi
+    mcp.add_middleware(IstemciKimligi())
+    # Bağlantısı kopan istemcinin indirme/yükleme/üretim işlerini yarıda bırak
+    from app.cancellation import BaglantiKopunca
+    mcp.add_middleware(BaglantiKopunca())
+    if TRAFIK_KAYDI_AKTIF:
+        # Araç çağrılarını tekrar oynatma için anonimleştirilmiş olarak kaydet
+        from app.traffic_recorder import TrafikKaydedici
+        mcp.add_middleware(TrafikKaydedici())
+
+
+def arka_plan_gorevlerini_baslat():
+    """Süreç başına çalışan arka plan görevleri; tek işçinin yapması gerekenler kira ile korunur."""
+    from app.config import ONISITMA_AKTIF, SHARED_UPLOADS_DIR
+    from app.shared_state import durum
+    from app.reaper import uzak_dosya_temizleyici
+    # Canlılık sinyali ve diğer işçilerin /metrics'te göreceği metrik anlığı
+    durum.nabzi_baslat()
+    # Uzak dosya silici ve açılış/periyodik sahipsiz dosya taraması
+    uzak_dosya_temizleyici.baslat()
+    if ONISITMA_AKTIF:
+        # Ortak klasöre gelen dosyalar için arka planda önceden özet hazırla
+        from app.watcher import YuklemeIzleyici
+        _arka_plan_gorevleri.extend(YuklemeIzleyici(SHARED_UPLOADS_DIR).baslat())
+
+
 async def main():
-    logging.info("FastMCP sunucusu başlatıldı")
-    # Async context'te run_async() kullan
-    await mcp.run_async(transport="streamable-http", host="0.0.0.0", port=8000)
+    from app.config import SUNUCU_HOST, SUNUCU_PORT, KAPANIS_BEKLEME_SURESI
+    logger.info("FastMCP sunucusu başlatıldı")
+    uygulamayi_hazirla()
+    arka_plan_gorevlerini_baslat()
+    # Async context'te run_async() kullan. Kapanışta yeni bağlantı alınmaz, yürüyen çağrıların bitmesi
+    # KAPANIS_BEKLEME_SURESI kadar beklenir; yarıda kalan işler kontrol noktasından sürdürülebilir.
+    await mcp.run_async(transport="streamable-http", host=SUNUCU_HOST, port=SUNUCU_PORT,
+                        uvicorn_config={"timeout_graceful_shutdown": int(KAPANIS_BEKLEME_SURESI)})
+
+
+def http_uygulamasi():
+    """
+    Çok süreçli çalışmada uvicorn'un her işçi sürecinde çağırdığı uygulama fabrikası.
+
+    MCP oturumları süreç belleğinde tutulduğu için işçiler durumsuz (stateless) HTTP ile çalışır: her
+    istek, hangi işçiye düşerse düşsün kendi başına işlenir. Önbellek ve dosya kayıtları paylaşılan
+    durum deposundadır.
+    """
+    uygulamayi_hazirla()
+    uygulama = mcp.http_app(transport="streamable-http", stateless_http=True)
+    mcp_yasam_dongusu = uygulama.router.lifespan_context
+
+    @asynccontextmanager
+    async def yasam_dongusu(app):
+        async with mcp_yasam_dongusu(app) as durum:
+            arka_plan_gorevlerini_baslat()
+            logger.info("İşçi süreci hazır (pid %s)", os.getpid())
+            yield durum
+
+    uygulama.router.lifespan_context = yasam_dongusu
+    return uygulama
+
+
+def calistir(uygulama_fabrikasi: str = "app.server:http_uygulamasi"):
+    """
+    SUNUCU_ISCI_SAYISI 1 ise sunucuyu bu süreçte çalıştırır; daha büyükse uvicorn aynı soketi paylaşan
+    o kadar işçi süreci başlatır ve çöken işçiyi yeniden başlatır.
+    """
+    from app.config import SUNUCU_ISCI_SAYISI, SUNUCU_HOST, SUNUCU_PORT, KAPANIS_BEKLEME_SURESI
+    if SUNUCU_ISCI_SAYISI <= 1:
+        asyncio.run(main())
+        return
+    import uvicorn
+    logger.info("FastMCP sunucusu %s işçi süreciyle başlatılıyor", SUNUCU_ISCI_SAYISI)
+    # log_config=None: işçiler loglamayı kendi loglamayi_kur() çağrılarıyla kurar
+    uvicorn.run(uygulama_fabrikasi, factory=True, host=SUNUCU_HOST, port=SUNUCU_PORT,
+                workers=SUNUCU_ISCI_SAYISI, log_config=None, lifespan="on",
+                timeout_graceful_shutdown=int(KAPANIS_BEKLEME_SURESI))
+
 
 if __name__ == "__main__":
-    from app.tools import *
-    asyncio.run(main())
\ No newline at end of file
+    calistir()
@@ -0,0 +1,155 @@
+import os
+import time
+import asyncio
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+import anyio
+from app.config import DURUM_VERITABANI, ISCI_NABIZ_ARALIGI
+
+logger = logging.getLogger(__name__)
+
+SEMA = """
+CREATE TABLE IF NOT EXISTS onbellek (anahtar TEXT PRIMARY KEY, deger TEXT NOT NULL, erisim REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS onbellek_erisim ON onbellek (erisim);
+CREATE TABLE IF NOT EXISTS uzak_dosyalar (ad TEXT PRIMARY KEY, pid INTEGER NOT NULL, zaman REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS sabitler (yol TEXT NOT NULL, pid INTEGER NOT NULL, adet INTEGER NOT NULL, PRIMARY KEY (yol, pid));
+CREATE TABLE IF NOT EXISTS kiralar (ad TEXT PRIMARY KEY, sahip INTEGER NOT NULL, bitis REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS isler (
+    kimlik TEXT PRIMARY KEY, arac TEXT NOT NULL, parametreler TEXT NOT NULL, anahtar TEXT, sinif TEXT,
+    oncelik INTEGER NOT NULL DEFAULT 0, istemci TEXT, durum TEXT NOT NULL,
+    sonuc TEXT, olusturma REAL NOT NULL, baslama REAL, bitis REAL, sahip INTEGER, kira_bitis REAL,
+    deneme INTEGER NOT NULL DEFAULT 0, bekleyen INTEGER NOT NULL DEFAULT 0, iptal INTEGER NOT NULL DEFAULT 0,
+    son_tarih REAL);
+CREATE INDEX IF NOT EXISTS isler_durum ON isler (durum, oncelik, olusturma);
+CREATE INDEX IF NOT EXISTS isler_anahtar ON isler (anahtar, durum);
+CREATE TABLE IF NOT EXISTS kota_kovalari (ad TEXT PRIMARY KEY, seviye REAL NOT NULL, zaman REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS isciler (pid INTEGER PRIMARY KEY, zaman REAL NOT NULL, metrikler TEXT NOT NULL DEFAULT '');
+CREATE TABLE IF NOT EXISTS kontrol_noktalari (anahtar TEXT PRIMARY KEY, arac TEXT NOT NULL, veri TEXT NOT NULL, sahip INTEGER,
+    zaman REAL NOT NULL);
+"""
+# Önceki sürümlerin oluşturduğu depolara sonradan eklenen kolonlar: (tablo, kolon, tanım)
+EK_KOLONLAR = (
+    ("isler", "sinif", "TEXT"),
+    ("isler", "oncelik", "INTEGER NOT NULL DEFAULT 0"),
+    ("isler", "istemci", "TEXT"),
+    ("isler", "bekleyen", "INTEGER NOT NULL DEFAULT 0"),
+    ("isler", "iptal", "INTEGER NOT NULL DEFAULT 0"),
+    ("isler", "son_tarih", "REAL"),
+)
+
+# Bu kadar nabız aralığı boyunca sinyal vermeyen işçi ölü sayılır
+CANLILIK_CARPANI = 3
+
+
+class PaylasilanDurum:
+    """
+    Aynı makinedeki tüm sunucu süreçlerinin paylaştığı SQLite (WAL) deposu.
+
+    Sonuç önbelleği, iş kuyruğu, işlerin kontrol noktaları, Gemini kota kovaları, kullanımdaki Gemini
+    dosyaları, depo sabitlemeleri, tek bir işçinin yürütmesi gereken arka plan görevlerinin kiraları ve
+    işçilerin metrik anlıkları burada tutulur. WAL kipinde okuyucular yazarı beklemez; her thread kendi bağlantısını kullanır. Tek süreçli
+    çalışmada da aynı depo kullanılır, böylece önbellek sunucu yeniden başlatıldığında da korunur.
+    """
+
+    def __init__(self, yol: str = DURUM_VERITABANI, nabiz_araligi: float = ISCI_NABIZ_ARALIGI):
+        self.yol = yol
+        self.nabiz_araligi = nabiz_araligi
+        self._yerel = threading.local()
+        self._sema_kilidi = threading.Lock()
+        self._sema_kuruldu = False
+        self._nabiz_gorevi = None
+
+    def baglanti(self) -> sqlite3.Connection:
+        baglanti = getattr(self._yerel, "baglanti", None)
+        # fork ile oluşan işçi, ebeveynden kalan bağlantıyı kullanmamalı
+        if baglanti is None or self._yerel.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.yol)), exist_ok=True)
+            baglanti = sqlite3.connect(self.yol, timeout=10, isolation_level=None, check_same_thread=False)
+            baglanti.execute("PRAGMA journal_mode=WAL")
+            baglanti.execute("PRAGMA synchronous=NORMAL")
+            with self._sema_kilidi:
+                if not self._sema_kuruldu:
+                    self._semayi_kur(baglanti)
+                    self._sema_kuruldu = True
+            self._yerel.baglanti, self._yerel.pid = baglanti, os.getpid()
+        return baglanti
+
+    @staticmethod
+    def _semayi_kur(baglanti: sqlite3.Connection):
+        for tablo, kolon, tanim in EK_KOLONLAR:
+            kolonlar = {satir[1] for satir in baglanti.execute(f"PRAGMA table_info({tablo})")}
+            if kolonlar and kolon not in kolonlar:
+                baglanti.execute(f"ALTER TABLE {tablo} ADD COLUMN {kolon} {tanim}")
+        baglanti.executescript(SEMA)
+
+    def calistir(self, sql: str, parametreler: tuple = ()) -> sqlite3.Cursor:
+        return self.baglanti().execute(sql, parametreler)
+
+    @contextmanager
+    def islem(self):
+        """Birden fazla ifadeyi tek yazma işlemi olarak çalıştırır (BEGIN IMMEDIATE ... COMMIT)."""
+        baglanti = self.baglanti()
+        baglanti.execute("BEGIN IMMEDIATE")
+        try:
+            yield baglanti
+        except BaseException:
+            baglanti.execute("ROLLBACK")
+            raise
+        baglanti.execute("COMMIT")
+
+    # --- Kiralar ve işçi canlılığı ---------------------------------------------------------------
+
+    def kira_al(self, ad: str, sure: float) -> bool:
+        """
+        `ad` görevini sure saniyeliğine bu sürece kiralar. Kira başka bir süreçteyse ve süresi dolmadıysa
+        False döner; sahibi aynı süreçse kira uzatılır. Sahibi ölen kira süresi dolunca devralınır.
+        """
+        simdi = time.time()
+        imlec = self.calistir(
+            "INSERT INTO kiralar (ad, sahip, bitis) VALUES (?, ?, ?) "
+            "ON CONFLICT (ad) DO UPDATE SET sahip = excluded.sahip, bitis = excluded.bitis "
+            "WHERE kiralar.sahip = excluded.sahip OR kiralar.bitis < ?",
+            (ad, os.getpid(), simdi + sure, simdi))
+        return imlec.rowcount > 0
+
+    def canli_isciler(self) -> list:
+        """Son nabız süresi içinde sinyal veren işçilerin pid'leri (bu süreç her zaman dahil)."""
+        sinir = time.time() - self.nabiz_araligi * CANLILIK_CARPANI
+        pidler = {pid for (pid,) in self.calistir("SELECT pid FROM isciler WHERE zaman > ?", (sinir,))}
+        return sorted(pidler | {os.getpid()})
+
+    def metrik_anliklari(self) -> dict:
+        """Canlı diğer işçilerin son yayınladığı metrik metinleri (pid -> Prometheus metni)."""
+        sinir = time.time() - self.nabiz_araligi * CANLILIK_CARPANI
+        return dict(self.calistir("SELECT pid, metrikler FROM isciler WHERE zaman > ? AND pid != ?",
+                                  (sinir, os.getpid())).fetchall())
+
+    def _nabiz_yaz(self, metrik_metni: str):
+        with self.islem() as baglanti:
+            baglanti.execute("INSERT OR REPLACE INTO isciler (pid, zaman, metrikler) VALUES (?, ?, ?)",
+                             (os.getpid(), time.time(), metrik_metni))
+            # Uzun süredir sinyal vermeyen işçilerin kayıtları ve sabitlemeleri temizlenir
+            sinir = time.time() - self.nabiz_araligi * CANLILIK_CARPANI * 10
+            baglanti.execute("DELETE FROM sabitler WHERE pid IN (SELECT pid FROM isciler WHERE zaman < ?)", (sinir,))
+            baglanti.execute("DELETE FROM isciler WHERE zaman < ?", (sinir,))
+
+    async def _nabiz(self):
+        from app.metrics import metrikler
+        while True:
+            try:
+                await anyio.to_thread.run_sync(lambda: self._nabiz_yaz(metrikler.disa_aktar()))
+            except sqlite3.Error as e:
+                logger.warning("İşçi nabzı yazılamadı: %s", e)
+            await asyncio.sleep(self.nabiz_araligi)
+
+    def nabzi_baslat(self):
+        """Bu sürecin canlılık sinyalini ve metrik anlığını periyodik olarak yayınlar."""
+        if self._nabiz_gorevi is None or self._nabiz_gorevi.done():
+            self._nabiz_gorevi = asyncio.get_running_loop().create_task(self._nabiz(), name="isci-nabzi")
+        logger.info("Paylaşılan durum deposu: %s (pid %s)", os.path.abspath(self.yol), os.getpid())
+
+
+# Tüm modüllerin paylaştığı depo örneği
+durum = PaylasilanDurum()
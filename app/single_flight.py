@@ -0,0 +1,84 @@
+import asyncio
+import logging
+from app.cache import video_url_anahtari
+from app.storage import depo
+from app.metrics import metrikler, Sayac
+from app.cancellation import iptal_edilen_isler
+
+logger = logging.getLogger(__name__)
+
+# Kaynağı ortak klasördeki bir dosya olan parametreler
+DOSYA_PARAMETRELERI = ("pdf_dosyasi_yolu", "ses_kaynagi", "video_dosyasi_yolu")
+
+birlesen_istekler = metrikler.kaydet(Sayac(
+    "edumcp_birlesen_istek_toplam", "Yürüyen aynı işe bağlanıp yeniden çalıştırılmayan istekler", ("arac", "kapsam")))
+
+
+def istek_anahtari(arac: str, parametreler: dict) -> str:
+    """
+    Aynı işi isteyen çağrıları tek anahtara indirger: YouTube linkleri video kimliğine, içerik adresli
+    dosyalar SHA-256 özetine, diğer metin parametreleri küçük harfe çevrilir.
+    """
+    ciftler = []
+    for ad, deger in sorted(parametreler.items()):
+        if ad == "video_url" and deger:
+            deger = video_url_anahtari(deger)
+        elif ad in DOSYA_PARAMETRELERI and deger:
+            ozet = depo.icerik_ozeti(deger)
+            deger = f"sha256:{ozet}" if ozet else f"dosya:{depo.dosya_adi(deger)}"
+        elif isinstance(deger, str):
+            deger = deger.strip().lower()
+        ciftler.append(f"{ad}={deger}")
+    return "|".join([arac, *ciftler])
+
+
+class TekUcus:
+    """
+    Eşzamanlı gelen özdeş istekleri tek yürütmede birleştirir (single-flight).
+
+    Bir anahtar için ilk gelen çağrı işi ayrı bir görev olarak başlatır; iş sürerken aynı anahtarla gelen
+    çağrılar yeni indirme/yükleme/üretim başlatmadan aynı görevin sonucunu bekler. Görev çağıranlardan
+    bağımsızdır: bekleyenlerden biri (ilk çağıran dahil) iptal edilse de diğerleri sonucu alır. Son
+    bekleyen de ayrılırsa (istemci bağlantıyı kesti ya da çağrıyı iptal etti) görev iptal edilir; indirme,
+    yükleme ve üretim yarıda bırakılır. İş bittiğinde anahtar bırakılır; sonraki çağrılar sonuç
+    önbelleğinden karşılanır.
+    """
+
+    def __init__(self):
+        self._ucuslar = {}      # anahtar -> asyncio.Task
+        self._bekleyenler = {}  # anahtar -> sonucu bekleyen çağrı sayısı
+
+    def _bitti(self, anahtar: str):
+        self._ucuslar.pop(anahtar, None)
+        self._bekleyenler.pop(anahtar, None)
+
+    async def yurut(self, arac: str, anahtar: str, fonksiyon):
+        gorev = self._ucuslar.get(anahtar)
+        if gorev is None:
+            gorev = asyncio.get_running_loop().create_task(fonksiyon(), name=f"tek-ucus:{arac}")
+            self._ucuslar[anahtar] = gorev
+            gorev.add_done_callback(lambda _: self._bitti(anahtar))
+        else:
+            logger.info("Aynı iş zaten yürüyor, sonucu beklenecek: %s", anahtar)
+            birlesen_istekler.artir(arac, "surec")
+        self._bekleyenler[anahtar] = self._bekleyenler.get(anahtar, 0) + 1
+        try:
+            return await asyncio.shield(gorev)
+        except asyncio.CancelledError:
+            if not gorev.done() and self._bekleyenler.get(anahtar) == 1:
+                logger.info("Sonucu bekleyen istemci kalmadı, iş iptal ediliyor: %s", anahtar)
+                iptal_edilen_isler.artir(arac, "surec")
+                gorev.cancel()
+            raise
+        finally:
+            if self._ucuslar.get(anahtar) is gorev and anahtar in self._bekleyenler:
+                self._bekleyenler[anahtar] -= 1
+
+    def yurutulen_sayisi(self) -> int:
+        return len(self._ucuslar)
+
+
+# Tüm araçların paylaştığı örnek
+tek_ucus = TekUcus()
+metrikler.olcer_ekle("edumcp_tek_ucus_yurutulen", "Birleştirilebilir durumda yürüyen benzersiz iş sayısı",
+                     tek_ucus.yurutulen_sayisi)
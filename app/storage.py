@@ -0,0 +1,266 @@
+import os
+import re
+import time
+import uuid
+import hashlib
+import logging
+import threading
+import anyio
+from app.config import SHARED_UPLOADS_DIR, DEPO_KOTA_BAYT
+from app.metrics import metrikler, aktarim_basina
+from app.shared_state import durum
+
+logger = logging.getLogger(__name__)
+
+# Dosya türüne göre kabul edilen uzantılar ve boyut sınırları (araçlardaki sınırlarla aynı)
+DOSYA_TURLERI = {
+    "pdf": {"uzantilar": ('.pdf',), "maks_boyut": 50 * 1024 * 1024},
+    "audio": {"uzantilar": ('.mp3', '.wav', '.flac', '.m4a', '.aac', '.ogg', '.webm'), "maks_boyut": 100 * 1024 * 1024},
+    "video": {"uzantilar": ('.mp4', '.webm', '.mkv', '.avi', '.mov', '.flv'), "maks_boyut": 500 * 1024 * 1024},
+}
+
+# İçerik adresli dosya adı: <sha256>.<uzantı>
+ICERIK_ADI_DESENI = re.compile(r'^([0-9a-f]{64})(\.[A-Za-z0-9]+)$')
+
+VIDEO_UZANTILARI = DOSYA_TURLERI["video"]["uzantilar"]
+
+
+class DosyaCokBuyukHatasi(Exception):
+    pass
+
+
+class IcerikDeposu:
+    """
+    Ortak klasörü tek noktadan yöneten depo.
+
+    Web'den gelen yüklemeler akış halinde okunurken SHA-256 ile özetlenir ve <özet>.<uzantı> adıyla
+    saklanır; aynı içerik ikinci kez yüklendiğinde yeni bir kopya oluşmaz. Eski akıştaki dosya adıyla
+    yapılan referanslar da çözümlenmeye devam eder.
+
+    Klasörün toplam boyutu kota ile sınırlıdır: kota aşıldığında en uzun süredir erişilmeyen dosyalar
+    silinir (LRU). Devam eden bir işin kullandığı dosyalar sabitlenir ve tahliye edilmez. Sabitlemeler
+    paylaşılan durum deposunda tutulur; bir işçinin tahliyesi diğer işçilerin kullandığı dosyalara dokunmaz.
+    """
+
+    def __init__(self, kok: str = SHARED_UPLOADS_DIR, kota_bayt: int = DEPO_KOTA_BAYT):
+        self.kok = kok
+        self.gecici_klasor = os.path.join(kok, ".gelen")
+        self.kota_bayt = kota_bayt
+        self._kilit = threading.Lock()
+        self._indeks = None          # tam yol -> [boyut, son erişim zamanı]
+        self._istatistik = {"isabet": 0, "iskalama": 0, "tahliye_sayisi": 0, "tahliye_bayt": 0}
+
+    # --- Erişim takibi ve LRU tahliyesi -----------------------------------------------------------
+
+    def _indeksi_yukle(self):
+        """İlk kullanımda klasörü tarayarak boyut ve erişim zamanı indeksini oluşturur (kilit altında)."""
+        if self._indeks is not None:
+            return
+        self._indeks = {}
+        try:
+            with os.scandir(self.kok) as girdiler:
+                for girdi in girdiler:
+                    if girdi.is_file() and not girdi.name.startswith('.'):
+                        bilgi = girdi.stat()
+                        self._indeks[girdi.path] = [bilgi.st_size, max(bilgi.st_atime, bilgi.st_mtime)]
+        except FileNotFoundError:
+            pass
+
+    def erisim(self, yol: str) -> bool:
+        """Dosyanın varlığını kontrol eder, varsa son erişim zamanını günceller ve isabet/ıskalama sayar."""
+        with self._kilit:
+            self._indeksi_yukle()
+            if not os.path.exists(yol):
+                self._indeks.pop(yol, None)
+                self._istatistik["iskalama"] += 1
+                return False
+            simdi = time.time()
+            kayit = self._indeks.get(yol)
+            if kayit is None:
+                self._indeks[yol] = [os.path.getsize(yol), simdi]
+            else:
+                kayit[1] = simdi
+            self._istatistik["isabet"] += 1
+        try:
+            # Erişim zamanı diske de yazılır, sunucu yeniden başladığında LRU sırası korunur
+            os.utime(yol, (simdi, os.path.getmtime(yol)))
+        except OSError:
+            pass
+        return True
+
+    async def sabitle(self, yol: str):
+        """Dosyayı devam eden bir iş için sabitler; sabitli dosyalar hiçbir işçi tarafından tahliye edilmez."""
+        # Sabitleme ile kaldırma eşleşmeli; yazma başka süreç kilidi tutarken event loop'u bekletmesin diye thread'de
+        with anyio.CancelScope(shield=True):
+            await anyio.to_thread.run_sync(self._sabitle, yol)
+
+    async def sabitlemeyi_kaldir(self, yol: str):
+        with anyio.CancelScope(shield=True):
+            await anyio.to_thread.run_sync(self._sabitlemeyi_kaldir, yol)
+
+    def _sabitle(self, yol: str):
+        durum.calistir("INSERT INTO sabitler (yol, pid, adet) VALUES (?, ?, 1) "
+                       "ON CONFLICT (yol, pid) DO UPDATE SET adet = adet + 1", (yol, os.getpid()))
+
+    def _sabitlemeyi_kaldir(self, yol: str):
+        with durum.islem() as baglanti:
+            baglanti.execute("UPDATE sabitler SET adet = adet - 1 WHERE yol = ? AND pid = ?", (yol, os.getpid()))
+            baglanti.execute("DELETE FROM sabitler WHERE adet <= 0")
+
+    def _sabitli_yollar(self) -> set:
+        """Canlı işçilerin sabitlediği dosyalar; çöken işçilerin sabitlemeleri dikkate alınmaz."""
+        pidler = durum.canli_isciler()
+        soru = ",".join("?" * len(pidler))
+        return {yol for (yol,) in durum.calistir(f"SELECT DISTINCT yol FROM sabitler WHERE pid IN ({soru})", tuple(pidler))}
+
+    def eklendi(self, yol: str):
+        """Depoya yeni giren dosyayı indekse ekler ve gerekirse kotayı uygular (senkron, thread'de çalıştırın)."""
+        with self._kilit:
+            # Diğer işçilerin eklediği dosyalar da kotaya sayılsın diye indeks klasörden yeniden okunur;
+            # erişim zamanları diske yazıldığı için LRU sırası korunur
+            self._indeks = None
+            self._indeksi_yukle()
+            try:
+                self._indeks[yol] = [os.path.getsize(yol), time.time()]
+            except OSError:
+                return
+            self._kotayi_uygula()
+
+    def _kotayi_uygula(self):
+        kullanilan = sum(boyut for boyut, _ in self._indeks.values())
+        if kullanilan <= self.kota_bayt:
+            return
+        sabitler = self._sabitli_yollar()
+        adaylar = sorted(
+            (erisim_zamani, yol) for yol, (_, erisim_zamani) in self._indeks.items() if yol not in sabitler
+        )
+        for _, yol in adaylar:
+            if kullanilan <= self.kota_bayt:
+                break
+            boyut = self._indeks.pop(yol)[0]
+            try:
+                os.remove(yol)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning("Tahliye edilecek dosya silinemedi (%s): %s", yol, e)
+                continue
+            kullanilan -= boyut
+            self._istatistik["tahliye_sayisi"] += 1
+            self._istatistik["tahliye_bayt"] += boyut
+            logger.info("Disk kotası için dosya tahliye edildi: %s (%s bayt)", os.path.basename(yol), boyut)
+        if kullanilan > self.kota_bayt:
+            logger.warning("Disk kotası aşıldı fakat kalan dosyaların tamamı devam eden işlerce kullanılıyor")
+
+    def istatistikler(self) -> dict:
+        with self._kilit:
+            self._indeksi_yukle()
+            toplam_istek = self._istatistik["isabet"] + self._istatistik["iskalama"]
+            return self._istatistik | {
+                "isabet_orani": round(self._istatistik["isabet"] / toplam_istek, 4) if toplam_istek else 0.0,
+                "kota_bayt": self.kota_bayt,
+                "kullanilan_bayt": sum(boyut for boyut, _ in self._indeks.values()),
+                "dosya_sayisi": len(self._indeks),
+                "sabitli_dosya_sayisi": len(self._sabitli_yollar()),
+            }
+
+    # --- İndirilen videolar ---------------------------------------------------------------------
+
+    def indirme_koku(self, kaynak_anahtari: str):
+        """YouTube videoları için kalıcı dosya adı kökü (yt_<video_id>); diğer kaynaklar için None."""
+        if kaynak_anahtari.startswith("yt:"):
+            return f"yt_{kaynak_anahtari[3:]}"
+        return None
+
+    def indirilmis_bul(self, dosya_koku: str):
+        """Daha önce indirilmiş video depoda duruyorsa yolunu döndürür (senkron, thread'de çalıştırın)."""
+        for uzanti in VIDEO_UZANTILARI:
+            yol = os.path.join(self.kok, f"{dosya_koku}{uzanti}")
+            if os.path.exists(yol):
+                self.erisim(yol)
+                return yol
+        with self._kilit:
+            self._istatistik["iskalama"] += 1
+        return None
+
+    # --- Dosya çözümleme ve yükleme -------------------------------------------------------------
+
+    def dosya_adi(self, dosya_referansi: str) -> str:
+        """Tam yol verilse bile (Windows veya POSIX) sadece dosya adını döndürür."""
+        return re.split(r'[\\/]', dosya_referansi.strip())[-1]
+
+    def yol(self, dosya_referansi: str) -> str:
+        """Dosya referansını depodaki tam yola çevirir."""
+        return os.path.join(self.kok, self.dosya_adi(dosya_referansi))
+
+    def icerik_ozeti(self, dosya_referansi: str):
+        """Dosya içerik adresli olarak saklanmışsa özetini (hex) döndürür, değilse None."""
+        eslesme = ICERIK_ADI_DESENI.match(self.dosya_adi(dosya_referansi))
+        return eslesme.group(1) if eslesme else None
+
+    def ozet_ile_bul(self, sha256_hex: str, uzanti: str):
+        """Özeti ve uzantısı verilen içeriğin depodaki yolu; geçerli bir sha256 ve uzantı değilse ya da yoksa None."""
+        ad = f"{sha256_hex.lower()}{uzanti.lower()}"
+        # Dışarıdan gelen özet yola eklenmeden önce doğrulanır (../ gibi değerler depo dışına çıkmasın)
+        if not ICERIK_ADI_DESENI.match(ad):
+            return None
+        yol = os.path.join(self.kok, ad)
+        return yol if os.path.exists(yol) else None
+
+    async def akistan_kaydet(self, parcalar, uzanti: str, maks_boyut: int) -> dict:
+        """
+        Asenkron bayt parçalarını diske yazarken özetler ve içerik adresli olarak saklar.
+
+        Returns:
+            dict: {"dosya_adi", "sha256", "boyut", "tekrar"} - tekrar=True ise aynı içerik zaten depodaydı.
+        """
+        await anyio.to_thread.run_sync(lambda: os.makedirs(self.gecici_klasor, exist_ok=True))
+        gecici_yol = os.path.join(self.gecici_klasor, f"{uuid.uuid4().hex}.part")
+        ozet = hashlib.sha256()
+        boyut = 0
+        try:
+            async with await anyio.open_file(gecici_yol, "wb") as f:
+                async for parca in parcalar:
+                    if not parca:
+                        continue
+                    boyut += len(parca)
+                    if boyut > maks_boyut:
+                        raise DosyaCokBuyukHatasi(f"Dosya boyut sınırını aşıyor ({maks_boyut} bayt)")
+                    ozet.update(parca)
+                    await f.write(parca)
+
+            sha256_hex = ozet.hexdigest()
+            dosya_adi = f"{sha256_hex}{uzanti.lower()}"
+            hedef_yol = os.path.join(self.kok, dosya_adi)
+            if await anyio.to_thread.run_sync(os.path.exists, hedef_yol):
+                logger.info("Aynı içerik zaten depoda, yeni kopya oluşturulmadı: %s", dosya_adi)
+                await anyio.to_thread.run_sync(os.remove, gecici_yol)
+                await anyio.to_thread.run_sync(self.erisim, hedef_yol)
+                return {"dosya_adi": dosya_adi, "sha256": sha256_hex, "boyut": boyut, "tekrar": True}
+
+            await anyio.to_thread.run_sync(os.replace, gecici_yol, hedef_yol)
+            await anyio.to_thread.run_sync(self.eklendi, hedef_yol)
+            logger.info("Dosya depoya kaydedildi: %s (%s bayt)", dosya_adi, boyut)
+            return {"dosya_adi": dosya_adi, "sha256": sha256_hex, "boyut": boyut, "tekrar": False}
+        except BaseException:
+            if os.path.exists(gecici_yol):
+                os.remove(gecici_yol)
+            raise
+
+
+# Tüm araçların ve yükleme uç noktasının paylaştığı depo örneği
+depo = IcerikDeposu()
+
+# Yedi ölçer tek dışa aktarımda depo istatistiklerini bir kez okur
+_depo_istatistikleri = aktarim_basina(depo.istatistikler)
+
+for _ad, _alan, _tur, _aciklama in (
+    ("edumcp_depo_kullanilan_bayt", "kullanilan_bayt", "gauge", "Ortak klasörde kullanılan disk alanı (bayt)"),
+    ("edumcp_depo_kota_bayt", "kota_bayt", "gauge", "Ortak klasör disk kotası (bayt)"),
+    ("edumcp_depo_dosya_sayisi", "dosya_sayisi", "gauge", "Ortak klasördeki dosya sayısı"),
+    ("edumcp_depo_sabitli_dosya_sayisi", "sabitli_dosya_sayisi", "gauge", "Devam eden işlerce sabitlenmiş dosya sayısı"),
+    ("edumcp_depo_isabet_toplam", "isabet", "counter", "Depoda bulunan dosya erişimleri"),
+    ("edumcp_depo_iskalama_toplam", "iskalama", "counter", "Depoda bulunamayan dosya erişimleri"),
+    ("edumcp_depo_tahliye_toplam", "tahliye_sayisi", "counter", "Disk kotası için tahliye edilen dosya sayısı"),
+):
+    metrikler.olcer_ekle(_ad, _aciklama, lambda alan=_alan: _depo_istatistikleri()[alan], _tur)
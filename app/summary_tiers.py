@@ -0,0 +1,119 @@
+import re
+import copy
+import logging
+import anyio
+from app.cache import onbellek, onbellek_anahtari
+from app.metrics import onbellek_istekleri
+
+logger = logging.getLogger(__name__)
+
+# "kapsamli" şemasından türetilebilen katmanlar ve her katmanın alanları.
+# Alan başına kırpma kuralı: ("cumle", n) ilk n cümleyi, ("liste", n) ilk n öğeyi tutar, None olduğu gibi kopyalar.
+KATMAN_ALANLARI = {
+    "pdf": {
+        "kisa": {
+            "belge_dili": None,
+            "baslik": None,
+            "kisa_ozet": ("cumle", 3),
+            "anahtar_kelimeler": ("liste", 3),
+            "ogrenme_ciktilari": ("liste", 2),
+            "belge_sonrasi_ogrenilecekler": ("cumle", 2),
+        },
+        "genis": {
+            "belge_dili": None,
+            "baslik": None,
+            "genis_ozet": None,
+            "sayfa_ozetleri": None,
+            "kilit_ogrenme_noktalari": None,
+            "tablolar_ve_grafikler": None,
+            "bahsedilen_kaynaklar": None,
+            "ilgili_konular": None,
+            "anahtar_kelimeler": None,
+            "etiketler": None,
+            "ogrenme_ciktilari": None,
+            "belge_sonrasi_ogrenilecekler": None,
+        },
+    },
+    "video": {
+        "kisa": {
+            "video_dili": None,
+            "baslik": None,
+            "kisa_ozet": ("cumle", 3),
+            "anahtar_kelimeler": ("liste", 3),
+            "ogrenme_ciktilari": ("liste", 2),
+            "video_sonrasi_ogrenilecekler": ("cumle", 2),
+        },
+        "genis": {
+            "video_dili": None,
+            "baslik": None,
+            "detayli_ozet": None,
+            "anahtar_kelimeler": ("liste", 5),
+            "ogrenme_ciktilari": ("liste", 3),
+            "video_sonrasi_ogrenilecekler": None,
+        },
+    },
+}
+
+ZENGIN_KATMAN = "kapsamli"
+
+CUMLE_SONU = re.compile(r'(?<=[.!?…])\s+')
+
+
+def _kirp(deger, kural):
+    if kural is None:
+        return copy.deepcopy(deger)
+    tur, adet = kural
+    if tur == "cumle" and isinstance(deger, str):
+        cumleler = [c for c in CUMLE_SONU.split(deger.strip()) if c]
+        return " ".join(cumleler[:adet])
+    if tur == "liste" and isinstance(deger, list):
+        return copy.deepcopy(deger[:adet])
+    return copy.deepcopy(deger)
+
+
+def katmani_tur(arac: str, kapsamli_veri: dict, hedef_katman: str):
+    """Saklanan "kapsamli" sonuçtan istenen katmanı yerel olarak üretir; alanlar eksikse None döner."""
+    alanlar = KATMAN_ALANLARI.get(arac, {}).get(hedef_katman)
+    if alanlar is None or not isinstance(kapsamli_veri, dict):
+        return None
+
+    if any(alan not in kapsamli_veri for alan in alanlar):
+        logger.debug("Kapsamlı sonuçta eksik alan var, '%s' katmanı türetilemedi", hedef_katman)
+        return None
+
+    return {alan: _kirp(kapsamli_veri[alan], kural) for alan, kural in alanlar.items()}
+
+
+async def onbellekten_katman_al(arac: str, kaynak: str, ozet_tipi: str, hedef_dil: str):
+    """
+    İstenen özet katmanını önbellekten karşılamaya çalışır.
+
+    Önce aynı katmanın kaydına, sonra aynı kaynağın "kapsamli" kaydından projeksiyona bakar.
+    Model çağrısı gerekmiyorsa özet verisini, gerekiyorsa None döner. Paylaşılan depo thread'de okunur.
+    """
+    return await anyio.to_thread.run_sync(_onbellekten_katman_al, arac, kaynak, ozet_tipi, hedef_dil)
+
+
+def _onbellekten_katman_al(arac: str, kaynak: str, ozet_tipi: str, hedef_dil: str):
+    veri = onbellek.al(onbellek_anahtari(arac, kaynak, ozet_tipi, hedef_dil))
+    if veri is not None:
+        logger.info("Önbellekten '%s' sonucu kullanıldı: %s", ozet_tipi, kaynak)
+        onbellek_istekleri.artir(arac, "isabet")
+        return copy.deepcopy(veri)
+
+    if ozet_tipi != ZENGIN_KATMAN:
+        kapsamli_veri = onbellek.al(onbellek_anahtari(arac, kaynak, ZENGIN_KATMAN, hedef_dil))
+        turetilen = katmani_tur(arac, kapsamli_veri, ozet_tipi) if kapsamli_veri is not None else None
+        if turetilen is not None:
+            logger.info("'%s' sonucu kapsamlı sonuçtan türetildi: %s", ozet_tipi, kaynak)
+            onbellek.koy(onbellek_anahtari(arac, kaynak, ozet_tipi, hedef_dil), turetilen)
+            onbellek_istekleri.artir(arac, "turetildi")
+            return copy.deepcopy(turetilen)
+
+    onbellek_istekleri.artir(arac, "iskalama")
+    return None
+
+
+async def sonucu_onbellege_yaz(arac: str, kaynak: str, ozet_tipi: str, hedef_dil: str, veri: dict):
+    """Model tarafından üretilen ve başarıyla ayrıştırılan sonucu önbelleğe yazar."""
+    await anyio.to_thread.run_sync(onbellek.koy, onbellek_anahtari(arac, kaynak, ozet_tipi, hedef_dil), copy.deepcopy(veri))
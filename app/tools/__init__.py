@@ -1,14 +1,17 @@
+import logging
 from importlib import import_module
 
 tool_modules = [
     "quiz_generator",
     "pdf_summarizer",
     "video_summarizer",
-    "audio_transcriber"
+    "audio_transcriber",
+    "batch_processor",
+    "job_status"
 ]
 
 for module_name in tool_modules:
     try:
         import_module(f"app.tools.{module_name}")
     except ImportError as e:
-        print(f"Tool modülü yüklenemedi: {module_name} - {e}") 
\ No newline at end of file
+        logging.getLogger(__name__).error("Tool modülü yüklenemedi: %s - %s", module_name, e) 
\ No newline at end of file
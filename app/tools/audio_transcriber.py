@@ -4,63 +4,79 @@
 import json
 import os
 import logging
-import asyncio  # Asenkron operasyonlar için temel kütüphane
 import time
 import anyio
 from dotenv import load_dotenv
 from app.server import mcp
-import google.generativeai as genai
 from app.config import GEMINI_API_KEY
+from app.cache import dosya_parmak_izi
+from app.storage import depo
+from app.gemini_files import dosya_yukle, islenmesini_bekle, dosyayi_birak
+from app.summary_tiers import onbellekten_katman_al, sonucu_onbellege_yaz
+from app.metrics import asama, arac_olcumu, yuklenen_bayt, token_kullanimini_kaydet
+from app.job_queue import isi_yurut
+from app.deadlines import asama_siniri, SureAsimi, sure_asimi_yaniti
+from app.model_routing import rota_sec, icerik_uret
+from app.lazy_imports import genai, hazirla
+from app.planner import medya_suresi, ses_plani, plan_tokeni, STRATEJI_RET
 
-# Ortak klasör yolu
-SHARED_UPLOADS_DIR = r'C:\mcpler\education_mcp\shared_uploads'
+logger = logging.getLogger(__name__)
 
+@arac_olcumu("ses")
 async def _ses_transkript_logic(ses_kaynagi: str, cikti_tipi: str = "ozet", hedef_dil: str = "otomatik") -> str:
     """Ses transkripsiyon işleminin tüm çekirdek mantığını içeren, test edilebilir ve asenkron çalışan fonksiyon."""
-    logging.info("Asenkron ses transkripsiyon işlemi başlatıldı")
-    logging.debug(f"Gelen parametreler - ses_kaynagi: {ses_kaynagi}, cikti_tipi: {cikti_tipi}, hedef_dil: {hedef_dil}")
+    logger.info("Asenkron ses transkripsiyon işlemi başlatıldı")
+    logger.debug("Gelen parametreler - ses_kaynagi: %s, cikti_tipi: %s, hedef_dil: %s", ses_kaynagi, cikti_tipi, hedef_dil)
     
     if not ses_kaynagi:
-        logging.warning("Ses kaynağı sağlanmadı")
+        logger.warning("Ses kaynağı sağlanmadı")
         return json.dumps({"durum": "Hata", "mesaj": "Bir ses dosyası yolu veya URL'i sağlamalısınız."}, ensure_ascii=False)
 
-    # Dosya yolunu işle - tam yoldan sadece dosya adını al
-    if os.path.sep in ses_kaynagi:
-        # Tam yol verilmiş, sadece dosya adını al
-        dosya_adi = os.path.basename(ses_kaynagi)
-        logging.info(f"Tam yol verildi, dosya adı çıkarıldı: {dosya_adi}")
-    else:
-        # Sadece dosya adı verilmiş
-        dosya_adi = ses_kaynagi
-        logging.info(f"Sadece dosya adı verildi: {dosya_adi}")
-    
-    # Dosya yolunu ortak klasörden oluştur
-    full_audio_path = os.path.join(SHARED_UPLOADS_DIR, dosya_adi)
-    logging.info(f"Ses dosyası aranıyor: {full_audio_path}")
+    # Dosyayı ortak depoda çözümle - tam yol verilmişse sadece dosya adı kullanılır
+    dosya_adi = depo.dosya_adi(ses_kaynagi)
+    full_audio_path = depo.yol(dosya_adi)
+    logger.info("Ses dosyası aranıyor: %s", full_audio_path)
 
+    ses_dosyasi = None
+    # İş sürerken dosyanın disk kotası nedeniyle tahliye edilmemesi için sabitle
+    await depo.sabitle(full_audio_path)
     try:
-        # Dosya varlığını kontrol et (asenkron)
-        if not await anyio.to_thread.run_sync(os.path.exists, full_audio_path):
-            logging.error(f"Ses dosyası bulunamadı: {full_audio_path}")
+        # Dosya varlığını kontrol et ve son erişim zamanını güncelle (asenkron)
+        if not await anyio.to_thread.run_sync(depo.erisim, full_audio_path):
+            logger.error("Ses dosyası bulunamadı: %s", full_audio_path)
             return json.dumps({"durum": "Hata", "mesaj": f"Ses dosyası bulunamadı: {dosya_adi}. Ortak klasörde dosya var mı kontrol edin."}, ensure_ascii=False)
         
         # Desteklenen ses formatlarını kontrol et
         desteklenen_formatlar = ['.mp3', '.wav', '.flac', '.m4a', '.aac', '.ogg', '.webm']
         dosya_uzantisi = os.path.splitext(full_audio_path)[1].lower()
         if dosya_uzantisi not in desteklenen_formatlar:
-            logging.error(f"Desteklenmeyen ses formatı: {dosya_uzantisi}")
+            logger.error("Desteklenmeyen ses formatı: %s", dosya_uzantisi)
             return json.dumps({"durum": "Hata", "mesaj": f"Desteklenen formatlar: {', '.join(desteklenen_formatlar)}"}, ensure_ascii=False)
         
         # Dosya boyutu kontrolü (asenkron)
         dosya_boyutu = await anyio.to_thread.run_sync(os.path.getsize, full_audio_path)
-        logging.debug(f"Ses dosya boyutu: {dosya_boyutu} bytes")
+        logger.debug("Ses dosya boyutu: %s bytes", dosya_boyutu)
         if dosya_boyutu > 100 * 1024 * 1024:  # 100MB
-            logging.warning(f"Ses dosyası çok büyük: {dosya_boyutu} bytes")
+            logger.warning("Ses dosyası çok büyük: %s bytes", dosya_boyutu)
             return json.dumps({"durum": "Hata", "mesaj": "Ses dosyası çok büyük (100MB sınırı). Daha küçük bir dosya deneyin."}, ensure_ascii=False)
 
+        # Önbellek kontrolü - aynı dosya aynı çıktı tipiyle daha önce işlendiyse model çağrısı yapılmaz
+        with asama("ses", "parmak_izi"):
+            parmak_izi = await anyio.to_thread.run_sync(dosya_parmak_izi, full_audio_path)
+        onbellek_verisi = await onbellekten_katman_al("ses", parmak_izi, cikti_tipi, hedef_dil)
+        if onbellek_verisi is not None:
+            return json.dumps({"durum": "Başarılı", "ses_analizi": onbellek_verisi}, ensure_ascii=False)
+
+        # Ön planlama - süre başlıktan okunur, bağlamı ya da çıktı sınırını aşan kayıt yüklenmeden reddedilir
+        with asama("ses", "planlama"), asama_siniri("ses", "planlama"):
+            sure, sure_yontemi = await anyio.to_thread.run_sync(medya_suresi, full_audio_path)
+            plan = ses_plani(sure, sure_yontemi, cikti_tipi)
+        if plan["strateji"] == STRATEJI_RET:
+            return json.dumps({"durum": "Hata", "mesaj": plan["gerekce"], "plan": plan}, ensure_ascii=False)
+
         # Gemini API'ye yükleme (asenkron)
         try:
-            logging.info(f"Ses dosyası Gemini API'ye yükleniyor: {full_audio_path}")
+            logger.info("Ses dosyası Gemini API'ye yükleniyor: %s", full_audio_path)
             # MIME type'ı belirle
             mime_map = {
                 '.mp3': 'audio/mp3',
@@ -73,50 +89,41 @@ async def _ses_transkript_logic(ses_kaynagi: str, cikti_tipi: str = "ozet", hede
             }
             mime_type = mime_map.get(dosya_uzantisi, 'audio/mpeg')
             
-            # genai.upload_file'ı anyio ile asenkron çalıştır
-            def upload_audio():
-                return genai.upload_file(path=full_audio_path, mime_type=mime_type)
-            
-            ses_dosyasi = await anyio.to_thread.run_sync(upload_audio)
-            logging.info(f"Yükleme başladı: {ses_dosyasi.name}. İşlenmesi bekleniyor...")
-            logging.debug(f"Ses dosyası durumu: {ses_dosyasi.state.name}")
+            with asama("ses", "yukleme", dosya_boyutu=dosya_boyutu, mime_type=mime_type), asama_siniri("ses", "yukleme"):
+                ses_dosyasi = await dosya_yukle("ses", full_audio_path, mime_type)
+            yuklenen_bayt.gozlemle(dosya_boyutu, "ses")
+            logger.info("Yükleme başladı: %s. İşlenmesi bekleniyor...", ses_dosyasi.name)
+            logger.debug("Ses dosyası durumu: %s", ses_dosyasi.state.name)
+        except SureAsimi as e:
+            return sure_asimi_yaniti(e)
         except Exception as upload_error:
-            logging.error(f"Gemini API yükleme hatası: {str(upload_error)}")
+            logger.error("Gemini API yükleme hatası: %s", upload_error)
             return json.dumps({"durum": "Hata", "mesaj": f"Ses dosyası Gemini API'ye yüklenemedi: {str(upload_error)}"}, ensure_ascii=False)
 
-        # Ses işleme bekleme (asenkron)
-        progress_counter = 0
-        max_wait_time = 120  # 2 dakika maksimum bekleme
-        while ses_dosyasi.state.name == "PROCESSING" and progress_counter < max_wait_time // 5:
-            progress_counter += 1
-            print('.', end='', flush=True)
-            logging.debug(f"İşleme devam ediyor... ({progress_counter * 5} saniye geçti)")
-            # asyncio.sleep ile asenkron bekleme
-            await asyncio.sleep(5)
-            ses_dosyasi = await anyio.to_thread.run_sync(genai.get_file, ses_dosyasi.name)
-
-        print()  # Satır sonu için
-        logging.info(f"Ses işleme tamamlandı. Final durumu: {ses_dosyasi.state.name}")
+        # Ses işleme bekleme (asenkron) - 2 dakika maksimum
+        with asama("ses", "isleme_bekleme"), asama_siniri("ses", "isleme_bekleme"):
+            ses_dosyasi = await islenmesini_bekle("ses", ses_dosyasi, max_bekleme_suresi=120)
+        logger.info("Ses işleme tamamlandı. Final durumu: %s", ses_dosyasi.state.name)
 
         if ses_dosyasi.state.name == "FAILED":
-            logging.error(f"Ses yüklemesi başarısız oldu: {ses_dosyasi.error}")
+            logger.error("Ses yüklemesi başarısız oldu: %s", ses_dosyasi.error)
             return json.dumps({"durum": "Hata", "mesaj": f"Ses işleme başarısız: {ses_dosyasi.error}"}, ensure_ascii=False)
         
         if ses_dosyasi.state.name == "PROCESSING":
-            logging.error("Ses işleme zaman aşımına uğradı")
+            logger.error("Ses işleme zaman aşımına uğradı")
             return json.dumps({"durum": "Hata", "mesaj": "Ses işleme çok uzun sürdü. Daha küçük bir dosya deneyin."}, ensure_ascii=False)
 
         # AI transkripsiyon ve analiz (asenkron)
         try:
-            logging.info(f"Ses başarıyla işlendi. AI transkripsiyon başlıyor... Tip: {cikti_tipi}, Hedef dil: {hedef_dil}")
+            logger.info("Ses başarıyla işlendi. AI transkripsiyon başlıyor... Tip: %s, Hedef dil: %s", cikti_tipi, hedef_dil)
             if not GEMINI_API_KEY:
-                logging.error("GEMINI_API_KEY bulunamadı")
+                logger.error("GEMINI_API_KEY bulunamadı")
                 return json.dumps({"durum": "Hata", "mesaj": "API anahtarı yapılandırılmamış. Lütfen .env dosyasını kontrol edin."}, ensure_ascii=False)
             
-            # Gemini API'yi yapılandır
-            genai.configure(api_key=GEMINI_API_KEY)
-            model = genai.GenerativeModel(model_name="gemini-1.5-pro")
-            logging.debug("Gemini model oluşturuldu")
+            # Gemini kütüphanesi ilk çağrıda worker thread'de yüklenir ve yapılandırılır
+            await hazirla(genai)
+            modeller = rota_sec("ses", cikti_tipi, girdi_boyutu=dosya_boyutu)
+            logger.debug("Model rotası: %s", modeller)
             
             # Dil ayarları için ek metin
             dil_talimat = ""
@@ -184,22 +191,26 @@ async def _ses_transkript_logic(ses_kaynagi: str, cikti_tipi: str = "ozet", hede
                 """
             
             # AI'dan yanıt al (asenkron)
-            logging.debug("Gemini API'ye istek gönderiliyor...")
-            response = await anyio.to_thread.run_sync(model.generate_content, [ses_dosyasi, prompt])
-            logging.debug("Gemini API yanıtı alındı")
+            logger.debug("Gemini API'ye istek gönderiliyor...")
+            with asama("ses", "uretim", cikti_tipi=cikti_tipi), asama_siniri("ses", "uretim"):
+                response = await icerik_uret("ses", modeller, [ses_dosyasi, prompt], tahmini_token=plan_tokeni(plan))
+            token_kullanimini_kaydet("ses", response)
+            logger.debug("Gemini API yanıtı alındı")
             
             if not response.text:
-                logging.error("Gemini API'den boş yanıt geldi")
+                logger.error("Gemini API'den boş yanıt geldi")
                 return json.dumps({"durum": "Hata", "mesaj": "AI'dan yanıt alınamadı. Lütfen tekrar deneyin."}, ensure_ascii=False)
             
             # JSON yanıtını parse et
             try:
-                transkript_data = json.loads(response.text)
-                logging.info("AI yanıtı başarıyla parse edildi")
-                logging.debug(f"Parse edilen veri anahtarları: {list(transkript_data.keys())}")
+                with asama("ses", "ayristirma"):
+                    transkript_data = json.loads(response.text)
+                logger.info("AI yanıtı başarıyla parse edildi")
+                logger.debug("Parse edilen veri anahtarları: %s", list(transkript_data.keys()))
+                await sonucu_onbellege_yaz("ses", parmak_izi, cikti_tipi, hedef_dil, transkript_data)
             except json.JSONDecodeError as json_error:
-                logging.error(f"JSON parse hatası: {str(json_error)}")
-                logging.debug(f"Ham AI yanıtı: {response.text[:500]}...")
+                logger.error("JSON parse hatası: %s", json_error)
+                logger.debug("Ham AI yanıtı: %.500s...", response.text)
                 # JSON parse hatası durumunda yedek yanıt
                 transkript_data = {
                     "ses_dili": "Tespit edilemedi",
@@ -208,28 +219,28 @@ async def _ses_transkript_logic(ses_kaynagi: str, cikti_tipi: str = "ozet", hede
                     "parse_hatasi": "AI yanıtı JSON formatında değil, ham yanıt ham_yanit alanında bulunuyor."
                 }
                 
+        except SureAsimi as e:
+            return sure_asimi_yaniti(e)
         except Exception as ai_error:
-            logging.error(f"AI transkripsiyon hatası: {str(ai_error)}")
+            logger.error("AI transkripsiyon hatası: %s", ai_error)
             return json.dumps({"durum": "Hata", "mesaj": f"AI transkripsiyon oluşturulamadı: {str(ai_error)}"}, ensure_ascii=False)
 
-        # Temizlik (asenkron)
-        try:
-            logging.info("Yüklenen ses dosyası API'den siliniyor...")
-            await anyio.to_thread.run_sync(genai.delete_file, ses_dosyasi.name)
-            logging.info(f"Yüklenen dosya ({ses_dosyasi.name}) API'den başarıyla silindi")
-        except Exception as delete_error:
-            logging.warning(f"API'den dosya silme hatası: {str(delete_error)}")
-
-        logging.info("Ses transkripsiyon işlemi başarıyla tamamlandı")
-        return json.dumps({"durum": "Başarılı", "ses_analizi": transkript_data}, ensure_ascii=False)
+        logger.info("Ses transkripsiyon işlemi başarıyla tamamlandı")
+        return json.dumps({"durum": "Başarılı", "ses_analizi": transkript_data, "plan": plan}, ensure_ascii=False)
 
+    except SureAsimi as e:
+        return sure_asimi_yaniti(e)
     except Exception as e:
-        logging.error(f"Beklenmeyen hata: {str(e)}", exc_info=True)
-        logging.debug(f"Hata türü: {type(e).__name__}")
+        logger.error("Beklenmeyen hata: %s", e, exc_info=True)
+        logger.debug("Hata türü: %s", type(e).__name__)
         return json.dumps({"durum": "Hata", "mesaj": f"Beklenmeyen bir hata oluştu: {str(e)}"}, ensure_ascii=False)
+    finally:
+        # Yüklenen dosya hata yollarında da arka planda silinmek üzere bırakılır
+        dosyayi_birak(ses_dosyasi)
+        await depo.sabitlemeyi_kaldir(full_audio_path)
 
 @mcp.tool(tags={"public"})
-async def ses_dosyasini_transkript_et(ses_dosyasi_yolu: str, cikti_tipi: str = "ozet", hedef_dil: str = "otomatik") -> str:
+async def ses_dosyasini_transkript_et(ses_dosyasi_yolu: str, cikti_tipi: str = "ozet", hedef_dil: str = "otomatik", sure_siniri_sn: float = 0) -> str:
     """
     GELİŞMİŞ SES TRANSKRİPSİYON AJANI - Verilen ses dosyasını yazıya çevirir ve detaylı analiz yapar.
 
@@ -239,6 +250,7 @@ async def ses_dosyasini_transkript_et(ses_dosyasi_yolu: str, cikti_tipi: str = "
         ses_dosyasi_yolu (str): Transkript edilecek ses dosyasının yolu.
         cikti_tipi (str): Çıktı türü - "transkript" (sadece yazıya çevirme), "ozet" (transkript + detaylı analiz + önemli noktalar vurgulamalı). Varsayılan: "ozet"
         hedef_dil (str): Çıktının hangi dilde olmasını istediğiniz - "otomatik" (ses dilinde), "Türkçe", "İngilizce", "Almanca" vb. Varsayılan: "otomatik"
+        sure_siniri_sn (float): Çağrının en fazla süresi (saniye). 0: sunucu varsayılanı (SURE_SINIRI_SES). Süre dolarsa "zaman_asimi": true içeren bir hata döner.
     
     Returns:
         str: Ses dosyasının transkript ve analizini içeren bir JSON string'i. İçerik:
@@ -255,7 +267,7 @@ async def ses_dosyasini_transkript_et(ses_dosyasi_yolu: str, cikti_tipi: str = "
         
     Desteklenen formatlar: MP3, WAV, FLAC, M4A, AAC, OGG, WebM
     """
-    logging.info("ses_dosyasini_transkript_et async tool'u çağrıldı")
-    # Bu fonksiyon, asıl işi yapan asenkron logic fonksiyonunu çağırır.
-    return await _ses_transkript_logic(ses_kaynagi=ses_dosyasi_yolu, cikti_tipi=cikti_tipi, hedef_dil=hedef_dil)
+    logger.info("ses_dosyasini_transkript_et async tool'u çağrıldı")
+    # Asıl iş logic fonksiyonunda; iş kuyruğu açıksa bir işçi sürecinde yürütülür.
+    return await isi_yurut("ses", sure_siniri_sn=sure_siniri_sn, ses_kaynagi=ses_dosyasi_yolu, cikti_tipi=cikti_tipi, hedef_dil=hedef_dil)
 
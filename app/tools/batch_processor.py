@@ -0,0 +1,170 @@
+import json
+import logging
+import asyncio  # Asenkron operasyonlar için temel kütüphane
+from contextlib import asynccontextmanager
+from fastmcp import Context
+from app.server import mcp
+from app.config import TOPLU_ESZAMANLILIK, TOPLU_MAKS_DOSYA
+from app.job_queue import isi_yurut
+from app.deadlines import butce_olarak
+from app.metrics import metrikler
+from app.fair_scheduler import aktif_istemci
+from app import tracing
+
+logger = logging.getLogger(__name__)
+
+# İstemci başına toplu eşzamanlılık bütçesi - bir istemcinin toplu çağrılarından aynı anda en fazla
+# TOPLU_ESZAMANLILIK dosya hatta (adil zamanlayıcı sırasında ya da yürüyor) bulunur. Bütçe istemci başına
+# olduğu için bir istemcinin büyük partisi diğer istemcilerin partilerini adil zamanlayıcıya ulaşmadan
+# bekletemez; süreç genelindeki sınırı adil zamanlayıcı (ADIL_ESZAMANLILIK, ISTEMCI_MAKS_ESZAMANLILIK) koyar.
+# istemci -> [semafor, bütçeyi tutan ya da bekleyen dosya sayısı]
+toplu_is_butceleri = {}
+# Bütçeyi bekleyen ve bütçe içinde işlenen dosya sayıları; ölçerler bu sayaçları okur
+toplu_dosyalar = {"aktif": 0, "bekleyen": 0}
+metrikler.olcer_ekle("edumcp_toplu_aktif_dosya", "Toplu araçlarda şu anda işlenen dosya sayısı",
+                     lambda: toplu_dosyalar["aktif"])
+metrikler.olcer_ekle("edumcp_toplu_bekleyen_dosya", "Toplu araçlarda eşzamanlılık bütçesini bekleyen dosya sayısı (kuyruk derinliği)",
+                     lambda: toplu_dosyalar["bekleyen"])
+
+
+@asynccontextmanager
+async def _butce_icinde(istemci: str):
+    """
+    İstemcinin toplu bütçesinden pay alır, beklerken ve işlerken sayaçları günceller (iptalde de geri alınır).
+    Kullanan dosyası kalmayan istemcinin bütçesi silinir.
+    """
+    butce = toplu_is_butceleri.setdefault(istemci, [asyncio.Semaphore(TOPLU_ESZAMANLILIK), 0])
+    butce[1] += 1
+    toplu_dosyalar["bekleyen"] += 1
+    try:
+        try:
+            await butce[0].acquire()
+        finally:
+            toplu_dosyalar["bekleyen"] -= 1
+        toplu_dosyalar["aktif"] += 1
+        try:
+            yield
+        finally:
+            toplu_dosyalar["aktif"] -= 1
+            butce[0].release()
+    finally:
+        butce[1] -= 1
+        if not butce[1]:
+            del toplu_is_butceleri[istemci]
+
+
+async def _toplu_isle(dosyalar: list, isleyici, ctx: Context = None, sure_siniri_sn: float = 0) -> list:
+    """
+    Dosyaları çağıran istemcinin bütçesi altında eşzamanlı işler, her dosyanın sonucunu biter bitmez istemciye akıtır.
+    sure_siniri_sn verilirse tüm parti bu süreyle sınırlıdır: süresinde bitmeyen dosyalar zaman aşımı sonucu
+    alır, biten dosyaların sonuçları döner.
+    """
+    # Aynı dosya listede birden fazla geçiyorsa tek sefer işlenir
+    benzersiz_dosyalar = list(dict.fromkeys(dosyalar))
+    toplam = len(benzersiz_dosyalar)
+    istemci = aktif_istemci()
+
+    async def tek_dosya(sira: int, dosya: str):
+        async with _butce_icinde(istemci):
+            logger.debug("Toplu işlem: %s işleniyor (%s/%s)", dosya, sira + 1, toplam)
+            try:
+                sonuc = json.loads(await isleyici(dosya))
+            except Exception as e:
+                logger.error("Toplu işlemde %s için hata: %s", dosya, e)
+                sonuc = {"durum": "Hata", "mesaj": f"Beklenmeyen bir hata oluştu: {str(e)}"}
+            return sira, dosya, sonuc
+
+    # Dosya görevleri bu span açıkken oluşturulur; her dosyanın izi toplu çağrının izine bağlanır
+    with tracing.span("toplu.cagri", dosya_sayisi=toplam), butce_olarak("toplu", sure_siniri_sn):
+        gorevler = [asyncio.create_task(tek_dosya(sira, dosya)) for sira, dosya in enumerate(benzersiz_dosyalar)]
+        sonuclar = [None] * toplam
+        tamamlanan = 0
+        try:
+            for gelecek in asyncio.as_completed(gorevler):
+                sira, dosya, sonuc = await gelecek
+                sonuclar[sira] = {"dosya": dosya, "sonuc": sonuc}
+                tamamlanan += 1
+                logger.info("Toplu işlem ilerlemesi: %s/%s (%s: %s)", tamamlanan, toplam, dosya, sonuc.get('durum'))
+                if ctx is not None:
+                    # Dosya sonucu, tüm parti bitmeden istemciye log bildirimi olarak gönderilir
+                    await ctx.report_progress(tamamlanan, toplam, message=dosya)
+                    await ctx.info(json.dumps({"dosya": dosya, "sonuc": sonuc}, ensure_ascii=False))
+        finally:
+            for gorev in gorevler:
+                gorev.cancel()
+    return sonuclar
+
+
+def _dosya_listesini_dogrula(dosyalar: list):
+    if not dosyalar:
+        return "En az bir dosya sağlamalısınız."
+    if len(dosyalar) > TOPLU_MAKS_DOSYA:
+        return f"Tek çağrıda en fazla {TOPLU_MAKS_DOSYA} dosya işlenebilir."
+    return None
+
+
+def _toplu_yanit(sonuclar: list) -> str:
+    basarili = sum(1 for s in sonuclar if s["sonuc"].get("durum") == "Başarılı")
+    return json.dumps({
+        "durum": "Başarılı" if basarili else "Hata",
+        "toplam_dosya": len(sonuclar),
+        "basarili_dosya": basarili,
+        "hatali_dosya": len(sonuclar) - basarili,
+        "sonuclar": sonuclar
+    }, ensure_ascii=False)
+
+
+@mcp.tool(tags={"public"})
+async def toplu_pdf_ozetle(pdf_dosyalari: list[str], ozet_tipi: str = "kisa", hedef_dil: str = "otomatik", sure_siniri_sn: float = 0, ctx: Context = None) -> str:
+    """
+    TOPLU PDF ÖZETLEME AJANI - Ortak klasördeki birden fazla PDF belgesini tek çağrıda, eşzamanlı olarak özetler.
+
+    Kullanıcı bir ders klasörünü, "bu PDF'lerin hepsini özetle" gibi çok sayıda belgeyi aynı anda işlemek istediğinde bu aracı kullan.
+
+    Args:
+        pdf_dosyalari (list[str]): Özetlenecek PDF dosyalarının adları veya yolları.
+        ozet_tipi (str): Özet türü - "kisa", "genis", "kapsamli". Varsayılan: "kisa"
+        hedef_dil (str): Özetlerin dili - "otomatik", "Türkçe", "İngilizce" vb. Varsayılan: "otomatik"
+        sure_siniri_sn (float): Tüm partinin en fazla süresi (saniye). 0: sınır yok, her dosya kendi varsayılan süre sınırıyla işlenir.
+
+    Returns:
+        str: Her dosya için pdf_ozetle sonucunu içeren bir JSON string'i. Dosya sonuçları tamamlandıkça
+        ilerleme ve log bildirimleri olarak da gönderilir.
+    """
+    logger.info("toplu_pdf_ozetle async tool'u çağrıldı (%s dosya)", len(pdf_dosyalari or []))
+    hata = _dosya_listesini_dogrula(pdf_dosyalari)
+    if hata:
+        return json.dumps({"durum": "Hata", "mesaj": hata}, ensure_ascii=False)
+
+    async def isleyici(dosya):
+        return await isi_yurut("pdf", pdf_dosyasi_yolu=dosya, ozet_tipi=ozet_tipi, hedef_dil=hedef_dil)
+
+    return _toplu_yanit(await _toplu_isle(pdf_dosyalari, isleyici, ctx, sure_siniri_sn))
+
+
+@mcp.tool(tags={"public"})
+async def toplu_ses_transkript_et(ses_dosyalari: list[str], cikti_tipi: str = "ozet", hedef_dil: str = "otomatik", sure_siniri_sn: float = 0, ctx: Context = None) -> str:
+    """
+    TOPLU SES TRANSKRİPSİYON AJANI - Ortak klasördeki birden fazla ses dosyasını tek çağrıda, eşzamanlı olarak yazıya çevirir ve analiz eder.
+
+    Kullanıcı bir dersin tüm ses kayıtlarını ya da çok sayıda ses dosyasını aynı anda işlemek istediğinde bu aracı kullan.
+
+    Args:
+        ses_dosyalari (list[str]): Transkript edilecek ses dosyalarının adları veya yolları.
+        cikti_tipi (str): Çıktı türü - "transkript" veya "ozet". Varsayılan: "ozet"
+        hedef_dil (str): Çıktının dili - "otomatik", "Türkçe", "İngilizce" vb. Varsayılan: "otomatik"
+        sure_siniri_sn (float): Tüm partinin en fazla süresi (saniye). 0: sınır yok, her dosya kendi varsayılan süre sınırıyla işlenir.
+
+    Returns:
+        str: Her dosya için ses_dosyasini_transkript_et sonucunu içeren bir JSON string'i. Dosya sonuçları
+        tamamlandıkça ilerleme ve log bildirimleri olarak da gönderilir.
+    """
+    logger.info("toplu_ses_transkript_et async tool'u çağrıldı (%s dosya)", len(ses_dosyalari or []))
+    hata = _dosya_listesini_dogrula(ses_dosyalari)
+    if hata:
+        return json.dumps({"durum": "Hata", "mesaj": hata}, ensure_ascii=False)
+
+    async def isleyici(dosya):
+        return await isi_yurut("ses", ses_kaynagi=dosya, cikti_tipi=cikti_tipi, hedef_dil=hedef_dil)
+
+    return _toplu_yanit(await _toplu_isle(ses_dosyalari, isleyici, ctx, sure_siniri_sn))
@@ -0,0 +1,30 @@
+import json
+import logging
+import anyio
+from app.server import mcp
+from app.job_queue import is_kuyrugu
+
+logger = logging.getLogger(__name__)
+
+
+@mcp.tool(tags={"public"})
+async def is_durumu(is_kimligi: str) -> str:
+    """
+    İŞ DURUMU SORGULAMA - Kuyruğa alınmış bir PDF, ses veya video işinin durumunu ve bittiyse sonucunu döndürür.
+
+    Bir araç "Kuyrukta" durumuyla ve bir iş kimliğiyle döndüğünde, sonucu almak için bu aracı o kimlikle çağır.
+
+    Args:
+        is_kimligi (str): Aracın döndürdüğü iş kimliği.
+
+    Returns:
+        str: İşin durumunu içeren bir JSON string'i. is_durumu alanı "bekliyor" (sira ile), "calisiyor",
+        "tamamlandi", "hata" ya da (sonucu bekleyen istemci kalmadıysa) "iptal" olur; iş bittiyse aracın kendi yanıtı "sonuc" alanında döner.
+    """
+    logger.info("is_durumu async tool'u çağrıldı: %s", is_kimligi)
+    bilgi = await anyio.to_thread.run_sync(is_kuyrugu.bilgi, (is_kimligi or "").strip())
+    if bilgi is None:
+        return json.dumps({"durum": "Hata", "mesaj": f"İş bulunamadı: {is_kimligi}"}, ensure_ascii=False)
+    if "sonuc" in bilgi:
+        bilgi["sonuc"] = json.loads(bilgi["sonuc"])
+    return json.dumps({"durum": "Başarılı", **bilgi}, ensure_ascii=False)
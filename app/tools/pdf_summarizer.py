@@ -1,103 +1,115 @@
 import os
 import json
-import asyncio  # Asenkron operasyonlar için temel kütüphane
 import time
 import anyio
 import logging
-import google.generativeai as genai
 from app.config import GEMINI_API_KEY
 from app.server import mcp
+from app.cache import dosya_parmak_izi
+from app.storage import depo
+from app.gemini_files import dosya_yukle, islenmesini_bekle, dosyayi_birak
+from app.summary_tiers import onbellekten_katman_al, sonucu_onbellege_yaz
+from app.metrics import asama, arac_olcumu, yuklenen_bayt, token_kullanimini_kaydet
+from app.job_queue import isi_yurut
+from app.deadlines import asama_siniri, SureAsimi, sure_asimi_yaniti
+from app.model_routing import rota_sec, icerik_uret
+from app.lazy_imports import genai, hazirla
+from app.planner import pdf_plani, pdf_metni, metni_parcala, parcali_uret, plan_tokeni, STRATEJI_RET, STRATEJI_METIN, STRATEJI_PARCALI
 
-# Ortak klasör yolu
-SHARED_UPLOADS_DIR = r'C:\mcpler\education_mcp\shared_uploads'
+logger = logging.getLogger(__name__)
 
+@arac_olcumu("pdf")
 async def _pdf_ozetle_logic(pdf_dosyasi_yolu: str, ozet_tipi: str = "kisa", hedef_dil: str = "otomatik") -> str:
     """PDF özetlemenin tüm çekirdek mantığını içeren, test edilebilir ve asenkron çalışan fonksiyon."""
-    logging.info("Asenkron PDF özetleme işlemi başlatıldı")
-    logging.debug(f"Gelen parametreler - pdf_dosyasi_yolu: {pdf_dosyasi_yolu}, ozet_tipi: {ozet_tipi}, hedef_dil: {hedef_dil}")
+    logger.info("Asenkron PDF özetleme işlemi başlatıldı")
+    logger.debug("Gelen parametreler - pdf_dosyasi_yolu: %s, ozet_tipi: %s, hedef_dil: %s", pdf_dosyasi_yolu, ozet_tipi, hedef_dil)
     
     if not pdf_dosyasi_yolu:
-        logging.warning("PDF dosya yolu sağlanmadı")
+        logger.warning("PDF dosya yolu sağlanmadı")
         return json.dumps({"durum": "Hata", "mesaj": "Bir PDF dosya yolu sağlamalısınız."}, ensure_ascii=False)
 
-    # Dosya yolunu işle - tam yoldan sadece dosya adını al
-    if os.path.sep in pdf_dosyasi_yolu:
-        # Tam yol verilmiş, sadece dosya adını al
-        dosya_adi = os.path.basename(pdf_dosyasi_yolu)
-        logging.info(f"Tam yol verildi, dosya adı çıkarıldı: {dosya_adi}")
-    else:
-        # Sadece dosya adı verilmiş
-        dosya_adi = pdf_dosyasi_yolu
-        logging.info(f"Sadece dosya adı verildi: {dosya_adi}")
-    
-    # Dosya yolunu ortak klasörden oluştur
-    full_pdf_path = os.path.join(SHARED_UPLOADS_DIR, dosya_adi)
-    logging.info(f"PDF dosyası aranıyor: {full_pdf_path}")
+    # Dosyayı ortak depoda çözümle - tam yol verilmişse sadece dosya adı kullanılır
+    dosya_adi = depo.dosya_adi(pdf_dosyasi_yolu)
+    full_pdf_path = depo.yol(dosya_adi)
+    logger.info("PDF dosyası aranıyor: %s", full_pdf_path)
 
+    pdf_file = None
+    # İş sürerken dosyanın disk kotası nedeniyle tahliye edilmemesi için sabitle
+    await depo.sabitle(full_pdf_path)
     try:
-        # Dosya varlığını kontrol et (asenkron)
-        if not await anyio.to_thread.run_sync(os.path.exists, full_pdf_path):
-            logging.error(f"PDF dosyası bulunamadı: {full_pdf_path}")
+        # Dosya varlığını kontrol et ve son erişim zamanını güncelle (asenkron)
+        if not await anyio.to_thread.run_sync(depo.erisim, full_pdf_path):
+            logger.error("PDF dosyası bulunamadı: %s", full_pdf_path)
             return json.dumps({"durum": "Hata", "mesaj": f"PDF dosyası bulunamadı: {dosya_adi}. Ortak klasörde dosya var mı kontrol edin."}, ensure_ascii=False)
         
         # Dosya uzantısını kontrol et
         if not full_pdf_path.lower().endswith('.pdf'):
-            logging.error(f"Dosya PDF formatında değil: {full_pdf_path}")
+            logger.error("Dosya PDF formatında değil: %s", full_pdf_path)
             return json.dumps({"durum": "Hata", "mesaj": "Sadece PDF dosyaları desteklenmektedir."}, ensure_ascii=False)
         
         # Dosya boyutu kontrolü (asenkron)
         dosya_boyutu = await anyio.to_thread.run_sync(os.path.getsize, full_pdf_path)
-        logging.debug(f"PDF dosya boyutu: {dosya_boyutu} bytes")
+        logger.debug("PDF dosya boyutu: %s bytes", dosya_boyutu)
         if dosya_boyutu > 50 * 1024 * 1024:  # 50MB
-            logging.warning(f"PDF çok büyük: {dosya_boyutu} bytes")
+            logger.warning("PDF çok büyük: %s bytes", dosya_boyutu)
             return json.dumps({"durum": "Hata", "mesaj": "PDF dosyası çok büyük (50MB sınırı). Daha küçük bir dosya deneyin."}, ensure_ascii=False)
 
-        # Gemini API'ye yükleme (asenkron)
-        try:
-            logging.info(f"PDF Gemini API'ye yükleniyor: {full_pdf_path}")
-            # genai.upload_file'ı anyio ile asenkron çalıştır
-            def upload_pdf():
-                return genai.upload_file(path=full_pdf_path, mime_type="application/pdf")
-            
-            pdf_file = await anyio.to_thread.run_sync(upload_pdf)
-            logging.info(f"Yükleme başladı: {pdf_file.name}. İşlenmesi bekleniyor...")
-            logging.debug(f"PDF dosyası durumu: {pdf_file.state.name}")
-        except Exception as upload_error:
-            logging.error(f"Gemini API yükleme hatası: {str(upload_error)}")
-            return json.dumps({"durum": "Hata", "mesaj": f"PDF Gemini API'ye yüklenemedi: {str(upload_error)}"}, ensure_ascii=False)
+        # Önbellek kontrolü - aynı katman ya da daha zengin "kapsamli" sonuç varsa model çağrısı yapılmaz
+        with asama("pdf", "parmak_izi"):
+            parmak_izi = await anyio.to_thread.run_sync(dosya_parmak_izi, full_pdf_path)
+        onbellek_verisi = await onbellekten_katman_al("pdf", parmak_izi, ozet_tipi, hedef_dil)
+        if onbellek_verisi is not None:
+            return json.dumps({"durum": "Başarılı", "belge_analizi": onbellek_verisi}, ensure_ascii=False)
 
-        # PDF işleme bekleme (asenkron)
-        progress_counter = 0
-        max_wait_time = 180  # 3 dakika maksimum bekleme (PDF'ler daha uzun sürebilir)
-        while pdf_file.state.name == "PROCESSING" and progress_counter < max_wait_time // 5:
-            progress_counter += 1
-            print('.', end='', flush=True)
-            logging.debug(f"İşleme devam ediyor... ({progress_counter * 5} saniye geçti)")
-            # asyncio.sleep ile asenkron bekleme
-            await asyncio.sleep(5)
-            pdf_file = await anyio.to_thread.run_sync(genai.get_file, pdf_file.name)
+        # Ön planlama - yüklemeden önce token tahmini ile strateji seçilir; sınırı aşan istek ağ işi yapılmadan reddedilir
+        with asama("pdf", "planlama"), asama_siniri("pdf", "planlama"):
+            plan = await anyio.to_thread.run_sync(pdf_plani, full_pdf_path, ozet_tipi)
+        if plan["strateji"] == STRATEJI_RET:
+            return json.dumps({"durum": "Hata", "mesaj": plan["gerekce"], "plan": plan}, ensure_ascii=False)
+
+        belge_metni = None
+        if plan["strateji"] in (STRATEJI_METIN, STRATEJI_PARCALI):
+            # Metin katmanı yerelde çıkarılır; yükleme ve işleme beklemesi yapılmaz
+            with asama("pdf", "metin_cikarma"):
+                belge_metni = await anyio.to_thread.run_sync(pdf_metni, full_pdf_path)
+        else:
+            # Gemini API'ye yükleme (asenkron)
+            try:
+                logger.info("PDF Gemini API'ye yükleniyor: %s", full_pdf_path)
+                with asama("pdf", "yukleme", dosya_boyutu=dosya_boyutu, mime_type="application/pdf"), asama_siniri("pdf", "yukleme"):
+                    pdf_file = await dosya_yukle("pdf", full_pdf_path, "application/pdf")
+                yuklenen_bayt.gozlemle(dosya_boyutu, "pdf")
+                logger.info("Yükleme başladı: %s. İşlenmesi bekleniyor...", pdf_file.name)
+                logger.debug("PDF dosyası durumu: %s", pdf_file.state.name)
+            except SureAsimi as e:
+                return sure_asimi_yaniti(e)
+            except Exception as upload_error:
+                logger.error("Gemini API yükleme hatası: %s", upload_error)
+                return json.dumps({"durum": "Hata", "mesaj": f"PDF Gemini API'ye yüklenemedi: {str(upload_error)}"}, ensure_ascii=False)
 
-        print()  # Satır sonu için
-        logging.info(f"PDF işleme tamamlandı. Final durumu: {pdf_file.state.name}")
+            # PDF işleme bekleme (asenkron) - 3 dakika maksimum (PDF'ler daha uzun sürebilir)
+            with asama("pdf", "isleme_bekleme"), asama_siniri("pdf", "isleme_bekleme"):
+                pdf_file = await islenmesini_bekle("pdf", pdf_file, max_bekleme_suresi=180)
+            logger.info("PDF işleme tamamlandı. Final durumu: %s", pdf_file.state.name)
 
-        if pdf_file.state.name == "FAILED":
-            logging.error(f"PDF yüklemesi başarısız oldu: {pdf_file.error}")
-            return json.dumps({"durum": "Hata", "mesaj": f"PDF işleme başarısız: {pdf_file.error}"}, ensure_ascii=False)
+            if pdf_file.state.name == "FAILED":
+                logger.error("PDF yüklemesi başarısız oldu: %s", pdf_file.error)
+                return json.dumps({"durum": "Hata", "mesaj": f"PDF işleme başarısız: {pdf_file.error}"}, ensure_ascii=False)
         
-        if pdf_file.state.name == "PROCESSING":
-            logging.error("PDF işleme zaman aşımına uğradı")
-            return json.dumps({"durum": "Hata", "mesaj": "PDF işleme çok uzun sürdü. Daha küçük bir dosya deneyin."}, ensure_ascii=False)
+            if pdf_file.state.name == "PROCESSING":
+                logger.error("PDF işleme zaman aşımına uğradı")
+                return json.dumps({"durum": "Hata", "mesaj": "PDF işleme çok uzun sürdü. Daha küçük bir dosya deneyin."}, ensure_ascii=False)
 
         # AI özet oluşturma (asenkron)
         try:
-            logging.info(f"PDF başarıyla işlendi. AI özet oluşturma başlıyor... Tip: {ozet_tipi}, Hedef dil: {hedef_dil}")
+            logger.info("PDF başarıyla işlendi. AI özet oluşturma başlıyor... Tip: %s, Hedef dil: %s", ozet_tipi, hedef_dil)
             if not GEMINI_API_KEY:
-                logging.error("GEMINI_API_KEY bulunamadı")
+                logger.error("GEMINI_API_KEY bulunamadı")
                 return json.dumps({"durum": "Hata", "mesaj": "API anahtarı yapılandırılmamış. Lütfen .env dosyasını kontrol edin."}, ensure_ascii=False)
-            # Gemini API'yi yapılandır
-            genai.configure(api_key=GEMINI_API_KEY)
-            model = genai.GenerativeModel(model_name="gemini-1.5-pro-latest")
-            logging.debug("Gemini model oluşturuldu")
+            # Gemini kütüphanesi ilk çağrıda worker thread'de yüklenir ve yapılandırılır
+            await hazirla(genai)
+            modeller = rota_sec("pdf", ozet_tipi, girdi_boyutu=dosya_boyutu)
+            logger.debug("Model rotası: %s", modeller)
             
             # Dil ayarları için ek metin
             dil_talimat = ""
@@ -200,26 +212,39 @@ async def _pdf_ozetle_logic(pdf_dosyasi_yolu: str, ozet_tipi: str = "kisa", hede
                 Lütfen yanıtını sadece JSON formatında ver, başka metin ekleme.
                 """
             
-            logging.info("AI'dan PDF özeti isteniyor (asenkron)...")
-            # model.generate_content anyio ile asenkron çalıştırılır
-            response = await anyio.to_thread.run_sync(model.generate_content, [prompt, pdf_file])
-            logging.info("AI PDF özeti başarıyla oluşturuldu")
-            logging.debug(f"Özet uzunluğu: {len(response.text)} karakter")
+            logger.info("AI'dan PDF özeti isteniyor (asenkron)...")
+            # Model rota tablosuna göre seçilir; kota/aşırı yük hatasında yedek modele geçilir
+            # Parçalı stratejide süre sınırında bitmeyen bölümler (sonuç kısmi olur ve önbelleğe yazılmaz)
+            eksik_bolumler = []
+            with asama("pdf", "uretim", ozet_tipi=ozet_tipi), asama_siniri("pdf", "uretim"):
+                if plan["strateji"] == STRATEJI_PARCALI:
+                    parcalar = metni_parcala(belge_metni, plan["parca_sayisi"])
+                    response, eksik_bolumler = await parcali_uret("pdf", modeller, prompt, parcalar)
+                elif belge_metni is not None:
+                    response = await icerik_uret("pdf", modeller, [prompt, "BELGE METNİ:\n" + belge_metni])
+                else:
+                    response = await icerik_uret("pdf", modeller, [prompt, pdf_file], tahmini_token=plan_tokeni(plan))
+            token_kullanimini_kaydet("pdf", response)
+            logger.info("AI PDF özeti başarıyla oluşturuldu")
+            logger.debug("Özet uzunluğu: %s karakter", len(response.text))
             
             # JSON cevabını parse et
             try:
-                # Gemini'nin cevabını temizle (markdown kod blokları varsa)
-                clean_response = response.text.strip()
-                if clean_response.startswith('```json'):
-                    clean_response = clean_response.replace('```json', '').replace('```', '').strip()
-                elif clean_response.startswith('```'):
-                    clean_response = clean_response.replace('```', '').strip()
-                
-                ozet_data = json.loads(clean_response)
-                logging.info("AI cevabı başarıyla JSON formatında parse edildi")
+                with asama("pdf", "ayristirma"):
+                    # Gemini'nin cevabını temizle (markdown kod blokları varsa)
+                    clean_response = response.text.strip()
+                    if clean_response.startswith('```json'):
+                        clean_response = clean_response.replace('```json', '').replace('```', '').strip()
+                    elif clean_response.startswith('```'):
+                        clean_response = clean_response.replace('```', '').strip()
+                    
+                    ozet_data = json.loads(clean_response)
+                logger.info("AI cevabı başarıyla JSON formatında parse edildi")
+                if not eksik_bolumler:
+                    await sonucu_onbellege_yaz("pdf", parmak_izi, ozet_tipi, hedef_dil, ozet_data)
                 
             except json.JSONDecodeError as json_error:
-                logging.error(f"AI cevabı JSON formatında parse edilemedi: {json_error}")
+                logger.error("AI cevabı JSON formatında parse edilemedi: %s", json_error)
                 # Fallback: Ham metni kullan
                 if ozet_tipi == "kisa":
                     ozet_data = {
@@ -271,28 +296,31 @@ async def _pdf_ozetle_logic(pdf_dosyasi_yolu: str, ozet_tipi: str = "kisa", hede
                         "alinti_onerileri": []
                     }
                 
+        except SureAsimi as e:
+            return sure_asimi_yaniti(e)
         except Exception as ai_error:
-            logging.error(f"AI PDF özet oluşturma hatası: {str(ai_error)}")
+            logger.error("AI PDF özet oluşturma hatası: %s", ai_error)
             return json.dumps({"durum": "Hata", "mesaj": f"AI PDF özeti oluşturulamadı: {str(ai_error)}"}, ensure_ascii=False)
 
-        # Temizlik (asenkron)
-        try:
-            logging.info("Yüklenen PDF dosyası API'den siliniyor...")
-            await anyio.to_thread.run_sync(genai.delete_file, pdf_file.name)
-            logging.info(f"Yüklenen dosya ({pdf_file.name}) API'den başarıyla silindi")
-        except Exception as delete_error:
-            logging.warning(f"API'den dosya silme hatası: {str(delete_error)}")
-
-        logging.info("PDF özetleme işlemi başarıyla tamamlandı")
-        return json.dumps({"durum": "Başarılı", "belge_analizi": ozet_data}, ensure_ascii=False)
+        logger.info("PDF özetleme işlemi başarıyla tamamlandı")
+        if eksik_bolumler:
+            return json.dumps({"durum": "Başarılı", "belge_analizi": ozet_data, "plan": plan, "kismi_sonuc": True,
+                               "eksik_bolumler": eksik_bolumler}, ensure_ascii=False)
+        return json.dumps({"durum": "Başarılı", "belge_analizi": ozet_data, "plan": plan}, ensure_ascii=False)
 
+    except SureAsimi as e:
+        return sure_asimi_yaniti(e)
     except Exception as e:
-        logging.error(f"Beklenmeyen hata: {str(e)}", exc_info=True)
-        logging.debug(f"Hata türü: {type(e).__name__}")
+        logger.error("Beklenmeyen hata: %s", e, exc_info=True)
+        logger.debug("Hata türü: %s", type(e).__name__)
         return json.dumps({"durum": "Hata", "mesaj": f"Beklenmeyen bir hata oluştu: {str(e)}"}, ensure_ascii=False)
+    finally:
+        # Yüklenen dosya hata yollarında da arka planda silinmek üzere bırakılır
+        dosyayi_birak(pdf_file)
+        await depo.sabitlemeyi_kaldir(full_pdf_path)
 
 @mcp.tool(tags={"public"})
-async def pdf_ozetle(pdf_dosyasi_yolu: str, ozet_tipi: str = "kisa", hedef_dil: str = "otomatik") -> str:
+async def pdf_ozetle(pdf_dosyasi_yolu: str, ozet_tipi: str = "kisa", hedef_dil: str = "otomatik", sure_siniri_sn: float = 0) -> str:
     """
     GELİŞMİŞ PDF ÖZETLEME AJANI - Verilen bir PDF belgesinin içeriğini sayfa özetleri, tablolar, kaynaklar ve alıntılar ile birlikte eğitim odaklı olarak özetler.
 
@@ -302,6 +330,7 @@ async def pdf_ozetle(pdf_dosyasi_yolu: str, ozet_tipi: str = "kisa", hedef_dil:
         pdf_dosyasi_yolu (str): Özetlenecek PDF dosyasının tam yolu.
         ozet_tipi (str): Özet türü - "kisa" (sadece kısa özet), "genis" (sadece detaylı özet), "kapsamli" (her ikisi de + sayfa özetleri). Varsayılan: "kapsamli"
         hedef_dil (str): Özetin hangi dilde olmasını istediğiniz - "otomatik" (belge dilinde), "Türkçe", "İngilizce", "Almanca" vb. Varsayılan: "otomatik"
+        sure_siniri_sn (float): Çağrının en fazla süresi (saniye). 0: sunucu varsayılanı (SURE_SINIRI_PDF). Süre dolarsa "zaman_asimi": true içeren bir hata döner.
     
     Returns:
         str: PDF'in gelişmiş özetini içeren bir JSON string'i. İçerik:
@@ -317,7 +346,7 @@ async def pdf_ozetle(pdf_dosyasi_yolu: str, ozet_tipi: str = "kisa", hedef_dil:
         - Önemli alıntılar ve anahtar cümleler
         - Belge sonrası öğrenilecekler özeti
     """
-    logging.info("pdf_ozetle async tool'u çağrıldı")
-    # Bu fonksiyon, asıl işi yapan asenkron logic fonksiyonunu çağırır.
-    return await _pdf_ozetle_logic(pdf_dosyasi_yolu=pdf_dosyasi_yolu, ozet_tipi=ozet_tipi, hedef_dil=hedef_dil)
+    logger.info("pdf_ozetle async tool'u çağrıldı")
+    # Asıl iş logic fonksiyonunda; iş kuyruğu açıksa bir işçi sürecinde yürütülür.
+    return await isi_yurut("pdf", sure_siniri_sn=sure_siniri_sn, pdf_dosyasi_yolu=pdf_dosyasi_yolu, ozet_tipi=ozet_tipi, hedef_dil=hedef_dil)
 
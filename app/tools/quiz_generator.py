@@ -4,16 +4,17 @@ import asyncio  # Asenkron operasyonlar için temel kütüphane
 import time
 import anyio
 import logging
-import requests
-import google.generativeai as genai
 from app.config import GEMINI_API_KEY
 from app.server import mcp
+from app.metrics import asama, arac_olcumu, token_kullanimini_kaydet
+from app.deadlines import butce_olarak, asama_siniri, kalan_sure, SureAsimi, sure_asimi_yaniti
+from app.model_routing import rota_sec, icerik_uret
+from app.lazy_imports import genai, requests, hazirla
 from dotenv import load_dotenv
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-# Ortak klasör yolu
-SHARED_UPLOADS_DIR = r'C:\mcpler\education_mcp\shared_uploads'
+load_dotenv()
 
 
 async def search_web(query, max_results=5):
@@ -24,12 +25,12 @@ async def search_web(query, max_results=5):
         GOOGLE_CSE_ID = os.getenv("GOOGLE_CSE_ID")  # Custom Search Engine ID
         
         if not GOOGLE_API_KEY or not GOOGLE_CSE_ID:
-            logging.warning("Google API anahtarları bulunamadı, web araması yapılamıyor")
+            logger.warning("Google API anahtarları bulunamadı, web araması yapılamıyor")
             return []
         
         # API anahtarlarının geçerli olup olmadığını kontrol et
         if GOOGLE_API_KEY == "your_google_api_key_here" or GOOGLE_CSE_ID == "your_custom_search_engine_id_here":
-            logging.warning("Google API anahtarları varsayılan değerlerde, web araması yapılamıyor")
+            logger.warning("Google API anahtarları varsayılan değerlerde, web araması yapılamıyor")
             return []
         
         url = "https://www.googleapis.com/customsearch/v1"
@@ -43,9 +44,10 @@ async def search_web(query, max_results=5):
         }
         
         
-        # requests.get'i anyio ile asenkron çalıştır
+        # requests.get'i anyio ile asenkron çalıştır; bağlantı zaman aşımı çağrının kalan süresini geçmez
+        zaman_asimi = max(min(10, kalan_sure()), 1)
         def make_request():
-            response = requests.get(url, params=params, timeout=10)
+            response = requests.get(url, params=params, timeout=zaman_asimi)
             response.raise_for_status()
             return response.json()
         
@@ -61,45 +63,52 @@ async def search_web(query, max_results=5):
                     'date': item.get('pagemap', {}).get('metatags', [{}])[0].get('article:published_time', '')
                 })
         
-        logging.info(f"Web araması tamamlandı: {len(results)} sonuç bulundu")
+        logger.info("Web araması tamamlandı: %s sonuç bulundu", len(results))
         return results
         
     except requests.exceptions.RequestException as e:
-        logging.error(f"Web arama network hatası: {str(e)}")
+        logger.error("Web arama network hatası: %s", e)
         return []
     except Exception as e:
-        logging.error(f"Web arama genel hatası: {str(e)}")
+        logger.error("Web arama genel hatası: %s", e)
         return []
 
+@arac_olcumu("soru")
 async def _soru_olustur_logic(konu: str, soru_sayisi: int = 5, zorluk: str = "orta", soru_tipi: str = "karisik", web_arama: bool = False) -> str:
     """Verilen konuda soru oluşturmanın çekirdek mantığını içeren asenkron fonksiyon."""
-    logging.info("Asenkron soru oluşturma işlemi başlatıldı")
-    logging.debug(f"Gelen parametreler - konu: {konu}, soru_sayisi: {soru_sayisi}, zorluk: {zorluk}, soru_tipi: {soru_tipi}, web_arama: {web_arama}")
+    logger.info("Asenkron soru oluşturma işlemi başlatıldı")
+    logger.debug("Gelen parametreler - konu: %s, soru_sayisi: %s, zorluk: %s, soru_tipi: %s, web_arama: %s", konu, soru_sayisi, zorluk, soru_tipi, web_arama)
     
     if not konu or konu.strip() == "":
-        logging.warning("Konu belirtilmedi")
+        logger.warning("Konu belirtilmedi")
         return json.dumps({"durum": "Hata", "mesaj": "Bir konu belirtmelisiniz."}, ensure_ascii=False)
     
     if soru_sayisi < 1 or soru_sayisi > 20:
-        logging.warning(f"Geçersiz soru sayısı: {soru_sayisi}")
+        logger.warning("Geçersiz soru sayısı: %s", soru_sayisi)
         return json.dumps({"durum": "Hata", "mesaj": "Soru sayısı 1 ile 20 arasında olmalıdır."}, ensure_ascii=False)
     
     zorluk_seviyeleri = ["kolay", "orta", "zor", "karisik"]
     if zorluk not in zorluk_seviyeleri:
-        logging.warning(f"Geçersiz zorluk seviyesi: {zorluk}")
+        logger.warning("Geçersiz zorluk seviyesi: %s", zorluk)
         return json.dumps({"durum": "Hata", "mesaj": f"Zorluk seviyesi şunlardan biri olmalıdır: {', '.join(zorluk_seviyeleri)}"}, ensure_ascii=False)
     
     soru_tipleri = ["test", "acik_uclu", "dogru_yanlis", "karisik"]
     if soru_tipi not in soru_tipleri:
-        logging.warning(f"Geçersiz soru tipi: {soru_tipi}")
+        logger.warning("Geçersiz soru tipi: %s", soru_tipi)
         return json.dumps({"durum": "Hata", "mesaj": f"Soru tipi şunlardan biri olmalıdır: {', '.join(soru_tipleri)}"}, ensure_ascii=False)
 
     try:
         # Web araması yap (asenkron)
         web_bilgileri = ""
         if web_arama:
-            logging.info(f"'{konu}' konusunda web araması yapılıyor...")
-            search_results = await search_web(f"{konu} güncel bilgiler 2024", max_results=3)
+            logger.info("'%s' konusunda web araması yapılıyor...", konu)
+            try:
+                with asama("soru", "web_arama"), asama_siniri("soru", "web_arama"):
+                    search_results = await search_web(f"{konu} güncel bilgiler 2024", max_results=3)
+            except SureAsimi as e:
+                # Arama payı doldu; sorular web bilgisi olmadan üretilir
+                logger.warning("Web araması süre sınırında bitmedi: %s", e)
+                search_results = []
             
             if search_results:
                 web_bilgileri = "\n\nGÜNCEL WEB BİLGİLERİ:\n"
@@ -110,22 +119,22 @@ async def _soru_olustur_logic(konu: str, soru_sayisi: int = 5, zorluk: str = "or
    Kaynak: {result['link']}
    Tarih: {result['date'] if result['date'] else 'Bilinmiyor'}
 """
-                logging.info("Web araması başarılı, güncel bilgiler eklendi")
+                logger.info("Web araması başarılı, güncel bilgiler eklendi")
             else:
-                logging.warning("Web araması sonuç vermedi, sadece model bilgileri kullanılacak")
+                logger.warning("Web araması sonuç vermedi, sadece model bilgileri kullanılacak")
                 web_bilgileri = "\n\nNot: Web araması yapılamadı, sadece model bilgileri kullanılacak."
         else:
-            logging.info("Web araması devre dışı, sadece model bilgileri kullanılacak")
+            logger.info("Web araması devre dışı, sadece model bilgileri kullanılacak")
             web_bilgileri = "\n\nNot: Web araması devre dışı, sadece model bilgileri kullanılacak."
         
-        logging.info(f"AI'dan {konu} konusunda {soru_sayisi} adet {zorluk} seviyesinde {soru_tipi} türünde sorular isteniyor...")
+        logger.info("AI'dan %s konusunda %s adet %s seviyesinde %s türünde sorular isteniyor...", konu, soru_sayisi, zorluk, soru_tipi)
         if not GEMINI_API_KEY:
-            logging.error("GEMINI_API_KEY bulunamadı")
+            logger.error("GEMINI_API_KEY bulunamadı")
             return json.dumps({"durum": "Hata", "mesaj": "API anahtarı yapılandırılmamış. Lütfen .env dosyasını kontrol edin."}, ensure_ascii=False)
-        # Gemini API'yi yapılandır
-        genai.configure(api_key=GEMINI_API_KEY)
-        model = genai.GenerativeModel(model_name="gemini-1.5-pro-latest")
-        logging.debug("Gemini model oluşturuldu")
+        # Gemini kütüphanesi ilk çağrıda worker thread'de yüklenir ve yapılandırılır
+        await hazirla(genai)
+        modeller = rota_sec("soru", zorluk=zorluk, soru_sayisi=soru_sayisi)
+        logger.debug("Model rotası: %s", modeller)
         
         # Zorluk seviyesi açıklamaları
         zorluk_aciklamasi = {
@@ -231,26 +240,29 @@ async def _soru_olustur_logic(konu: str, soru_sayisi: int = 5, zorluk: str = "or
         Lütfen yanıtını sadece JSON formatında ver, başka metin ekleme.
         """
         
-        logging.info("AI'dan sorular isteniyor (asenkron)...")
-        # model.generate_content anyio ile asenkron çalıştırılır
-        response = await anyio.to_thread.run_sync(model.generate_content, prompt)
-        logging.info("AI soruları başarıyla oluşturdu")
-        logging.debug(f"Cevap uzunluğu: {len(response.text)} karakter")
+        logger.info("AI'dan sorular isteniyor (asenkron)...")
+        # Model rota tablosuna göre seçilir; kota/aşırı yük hatasında yedek modele geçilir
+        with asama("soru", "uretim", soru_sayisi=soru_sayisi), asama_siniri("soru", "uretim"):
+            response = await icerik_uret("soru", modeller, prompt)
+        token_kullanimini_kaydet("soru", response)
+        logger.info("AI soruları başarıyla oluşturdu")
+        logger.debug("Cevap uzunluğu: %s karakter", len(response.text))
         
         # JSON cevabını parse et
         try:
-            # Gemini'nin cevabını temizle (markdown kod blokları varsa)
-            clean_response = response.text.strip()
-            if clean_response.startswith('```json'):
-                clean_response = clean_response.replace('```json', '').replace('```', '').strip()
-            elif clean_response.startswith('```'):
-                clean_response = clean_response.replace('```', '').strip()
-            
-            soru_data = json.loads(clean_response)
-            logging.info("AI cevabı başarıyla JSON formatında parse edildi")
+            with asama("soru", "ayristirma"):
+                # Gemini'nin cevabını temizle (markdown kod blokları varsa)
+                clean_response = response.text.strip()
+                if clean_response.startswith('```json'):
+                    clean_response = clean_response.replace('```json', '').replace('```', '').strip()
+                elif clean_response.startswith('```'):
+                    clean_response = clean_response.replace('```', '').strip()
+                
+                soru_data = json.loads(clean_response)
+            logger.info("AI cevabı başarıyla JSON formatında parse edildi")
             
         except json.JSONDecodeError as json_error:
-            logging.error(f"AI cevabı JSON formatında parse edilemedi: {json_error}")
+            logger.error("AI cevabı JSON formatında parse edilemedi: %s", json_error)
             # Fallback: Basit format kullan
             soru_data = {
                 "konu": konu,
@@ -287,16 +299,18 @@ async def _soru_olustur_logic(konu: str, soru_sayisi: int = 5, zorluk: str = "or
                 }
             }
             
-        logging.info("Soru oluşturma işlemi başarıyla tamamlandı")
+        logger.info("Soru oluşturma işlemi başarıyla tamamlandı")
         return json.dumps({"durum": "Başarılı", "soru_seti": soru_data}, ensure_ascii=False)
 
+    except SureAsimi as e:
+        return sure_asimi_yaniti(e)
     except Exception as e:
-        logging.error(f"Beklenmeyen hata: {str(e)}", exc_info=True)
-        logging.debug(f"Hata türü: {type(e).__name__}")
+        logger.error("Beklenmeyen hata: %s", e, exc_info=True)
+        logger.debug("Hata türü: %s", type(e).__name__)
         return json.dumps({"durum": "Hata", "mesaj": f"Beklenmeyen bir hata oluştu: {str(e)}"}, ensure_ascii=False)
 
 @mcp.tool(tags={"public"})
-async def soru_olustur(konu: str, soru_sayisi: int = 5, zorluk: str = "orta", soru_tipi: str = "karisik", web_arama: bool = False) -> str:
+async def soru_olustur(konu: str, soru_sayisi: int = 5, zorluk: str = "orta", soru_tipi: str = "karisik", web_arama: bool = False, sure_siniri_sn: float = 0) -> str:
     """
     EĞİTİM SORU OLUŞTURMA AJANI - Verilen konuda akademik standartlarda sorular oluşturur ve detaylı cevap anahtarları sağlar.
     Web araması özelliği ile güncel bilgileri kullanır. kullanıcının istediği zaman web araması yapılabilir.
@@ -309,6 +323,7 @@ async def soru_olustur(konu: str, soru_sayisi: int = 5, zorluk: str = "orta", so
         zorluk (str): Zorluk seviyesi - "kolay", "orta", "zor", "karisik". Varsayılan: "orta"
         soru_tipi (str): Soru türü - "test" (çoktan seçmeli), "acik_uclu", "dogru_yanlis", "karisik". Varsayılan: "karisik"
         web_arama (bool): Web araması yapılıp yapılmayacağı - True/False. Varsayılan: True
+        sure_siniri_sn (float): Çağrının en fazla süresi (saniye). 0: sunucu varsayılanı (SURE_SINIRI_SORU). Süre dolarsa "zaman_asimi": true içeren bir hata döner.
     
     Returns:
         str: Oluşturulan soruları içeren bir JSON string'i. İçerik:
@@ -324,7 +339,8 @@ async def soru_olustur(konu: str, soru_sayisi: int = 5, zorluk: str = "orta", so
         - Web arama sonuçları ve kullanılan kaynaklar
         - Güncel bilgiler ve son gelişmeler
     """
-    logging.info("soru_olustur async tool'u çağrıldı")
+    logger.info("soru_olustur async tool'u çağrıldı")
     # Bu fonksiyon, asıl işi yapan asenkron logic fonksiyonunu çağırır.
-    return await _soru_olustur_logic(konu=konu, soru_sayisi=soru_sayisi, zorluk=zorluk, soru_tipi=soru_tipi, web_arama=web_arama)
+    with butce_olarak("soru", sure_siniri_sn):
+        return await _soru_olustur_logic(konu=konu, soru_sayisi=soru_sayisi, zorluk=zorluk, soru_tipi=soru_tipi, web_arama=web_arama)
 
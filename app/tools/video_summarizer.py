@@ -1,33 +1,110 @@
 import json
 import os
 import logging
-import asyncio  # Asenkron operasyonlar için temel kütüphane
 import time
 import anyio
 import uuid
 from dotenv import load_dotenv
 from app.server import mcp
-import yt_dlp
 import re
-import google.generativeai as genai
-from app.config import GEMINI_API_KEY
+from app.config import SHARED_UPLOADS_DIR, YTDLP_SOKET_ZAMAN_ASIMI
+from app.cache import dosya_parmak_izi, video_url_anahtari
+from app.storage import depo
+from app.gemini_files import dosya_yukle, islenmesini_bekle, dosyayi_birak
+from app.summary_tiers import onbellekten_katman_al, sonucu_onbellege_yaz
+from app.metrics import asama, arac_olcumu, yuklenen_bayt, token_kullanimini_kaydet
+from app.job_queue import isi_yurut
+from app.deadlines import asama_siniri, cagri_zaman_asimi, SureAsimi, sure_asimi_yaniti
+from app.model_routing import rota_sec, icerik_uret
+from app.lazy_imports import genai, yt_dlp, hazirla
+from app.planner import medya_suresi, video_plani, plan_tokeni, STRATEJI_RET, STRATEJI_METIN
+from app import tracing
+from app.logging_config import YtDlpLogger
+from app.cancellation import thread_calistir, iptal_kancasi, iptal_edildi_mi
 
-# Ortak klasör yolu
-SHARED_UPLOADS_DIR = r'C:\mcpler\education_mcp\shared_uploads'
+logger = logging.getLogger(__name__)
 
 
-import os
-import re
-import yt_dlp
+def _soket_zaman_asimi():
+    """yt-dlp soket zaman aşımı; süre dolunca bırakılan thread'deki bağlantı da en geç bütçe sonunda düşer."""
+    return cagri_zaman_asimi(YTDLP_SOKET_ZAMAN_ASIMI)
+
+
+def video_bilgisi_al(url):
+    """Videoyu indirmeden başlık, süre ve altyazı bilgilerini (yt-dlp info sözlüğü) alır."""
+    logger.info("Video bilgileri alınıyor...")
+    with tracing.span("video_indir.bilgi", video_url=url) as bilgi_span:
+        with yt_dlp.YoutubeDL({'quiet': True, 'logger': YtDlpLogger(), 'socket_timeout': _soket_zaman_asimi()}) as ydl:
+            info = ydl.extract_info(url, download=False)
+            logger.info("Video başlığı: %s, Kanal: %s, Süre: %s saniye, Görüntülenme: %s",
+                        info.get('title', 'Bilinmiyor'), info.get('uploader', 'Bilinmiyor'),
+                        info.get('duration', 0), info.get('view_count', 0))
+        bilgi_span.ozellik_ekle(sure_saniye=info.get('duration'), baslik=info.get('title'))
+    return info
+
+
+def _altyazi_sec(bilgi):
+    """Video dilindeki elle eklenmiş altyazıyı, yoksa otomatik altyazıyı seçer; VTT biçimli izin URL'sini döndürür."""
+    dil = bilgi.get('language')
+    for kaynak, elle_eklenmis in ((bilgi.get('subtitles') or {}, True), (bilgi.get('automatic_captions') or {}, False)):
+        # Otomatik altyazılarda diğer diller makine çevirisidir; yalnızca özgün dil izi kullanılır
+        adaylar = [d for d in (dil, f"{dil}-orig") if d] + (list(kaynak) if elle_eklenmis else [])
+        for aday in adaylar:
+            for iz in kaynak.get(aday) or []:
+                if iz.get('ext') == 'vtt' and iz.get('url'):
+                    return iz['url']
+    return None
+
+
+def altyazi_metni(bilgi):
+    """Seçilen altyazıyı indirip zaman damgalı düz metne çevirir; altyazı yoksa None döner."""
+    altyazi_url = _altyazi_sec(bilgi)
+    if not altyazi_url:
+        return None
+    with yt_dlp.YoutubeDL({'quiet': True, 'logger': YtDlpLogger(), 'socket_timeout': _soket_zaman_asimi()}) as ydl:
+        vtt = ydl.urlopen(altyazi_url).read().decode('utf-8', errors='replace')
+
+    satirlar, zaman, onceki = [], "", None
+    for satir in vtt.splitlines():
+        satir = satir.strip()
+        if '-->' in satir:
+            # "01:02:03.500 --> ..." ya da "02:03.500 --> ..." -> "62:03"
+            eslesme = re.match(r'(?:(\d+):)?(\d+):(\d+)', satir)
+            if eslesme:
+                saat, dakika, saniye = eslesme.groups()
+                zaman = f"{int(saat or 0) * 60 + int(dakika)}:{saniye}"
+            continue
+        if not satir or satir.startswith(('WEBVTT', 'Kind:', 'Language:', 'NOTE')) or satir.isdigit():
+            continue
+        metin = re.sub(r'<[^>]+>', '', satir).strip()
+        # Otomatik altyazılar her satırı bir sonraki ipucunda tekrarlar
+        if metin and metin != onceki:
+            satirlar.append(f"[{zaman}] {metin}")
+            onceki = metin
+    return "\n".join(satirlar) or None
+
+
+def _yarim_indirmeleri_sil(indirme_yolu, dosya_koku):
+    """İptal edilen indirmenin yt-dlp ara dosyalarını (.part, .part-FragN, .ytdl) siler."""
+    if not dosya_koku:
+        return
+    for dosya in os.listdir(indirme_yolu):
+        if dosya.startswith(f"{dosya_koku}.") and (".part" in dosya or dosya.endswith(".ytdl")):
+            try:
+                os.remove(os.path.join(indirme_yolu, dosya))
+            except OSError as e:
+                logger.warning("Yarım indirme silinemedi (%s): %s", dosya, e)
 
 
-def video_indir(url, indirme_yolu=SHARED_UPLOADS_DIR):
+def video_indir(url, indirme_yolu=SHARED_UPLOADS_DIR, dosya_koku=None, bilgi=None):
     """
     YouTube'dan video indiren basit fonksiyon - yt-dlp kullanarak düşük kalitede indirme öncelikli
     
     Args:
         url (str): YouTube video URL'si
         indirme_yolu (str): Videonun indirileceği klasör yolu 
+        dosya_koku (str): (Opsiyonel) Uzantısız dosya adı; verilmezse benzersiz bir ad üretilir
+        bilgi (dict): (Opsiyonel) Ön planlamada alınmış video bilgisi; verilmezse yeniden alınır
     
     Returns:
         str: İndirilen dosyanın tam yolu veya hata mesajı
@@ -36,41 +113,45 @@ def video_indir(url, indirme_yolu=SHARED_UPLOADS_DIR):
         # İndirme klasörünü oluştur
         os.makedirs(indirme_yolu, exist_ok=True)
         
-        print(f"Video URL'si: {url}")
+        logger.info("Video URL'si: %s", url)
         
-        # Benzersiz dosya adı için timestamp ve UUID ekle
-        timestamp = str(int(time.time()))
-        unique_id = str(uuid.uuid4())[:8]
+        # Kalıcı ad verilmediyse benzersiz dosya adı için timestamp ve UUID ekle
+        if not dosya_koku:
+            timestamp = str(int(time.time()))
+            unique_id = str(uuid.uuid4())[:8]
+            dosya_koku = f"video_{timestamp}_{unique_id}"
         
         # yt-dlp seçenekleri - düşük kalite öncelikli ve benzersiz dosya adı
         ydl_opts = {
             'format': 'worst[ext=mp4]/worst',  # En düşük kalite mp4, yoksa en düşük kalite
-            'outtmpl': os.path.join(indirme_yolu, f'video_{timestamp}_{unique_id}.%(ext)s'),  # Benzersiz dosya adı
-            'quiet': False,  # Detaylı çıktı
+            'outtmpl': os.path.join(indirme_yolu, f'{dosya_koku}.%(ext)s'),  # Benzersiz veya kalıcı dosya adı
+            'quiet': True,  # Çıktı stdout yerine log hattına gider
             'no_warnings': False,
+            'noprogress': True,  # İlerleme satırları log hattını doldurmasın
+            'logger': YtDlpLogger(),
             'extractaudio': False,  # Sadece video
             'writeinfojson': False,  # Info dosyası yazma
             'writethumbnail': False,  # Thumbnail yazma
             'concurrent_fragment_downloads': 30,  # Eşzamanlı indirme sayısını sınırla
             'retries': 3,  # Yeniden deneme sayısı
             'fragment_retries': 3,  # Fragment yeniden deneme sayısı
+            'socket_timeout': _soket_zaman_asimi(),  # Asılı bağlantı thread'i süre bütçesinden uzun tutmasın
+            # Çağıran iptal edilirse (istemci ayrıldı) indirme bir sonraki ilerleme bildiriminde durdurulur
+            'progress_hooks': [iptal_kancasi(yt_dlp.utils.DownloadCancelled)],
         }
         
-        print("Video bilgileri alınıyor...")
-        
         # Video bilgilerini al
-        with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
-            info = ydl.extract_info(url, download=False)
-            print(f"Video başlığı: {info.get('title', 'Bilinmiyor')}")
-            print(f"Kanal: {info.get('uploader', 'Bilinmiyor')}")
-            print(f"Süre: {info.get('duration', 0)} saniye")
-            print(f"Görüntülenme: {info.get('view_count', 0)}")
+        if bilgi is None:
+            bilgi = video_bilgisi_al(url)
+        # Video süresi çağıran aşamaya da (video.indirme) işlenir; trafik kaydı oradan okur
+        tracing.ozellik_ekle(video_suresi_sn=bilgi.get('duration'))
         
-        print("Video indiriliyor (düşük kalite)...")
+        logger.info("Video indiriliyor (düşük kalite)...")
         
         # Videoyu indir
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
+        with tracing.span("video_indir.indirme", format=ydl_opts['format'], deneme_sayisi=ydl_opts['retries']):
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                ydl.download([url])
         
         # İndirilen dosyayı bul - benzersiz dosya adı ile
         olasi_uzantilar = ['.mp4', '.webm', '.mkv', '.flv']
@@ -78,7 +159,7 @@ def video_indir(url, indirme_yolu=SHARED_UPLOADS_DIR):
         
         # Benzersiz dosya adı ile dosyayı ara
         for uzanti in olasi_uzantilar:
-            dosya_yolu = os.path.join(indirme_yolu, f"video_{timestamp}_{unique_id}{uzanti}")
+            dosya_yolu = os.path.join(indirme_yolu, f"{dosya_koku}{uzanti}")
             if os.path.exists(dosya_yolu):
                 indirilen_dosya = dosya_yolu
                 break
@@ -103,253 +184,292 @@ def video_indir(url, indirme_yolu=SHARED_UPLOADS_DIR):
                 pass
         
         if indirilen_dosya and os.path.exists(indirilen_dosya):
-            print(f"Video başarıyla indirildi: {indirilen_dosya}")
+            logger.info("Video başarıyla indirildi: %s", indirilen_dosya)
+            tracing.ozellik_ekle(dosya_boyutu=os.path.getsize(indirilen_dosya))
             return indirilen_dosya
         else:
             raise Exception("İndirilen dosya bulunamadı")
         
     except Exception as e:
+        if iptal_edildi_mi():
+            logger.info("Video indirme iptal edildi: %s", url)
+            _yarim_indirmeleri_sil(indirme_yolu, dosya_koku)
+            return f"Video indirme iptal edildi: {url}"
         hata_mesaji = f"Video indirme hatası: {str(e)}"
-        print(hata_mesaji)
-        print("Olası çözümler:")
-        print("1. URL'nin doğru olduğundan emin olun")
-        print("2. İnternet bağlantınızı kontrol edin")
-        print("3. Video özel veya kısıtlı olabilir")
-        print("4. yt-dlp kütüphanesini yükleyin: pip install yt-dlp")
-        print("5. yt-dlp'yi güncelleyin: pip install --upgrade yt-dlp")
+        logger.error("%s. Olası çözümler: URL'nin doğru olduğundan emin olun, internet bağlantınızı kontrol edin, "
+                     "video özel veya kısıtlı olabilir, yt-dlp'yi güncelleyin (pip install --upgrade yt-dlp)", hata_mesaji)
         return hata_mesaji
 
 
 
+@arac_olcumu("video")
 async def _videoyu_ozetle_logic(video_url: str = "", video_dosyasi_yolu: str = "", ozet_tipi: str = "kapsamli", hedef_dil: str = "otomatik") -> str:
     """Video özetlemenin tüm çekirdek mantığını içeren, test edilebilir ve asenkron çalışan fonksiyon."""
-    logging.info("Asenkron video özetleme işlemi başlatıldı")
-    logging.debug(f"Gelen parametreler - video_url: {video_url}, video_dosyasi_yolu: {video_dosyasi_yolu}, ozet_tipi: {ozet_tipi}, hedef_dil: {hedef_dil}")
+    logger.info("Asenkron video özetleme işlemi başlatıldı")
+    logger.debug("Gelen parametreler - video_url: %s, video_dosyasi_yolu: %s, ozet_tipi: %s, hedef_dil: %s", video_url, video_dosyasi_yolu, ozet_tipi, hedef_dil)
     
     if not video_url and not video_dosyasi_yolu:
-        logging.warning("Video URL'si veya dosya yolu sağlanmadı")
+        logger.warning("Video URL'si veya dosya yolu sağlanmadı")
         return json.dumps({"durum": "Hata", "mesaj": "Bir video URL'si veya dosya yolu sağlamalısınız."}, ensure_ascii=False)
 
     video_dosyasi_path = ""
+    # URL'li videolarda plan indirmeden önce video bilgisinden, dosyalarda yüklemeden önce dosya başlığından çıkarılır
+    plan = None
+    bilgi = None
+    altyazi = None
     
     if video_dosyasi_yolu:
-        # Dosya yolunu işle - tam yoldan sadece dosya adını al
-        if os.path.sep in video_dosyasi_yolu:
-            # Tam yol verilmiş, sadece dosya adını al
-            dosya_adi = os.path.basename(video_dosyasi_yolu)
-            logging.info(f"Tam yol verildi, dosya adı çıkarıldı: {dosya_adi}")
-        else:
-            # Sadece dosya adı verilmiş
-            dosya_adi = video_dosyasi_yolu
-            logging.info(f"Sadece dosya adı verildi: {dosya_adi}")
-        
-        # Dosya yolunu ortak klasörden oluştur
-        video_dosyasi_path = os.path.join(SHARED_UPLOADS_DIR, dosya_adi)
-        logging.info(f"Video dosyası aranıyor: {video_dosyasi_path}")
+        # Dosyayı ortak depoda çözümle - tam yol verilmişse sadece dosya adı kullanılır
+        dosya_adi = depo.dosya_adi(video_dosyasi_yolu)
+        video_dosyasi_path = depo.yol(dosya_adi)
+        logger.info("Video dosyası aranıyor: %s", video_dosyasi_path)
         
-        # Dosya varlığını kontrol et
-        if not await anyio.to_thread.run_sync(os.path.exists, video_dosyasi_path):
-            logging.error(f"Video dosyası bulunamadı: {video_dosyasi_path}")
+        # Dosya varlığını kontrol et ve son erişim zamanını güncelle
+        if not await anyio.to_thread.run_sync(depo.erisim, video_dosyasi_path):
+            logger.error("Video dosyası bulunamadı: %s", video_dosyasi_path)
             return json.dumps({"durum": "Hata", "mesaj": f"Video dosyası bulunamadı: {dosya_adi}. Ortak klasörde dosya var mı kontrol edin."}, ensure_ascii=False)
+
+        with asama("video", "parmak_izi"):
+            kaynak_anahtari = await anyio.to_thread.run_sync(dosya_parmak_izi, video_dosyasi_path)
+        onbellek_verisi = await onbellekten_katman_al("video", kaynak_anahtari, ozet_tipi, hedef_dil)
+        if onbellek_verisi is not None:
+            return json.dumps({"durum": "Başarılı", "video_analizi": onbellek_verisi}, ensure_ascii=False)
     
     elif video_url:
-        # YouTube URL'sinden video indir
+        # Önbellek kontrolü indirmeden önce yapılır - isabet varsa video hiç indirilmez
+        kaynak_anahtari = video_url_anahtari(video_url)
+        onbellek_verisi = await onbellekten_katman_al("video", kaynak_anahtari, ozet_tipi, hedef_dil)
+        if onbellek_verisi is not None:
+            return json.dumps({"durum": "Başarılı", "video_analizi": onbellek_verisi}, ensure_ascii=False)
+
+        # YouTube URL'sinden video indir - daha önce indirilmiş ve depoda duruyorsa yeniden indirilmez
         try:
-            logging.info(f"YouTube video indiriliyor: {video_url}")
-            
-            # Video indir (ortak klasöre)
-            video_dosyasi_path = await anyio.to_thread.run_sync(video_indir, video_url)
-            
-            if not video_dosyasi_path or not await anyio.to_thread.run_sync(os.path.exists, video_dosyasi_path):
-                logging.error("Video indirme başarısız")
-                return json.dumps({"durum": "Hata", "mesaj": "Video indirilemedi. URL'yi kontrol edin."}, ensure_ascii=False)
-            
-            logging.info(f"Video başarıyla indirildi: {video_dosyasi_path}")
+            dosya_koku = depo.indirme_koku(kaynak_anahtari)
+            if dosya_koku:
+                video_dosyasi_path = await anyio.to_thread.run_sync(depo.indirilmis_bul, dosya_koku)
+            if video_dosyasi_path:
+                logger.info("Video depoda bulundu, indirme atlandı: %s", video_dosyasi_path)
+            else:
+                # Ön planlama - süre ve altyazılar indirmeden önce alınır; sınırı aşan video indirilmez
+                with asama("video", "planlama"), asama_siniri("video", "planlama"):
+                    bilgi = await thread_calistir(video_bilgisi_al, video_url)
+                    plan = video_plani(bilgi.get('duration') or 0, "bilgi", ozet_tipi,
+                                       altyazi_var=_altyazi_sec(bilgi) is not None)
+                if plan["strateji"] == STRATEJI_METIN:
+                    try:
+                        with asama("video", "altyazi"), asama_siniri("video", "altyazi"):
+                            altyazi = await thread_calistir(altyazi_metni, bilgi)
+                    except SureAsimi as e:
+                        logger.warning("Altyazı süre sınırında alınamadı: %s", e)
+                    if not altyazi:
+                        # Altyazı indirilemediyse altyazısız olarak yeniden planlanır
+                        plan = video_plani(bilgi.get('duration') or 0, "bilgi", ozet_tipi)
+                if plan["strateji"] == STRATEJI_RET:
+                    return json.dumps({"durum": "Hata", "mesaj": plan["gerekce"], "plan": plan}, ensure_ascii=False)
+
+            if not video_dosyasi_path and not altyazi:
+                logger.info("YouTube video indiriliyor: %s", video_url)
+                
+                # Video indir (ortak klasöre)
+                with asama("video", "indirme", video_url=video_url), asama_siniri("video", "indirme"):
+                    video_dosyasi_path = await thread_calistir(video_indir, video_url, SHARED_UPLOADS_DIR, dosya_koku, bilgi)
+                
+                if not video_dosyasi_path or not await anyio.to_thread.run_sync(os.path.exists, video_dosyasi_path):
+                    logger.error("Video indirme başarısız")
+                    return json.dumps({"durum": "Hata", "mesaj": "Video indirilemedi. URL'yi kontrol edin."}, ensure_ascii=False)
+                
+                logger.info("Video başarıyla indirildi: %s", video_dosyasi_path)
+                await anyio.to_thread.run_sync(depo.eklendi, video_dosyasi_path)
             
+        except SureAsimi as e:
+            return sure_asimi_yaniti(e)
         except Exception as e:
-            logging.error(f"Video indirme hatası: {str(e)}")
+            logger.error("Video indirme hatası: %s", e)
             return json.dumps({"durum": "Hata", "mesaj": f"Video indirme hatası: {str(e)}"}, ensure_ascii=False)
 
-    # Video dosya boyutu kontrolü
+    # İş sürerken videonun disk kotası nedeniyle tahliye edilmemesi için sabitle; yalnızca altyazı
+    # kullanılan yolda yerel dosya yoktur, sabitlenecek bir şey de yoktur
+    video_file = None
+    if video_dosyasi_path:
+        await depo.sabitle(video_dosyasi_path)
     try:
-        dosya_boyutu = await anyio.to_thread.run_sync(os.path.getsize, video_dosyasi_path)
-        logging.debug(f"Video dosya boyutu: {dosya_boyutu} bytes")
-        if dosya_boyutu > 500 * 1024 * 1024:  # 500MB
-            logging.warning(f"Video çok büyük: {dosya_boyutu} bytes")
-            return json.dumps({"durum": "Hata", "mesaj": "Video dosyası çok büyük (500MB sınırı). Daha küçük bir dosya deneyin."}, ensure_ascii=False)
-    except Exception as e:
-        logging.error(f"Dosya boyutu kontrolü hatası: {str(e)}")
-        return json.dumps({"durum": "Hata", "mesaj": f"Dosya boyutu kontrolü hatası: {str(e)}"}, ensure_ascii=False)
+        dosya_boyutu = 0
+        if not altyazi:
+            # Video dosya boyutu kontrolü
+            try:
+                dosya_boyutu = await anyio.to_thread.run_sync(os.path.getsize, video_dosyasi_path)
+                logger.debug("Video dosya boyutu: %s bytes", dosya_boyutu)
+                if dosya_boyutu > 500 * 1024 * 1024:  # 500MB
+                    logger.warning("Video çok büyük: %s bytes", dosya_boyutu)
+                    return json.dumps({"durum": "Hata", "mesaj": "Video dosyası çok büyük (500MB sınırı). Daha küçük bir dosya deneyin."}, ensure_ascii=False)
+            except Exception as e:
+                logger.error("Dosya boyutu kontrolü hatası: %s", e)
+                return json.dumps({"durum": "Hata", "mesaj": f"Dosya boyutu kontrolü hatası: {str(e)}"}, ensure_ascii=False)
 
-    # Gemini API'ye yükleme (asenkron)
-    try:
-        logging.info(f"Video Gemini API'ye yükleniyor: {video_dosyasi_path}")
-        
-        # Video MIME type'ını belirle
-        dosya_uzantisi = os.path.splitext(video_dosyasi_path)[1].lower()
-        mime_map = {
-            '.mp4': 'video/mp4',
-            '.webm': 'video/webm',
-            '.mkv': 'video/x-matroska',
-            '.avi': 'video/x-msvideo',
-            '.mov': 'video/quicktime',
-            '.flv': 'video/x-flv'
-        }
-        mime_type = mime_map.get(dosya_uzantisi, 'video/mp4')
+            # Yerel ya da daha önce indirilmiş dosyalarda süre dosya başlığından okunur
+            if plan is None:
+                with asama("video", "planlama"), asama_siniri("video", "planlama"):
+                    sure, sure_yontemi = await anyio.to_thread.run_sync(medya_suresi, video_dosyasi_path)
+                    plan = video_plani(sure, sure_yontemi, ozet_tipi)
+                if plan["strateji"] == STRATEJI_RET:
+                    return json.dumps({"durum": "Hata", "mesaj": plan["gerekce"], "plan": plan}, ensure_ascii=False)
+
+            # Gemini API'ye yükleme (asenkron)
+            try:
+                logger.info("Video Gemini API'ye yükleniyor: %s", video_dosyasi_path)
         
-        # genai.upload_file'ı anyio ile asenkron çalıştır
-        def upload_video():
-            return genai.upload_file(path=video_dosyasi_path, mime_type=mime_type)
+                # Video MIME type'ını belirle
+                dosya_uzantisi = os.path.splitext(video_dosyasi_path)[1].lower()
+                mime_map = {
+                    '.mp4': 'video/mp4',
+                    '.webm': 'video/webm',
+                    '.mkv': 'video/x-matroska',
+                    '.avi': 'video/x-msvideo',
+                    '.mov': 'video/quicktime',
+                    '.flv': 'video/x-flv'
+                }
+                mime_type = mime_map.get(dosya_uzantisi, 'video/mp4')
         
-        video_file = await anyio.to_thread.run_sync(upload_video)
-        logging.info(f"Yükleme başladı: {video_file.name}. İşlenmesi bekleniyor...")
-        logging.debug(f"Video dosyası durumu: {video_file.state.name}")
-    except Exception as upload_error:
-        logging.error(f"Gemini API yükleme hatası: {str(upload_error)}")
-        return json.dumps({"durum": "Hata", "mesaj": f"Video Gemini API'ye yüklenemedi: {str(upload_error)}"}, ensure_ascii=False)
-
-    # Video işleme bekleme (asenkron)
-    progress_counter = 0
-    max_wait_time = 120
-    while video_file.state.name == "PROCESSING" and progress_counter < max_wait_time // 5:
-        progress_counter += 1
-        print('.', end='', flush=True)
-        logging.debug(f"İşleme devam ediyor... ({progress_counter * 5} saniye geçti)")
-        # asyncio.sleep ile asenkron bekleme
-        await asyncio.sleep(5) 
-        video_file = await anyio.to_thread.run_sync(genai.get_file, video_file.name)
-
-    print()
-    logging.info(f"Video işleme tamamlandı. Final durumu: {video_file.state.name}")
-
-    if video_file.state.name == "FAILED":
-        logging.error(f"Video işleme başarısız: {video_file.error}")
-        return json.dumps({"durum": "Hata", "mesaj": f"Video işleme başarısız: {video_file.error}"}, ensure_ascii=False)
+                with asama("video", "yukleme", dosya_boyutu=dosya_boyutu, mime_type=mime_type), asama_siniri("video", "yukleme"):
+                    video_file = await dosya_yukle("video", video_dosyasi_path, mime_type)
+                yuklenen_bayt.gozlemle(dosya_boyutu, "video")
+                logger.info("Yükleme başladı: %s. İşlenmesi bekleniyor...", video_file.name)
+                logger.debug("Video dosyası durumu: %s", video_file.state.name)
+            except SureAsimi as e:
+                return sure_asimi_yaniti(e)
+            except Exception as upload_error:
+                logger.error("Gemini API yükleme hatası: %s", upload_error)
+                return json.dumps({"durum": "Hata", "mesaj": f"Video Gemini API'ye yüklenemedi: {str(upload_error)}"}, ensure_ascii=False)
+
+            # Video işleme bekleme (asenkron)
+            with asama("video", "isleme_bekleme"), asama_siniri("video", "isleme_bekleme"):
+                video_file = await islenmesini_bekle("video", video_file, max_bekleme_suresi=120)
+            logger.info("Video işleme tamamlandı. Final durumu: %s", video_file.state.name)
+
+            if video_file.state.name == "FAILED":
+                logger.error("Video işleme başarısız: %s", video_file.error)
+                return json.dumps({"durum": "Hata", "mesaj": f"Video işleme başarısız: {video_file.error}"}, ensure_ascii=False)
     
-    if video_file.state.name == "PROCESSING":
-        logging.error("Video işleme çok uzun sürdü")
-        return json.dumps({"durum": "Hata", "mesaj": "Video işleme çok uzun sürdü. Daha kısa bir video deneyin."}, ensure_ascii=False)
+            if video_file.state.name == "PROCESSING":
+                logger.error("Video işleme çok uzun sürdü")
+                return json.dumps({"durum": "Hata", "mesaj": "Video işleme çok uzun sürdü. Daha kısa bir video deneyin."}, ensure_ascii=False)
 
-    # AI özet oluşturma (asenkron)
-    try:
-        # genai.configure'ı senkron çalıştır - api_key parametresini direkt olarak kullan
-        genai.configure(api_key=GEMINI_API_KEY)
-        model = genai.GenerativeModel(model_name="gemini-1.5-pro-latest")
+        # AI özet oluşturma (asenkron)
+        try:
+            # Gemini kütüphanesi ilk çağrıda worker thread'de yüklenir ve yapılandırılır
+            await hazirla(genai)
+            modeller = rota_sec("video", ozet_tipi, girdi_boyutu=dosya_boyutu)
         
-        # Dil talimatı
-        if hedef_dil == "otomatik":
-            dil_talimat = "Video hangi dildeyse aynı dilde yanıt ver. Video dilini otomatik algıla ve o dilde özet oluştur."
-        else:
-            dil_talimat = f"Yanıtını {hedef_dil} dilinde ver."
+            # Dil talimatı
+            if hedef_dil == "otomatik":
+                dil_talimat = "Video hangi dildeyse aynı dilde yanıt ver. Video dilini otomatik algıla ve o dilde özet oluştur."
+            else:
+                dil_talimat = f"Yanıtını {hedef_dil} dilinde ver."
         
-        if ozet_tipi == "kisa":
-            prompt = f"""
-            {dil_talimat}
+            if ozet_tipi == "kisa":
+                prompt = f"""
+                {dil_talimat}
             
-            Bu videoyu kısaca özetle. Sadece aşağıdaki formatta JSON cevap ver:
-
-            {{
-                "video_dili": "Algılanan video dili",
-                "baslik": "Videonun başlığı veya ana konusu",
-                "kisa_ozet": "2-3 cümle halinde videonun ana fikri ve en önemli noktaları",
-                "anahtar_kelimeler": ["kelime1", "kelime2", "kelime3"],
-                "ogrenme_ciktilari": ["Bu videoyu izledikten sonra öğreneceğiniz şey 1", "şey 2"],
-                "video_sonrasi_ogrenilecekler": "Bu videoyu izledikten sonra şunları öğrenmiş olacaksınız: (kısa bir özet)"
-            }}
-
-            Lütfen yanıtını sadece JSON formatında ver, başka metin ekleme.
-            """
-        elif ozet_tipi == "genis":
-            prompt = f"""
-            {dil_talimat}
+                Bu videoyu kısaca özetle. Sadece aşağıdaki formatta JSON cevap ver:
+
+                {{
+                    "video_dili": "Algılanan video dili",
+                    "baslik": "Videonun başlığı veya ana konusu",
+                    "kisa_ozet": "2-3 cümle halinde videonun ana fikri ve en önemli noktaları",
+                    "anahtar_kelimeler": ["kelime1", "kelime2", "kelime3"],
+                    "ogrenme_ciktilari": ["Bu videoyu izledikten sonra öğreneceğiniz şey 1", "şey 2"],
+                    "video_sonrasi_ogrenilecekler": "Bu videoyu izledikten sonra şunları öğrenmiş olacaksınız: (kısa bir özet)"
+                }}
+
+                Lütfen yanıtını sadece JSON formatında ver, başka metin ekleme.
+                """
+            elif ozet_tipi == "genis":
+                prompt = f"""
+                {dil_talimat}
             
-            Bu videoyu detaylı şekilde analiz et. Aşağıdaki formatta JSON cevap ver:
-
-            {{
-                "video_dili": "Algılanan video dili",
-                "baslik": "Videonun başlığı veya ana konusu",
-                "detayli_ozet": "Videonun kapsamlı özetini 4-6 paragraf halinde açıkla",
-                "anahtar_kelimeler": ["kelime1", "kelime2", "kelime3", "kelime4", "kelime5"],
-                "ogrenme_ciktilari": ["Bu videoyu izledikten sonra öğreneceğiniz şey 1", "şey 2", "şey 3"],
-                "video_sonrasi_ogrenilecekler": "Bu videoyu izledikten sonra şunları öğrenmiş olacaksınız: (detaylı özet)"
-            }}
-
-            Lütfen yanıtını sadece JSON formatında ver, başka metin ekleme.
-            """
-        else:  # kapsamli
-            prompt = f"""
-            {dil_talimat}
+                Bu videoyu detaylı şekilde analiz et. Aşağıdaki formatta JSON cevap ver:
+
+                {{
+                    "video_dili": "Algılanan video dili",
+                    "baslik": "Videonun başlığı veya ana konusu",
+                    "detayli_ozet": "Videonun kapsamlı özetini 4-6 paragraf halinde açıkla",
+                    "anahtar_kelimeler": ["kelime1", "kelime2", "kelime3", "kelime4", "kelime5"],
+                    "ogrenme_ciktilari": ["Bu videoyu izledikten sonra öğreneceğiniz şey 1", "şey 2", "şey 3"],
+                    "video_sonrasi_ogrenilecekler": "Bu videoyu izledikten sonra şunları öğrenmiş olacaksınız: (detaylı özet)"
+                }}
+
+                Lütfen yanıtını sadece JSON formatında ver, başka metin ekleme.
+                """
+            else:  # kapsamli
+                prompt = f"""
+                {dil_talimat}
             
-            Bu videoyu kapsamlı şekilde analiz et ve eğitim odaklı bir özet oluştur. Aşağıdaki formatta JSON cevap ver:
-
-            {{
-                "video_dili": "Algılanan video dili",
-                "baslik": "Videonun başlığı veya ana konusu",
-                "kisa_ozet": "2-3 cümle halinde videonun ana fikri",
-                "detayli_ozet": "Videonun kapsamlı özetini 4-6 paragraf halinde açıkla",
-                "zaman_damgalari": [
-                    {{"zaman": "0:30", "aciklama": "Giriş ve konu tanıtımı"}},
-                    {{"zaman": "2:15", "aciklama": "Ana fikrin açıklanması"}},
-                    {{"zaman": "5:45", "aciklama": "Örnek gösterim"}}
-                ],
-                "gorsel_materyaller": ["Video boyunca görülen grafik, slayt, yazı vs. açıklamaları"],
-                "bahsedilen_kaynaklar": ["Videoda geçen kitap, makale, web sitesi isimleri"],
-                "anahtar_kelimeler": ["kelime1", "kelime2", "kelime3", "kelime4", "kelime5"],
-                "etiketler": ["etiket1", "etiket2", "etiket3"],
-                "ogrenme_ciktilari": ["Bu videoyu izledikten sonra öğreneceğiniz şey 1", "şey 2", "şey 3"],
-                "detayli_analiz": "Videonun eğitim değeri, öğretim yöntemi ve içerik kalitesi hakkında analiz",
-                "video_sonrasi_ogrenilecekler": "Bu videoyu izledikten sonra şunları öğrenmiş olacaksınız: (kapsamlı özet)"
-            }}
-
-            Lütfen yanıtını sadece JSON formatında ver, başka metin ekleme.
-            """
-        
-        logging.info("AI'dan özet isteniyor (asenkron)...")
-        # model.generate_content anyio ile asenkron çalıştırılır
-        response = await anyio.to_thread.run_sync(model.generate_content, [prompt, video_file])
-        logging.info("AI özeti başarıyla oluşturuldu")
+                Bu videoyu kapsamlı şekilde analiz et ve eğitim odaklı bir özet oluştur. Aşağıdaki formatta JSON cevap ver:
 
-        # JSON parse etme
-        try:
-            clean_response = response.text.strip().replace('```json', '').replace('```', '').strip()
-            ozet_data = json.loads(clean_response)
-            logging.debug("AI yanıtı başarıyla JSON'a dönüştürüldü")
-        except json.JSONDecodeError as json_error:
-            logging.error(f"AI yanıtı JSON formatında değil: {json_error}")
-            # Fallback: Ham yanıtı döndür
-            ozet_data = {
-                "video_dili": "Bilinmiyor",
-                "baslik": "Video Özeti",
-                "ham_yanit": response.text,
-                "hata": "JSON formatında olmayan yanıt"
-            }
+                {{
+                    "video_dili": "Algılanan video dili",
+                    "baslik": "Videonun başlığı veya ana konusu",
+                    "kisa_ozet": "2-3 cümle halinde videonun ana fikri",
+                    "detayli_ozet": "Videonun kapsamlı özetini 4-6 paragraf halinde açıkla",
+                    "zaman_damgalari": [
+                        {{"zaman": "0:30", "aciklama": "Giriş ve konu tanıtımı"}},
+                        {{"zaman": "2:15", "aciklama": "Ana fikrin açıklanması"}},
+                        {{"zaman": "5:45", "aciklama": "Örnek gösterim"}}
+                    ],
+                    "gorsel_materyaller": ["Video boyunca görülen grafik, slayt, yazı vs. açıklamaları"],
+                    "bahsedilen_kaynaklar": ["Videoda geçen kitap, makale, web sitesi isimleri"],
+                    "anahtar_kelimeler": ["kelime1", "kelime2", "kelime3", "kelime4", "kelime5"],
+                    "etiketler": ["etiket1", "etiket2", "etiket3"],
+                    "ogrenme_ciktilari": ["Bu videoyu izledikten sonra öğreneceğiniz şey 1", "şey 2", "şey 3"],
+                    "detayli_analiz": "Videonun eğitim değeri, öğretim yöntemi ve içerik kalitesi hakkında analiz",
+                    "video_sonrasi_ogrenilecekler": "Bu videoyu izledikten sonra şunları öğrenmiş olacaksınız: (kapsamlı özet)"
+                }}
+
+                Lütfen yanıtını sadece JSON formatında ver, başka metin ekleme.
+                """
         
-    except Exception as ai_error:
-        logging.error(f"AI özet oluşturma hatası: {str(ai_error)}")
-        return json.dumps({"durum": "Hata", "mesaj": f"AI özet oluşturulamadı: {str(ai_error)}"}, ensure_ascii=False)
+            logger.info("AI'dan özet isteniyor (asenkron)...")
+            # Model rota tablosuna göre seçilir; kota/aşırı yük hatasında yedek modele geçilir
+            with asama("video", "uretim", ozet_tipi=ozet_tipi), asama_siniri("video", "uretim"):
+                icerik = [prompt, "VİDEO ALTYAZISI:\n" + altyazi] if altyazi else [prompt, video_file]
+                response = await icerik_uret("video", modeller, icerik, tahmini_token=plan_tokeni(plan))
+            token_kullanimini_kaydet("video", response)
+            logger.info("AI özeti başarıyla oluşturuldu")
 
-    # Temizlik (asenkron) - AI işlemi tamamlandıktan sonra
-    try:
-        logging.info("Yüklenen video dosyası API'den siliniyor...")
-        await anyio.to_thread.run_sync(genai.delete_file, video_file.name)
-        logging.info(f"Yüklenen dosya ({video_file.name}) API'den başarıyla silindi")
-    except Exception as delete_error:
-        logging.warning(f"API'den dosya silme hatası: {str(delete_error)}")
-
-    # Yerel dosya temizliği - AI işlemi tamamlandıktan sonra
-    if video_dosyasi_path and await anyio.to_thread.run_sync(os.path.exists, video_dosyasi_path):
-        try:
-            logging.info(f"Video dosyası siliniyor: {video_dosyasi_path}")
-            await anyio.to_thread.run_sync(os.remove, video_dosyasi_path)
-            logging.info("Video dosyası başarıyla silindi")
-        except Exception as e:
-            logging.error(f"Dosya silinirken hata: {e}")
+            # JSON parse etme
+            try:
+                with asama("video", "ayristirma"):
+                    clean_response = response.text.strip().replace('```json', '').replace('```', '').strip()
+                    ozet_data = json.loads(clean_response)
+                logger.debug("AI yanıtı başarıyla JSON'a dönüştürüldü")
+                await sonucu_onbellege_yaz("video", kaynak_anahtari, ozet_tipi, hedef_dil, ozet_data)
+            except json.JSONDecodeError as json_error:
+                logger.error("AI yanıtı JSON formatında değil: %s", json_error)
+                # Fallback: Ham yanıtı döndür
+                ozet_data = {
+                    "video_dili": "Bilinmiyor",
+                    "baslik": "Video Özeti",
+                    "ham_yanit": response.text,
+                    "hata": "JSON formatında olmayan yanıt"
+                }
+        
+        except SureAsimi as e:
+            return sure_asimi_yaniti(e)
+        except Exception as ai_error:
+            logger.error("AI özet oluşturma hatası: %s", ai_error)
+            return json.dumps({"durum": "Hata", "mesaj": f"AI özet oluşturulamadı: {str(ai_error)}"}, ensure_ascii=False)
+    finally:
+        # Yüklenen dosya hata yollarında da arka planda silinmek üzere bırakılır
+        dosyayi_birak(video_file)
+        # Yerel video silinmez; tekrar istenebileceği için depoda kalır, disk kotası LRU ile yönetilir
+        if video_dosyasi_path:
+            await depo.sabitlemeyi_kaldir(video_dosyasi_path)
 
-    logging.info("Video özetleme işlemi başarıyla tamamlandı")
-    return json.dumps({"durum": "Başarılı", "video_analizi": ozet_data}, ensure_ascii=False)
+    logger.info("Video özetleme işlemi başarıyla tamamlandı")
+    return json.dumps({"durum": "Başarılı", "video_analizi": ozet_data, "plan": plan}, ensure_ascii=False)
 
 @mcp.tool(tags={"public"})
-async def videoyu_ozetle(video_url: str = "", video_dosyasi_yolu: str = "", ozet_tipi: str = "kapsamli", hedef_dil: str = "otomatik") -> str:
+async def videoyu_ozetle(video_url: str = "", video_dosyasi_yolu: str = "", ozet_tipi: str = "kapsamli", hedef_dil: str = "otomatik", sure_siniri_sn: float = 0) -> str:
     """
     GELİŞMİŞ VIDEO ÖZETLEME AJANI - Verilen bir videonun içeriğini zaman damgaları, görsel açıklamalar ve kaynaklar ile birlikte eğitim odaklı olarak özetler.
 
@@ -360,6 +480,7 @@ async def videoyu_ozetle(video_url: str = "", video_dosyasi_yolu: str = "", ozet
         video_dosyasi_yolu (str): (Opsiyonel) Sunucuda bulunan bir video dosyasının yolu.
         ozet_tipi (str): Özet türü - "kisa" (sadece kısa özet), "genis" (sadece detaylı özet), "kapsamli" (her ikisi de + zaman damgaları). Varsayılan: "kapsamli"
         hedef_dil (str): Özetin hangi dilde olmasını istediğiniz - "otomatik" (video dilinde), "Türkçe", "İngilizce", "Almanca" vb. Varsayılan: "otomatik"
+        sure_siniri_sn (float): Çağrının en fazla süresi (saniye). 0: sunucu varsayılanı (SURE_SINIRI_VIDEO). Süre dolarsa "zaman_asimi": true içeren bir hata döner.
     
     Returns:
         str: Videonun gelişmiş özetini içeren bir JSON string'i. İçerik:
@@ -372,6 +493,6 @@ async def videoyu_ozetle(video_url: str = "", video_dosyasi_yolu: str = "", ozet
         - Detaylı analiz ve öğrenme noktaları
         - Video sonrası öğrenilecekler özeti
     """
-    logging.info("videoyu_ozetle async tool'u çağrıldı")
-    # Asıl işi yapan asenkron mantık fonksiyonunu çağırır ve sonucunu bekler.
-    return await _videoyu_ozetle_logic(video_url=video_url, video_dosyasi_yolu=video_dosyasi_yolu, ozet_tipi=ozet_tipi, hedef_dil=hedef_dil)
+    logger.info("videoyu_ozetle async tool'u çağrıldı")
+    # Asıl işi yapan mantık fonksiyonunu çağırır (iş kuyruğu açıksa bir işçi sürecinde) ve sonucunu bekler.
+    return await isi_yurut("video", sure_siniri_sn=sure_siniri_sn, video_url=video_url, video_dosyasi_yolu=video_dosyasi_yolu, ozet_tipi=ozet_tipi, hedef_dil=hedef_dil)
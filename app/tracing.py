@@ -0,0 +1,99 @@
+import time
+import uuid
+import logging
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from app.config import IZLEME_AKTIF, IZ_DOSYASI, IZ_DOSYA_MAKS_BAYT, IZ_DOSYA_YEDEK_SAYISI
+from app.logging_config import JsonSatiri, jsonl_yazicisi
+
+logger = logging.getLogger(__name__)
+
+# O an açık olan span; anyio.to_thread.run_sync bağlamı kopyaladığı için thread'lere de taşınır
+_aktif_span = contextvars.ContextVar("aktif_span", default=None)
+
+_iz_yazici = None
+
+
+def _yaziciyi_al():
+    """Span'ları satır satır JSON olarak yazan, boyuta göre dönen dosya logger'ını ilk kullanımda kurar."""
+    global _iz_yazici
+    if _iz_yazici is None:
+        _iz_yazici = jsonl_yazicisi("edumcp.iz", IZ_DOSYASI, IZ_DOSYA_MAKS_BAYT, IZ_DOSYA_YEDEK_SAYISI)
+    return _iz_yazici
+
+
+class Span:
+    """Bir iz içindeki tek aşama: başlangıç/bitiş zamanı, ebeveyn ve serbest özellikler."""
+
+    def __init__(self, ad: str, iz_kimligi: str, ust_span_kimligi: str = None, ozellikler: dict = None):
+        self.ad = ad
+        self.iz_kimligi = iz_kimligi
+        self.span_kimligi = uuid.uuid4().hex[:16]
+        self.ust_span_kimligi = ust_span_kimligi
+        self.ozellikler = dict(ozellikler or {})
+        self.durum = "basarili"
+        self.hata = None
+        self._baslangic_zamani = time.time()
+        self._baslangic = time.perf_counter()
+
+    def ozellik_ekle(self, **ozellikler):
+        self.ozellikler.update(ozellikler)
+
+    def bitir(self):
+        if not IZLEME_AKTIF:
+            return
+        kayit = {
+            "iz_kimligi": self.iz_kimligi,
+            "span_kimligi": self.span_kimligi,
+            "ust_span_kimligi": self.ust_span_kimligi,
+            "ad": self.ad,
+            "baslangic": datetime.fromtimestamp(self._baslangic_zamani, timezone.utc).isoformat(),
+            "sure_ms": round((time.perf_counter() - self._baslangic) * 1000, 3),
+            "durum": self.durum,
+            "hata": self.hata,
+            "ozellikler": self.ozellikler,
+        }
+        try:
+            # JSON'a çevirme de yazıcı thread'ine bırakılır
+            _yaziciyi_al().info("%s", JsonSatiri(kayit))
+        except Exception as e:
+            logger.debug("İz kaydı yazılamadı: %s", e)
+
+
+@contextmanager
+def span(ad: str, baglam: Span = None, **ozellikler):
+    """
+    Yeni bir span açar. Açık bir span varsa onun çocuğu olur, yoksa yeni bir iz başlatır.
+
+    baglam verilirse (ör. arka plan görevine taşınan bir isteğin span'ı) ebeveyn olarak o kullanılır.
+    """
+    ust = baglam if baglam is not None else _aktif_span.get()
+    yeni = Span(ad, ust.iz_kimligi if ust else uuid.uuid4().hex, ust.span_kimligi if ust else None, ozellikler)
+    jeton = _aktif_span.set(yeni)
+    try:
+        yield yeni
+    except BaseException as e:
+        yeni.durum = "hata"
+        yeni.hata = f"{type(e).__name__}: {str(e)}"
+        raise
+    finally:
+        _aktif_span.reset(jeton)
+        yeni.bitir()
+
+
+def aktif_span():
+    """O an açık olan span'ı döndürür (yoksa None); arka plan işlerine bağlam taşımak için kullanılır."""
+    return _aktif_span.get()
+
+
+def ozellik_ekle(**ozellikler):
+    """Açık span'a özellik ekler; açık span yoksa sessizce yok sayılır."""
+    mevcut = _aktif_span.get()
+    if mevcut is not None:
+        mevcut.ozellik_ekle(**ozellikler)
+
+
+def iz_kimligi():
+    mevcut = _aktif_span.get()
+    return mevcut.iz_kimligi if mevcut else None
@@ -0,0 +1,128 @@
+import os
+import hmac
+import json
+import time
+import random
+import hashlib
+import logging
+import contextvars
+from datetime import datetime, timezone
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from app.config import TRAFIK_KAYIT_DOSYASI, TRAFIK_KAYIT_ORNEKLEME_ORANI, TRAFIK_KAYIT_TUZU, TRAFIK_DOSYA_MAKS_BAYT
+from app.logging_config import JsonSatiri, jsonl_yazicisi
+
+logger = logging.getLogger(__name__)
+
+# Kaydedilen çağrının kaydı; toplu araçların alt görevleri ve worker thread'leri de aynı kayda yazar
+_aktif_kayit = contextvars.ContextVar("trafik_kaydi", default=None)
+
+# Serbest metin içermeyen, olduğu gibi kaydedilen parametreler
+ACIK_PARAMETRELER = {"ozet_tipi", "cikti_tipi", "hedef_dil", "soru_sayisi", "zorluk", "soru_tipi", "web_arama"}
+# Ortak depodaki dosyaya (ya da dosya listesine) işaret eden parametreler
+DOSYA_PARAMETRELERI = {"pdf_dosyasi_yolu", "ses_dosyasi_yolu", "video_dosyasi_yolu", "pdf_dosyalari", "ses_dosyalari"}
+# Aşama span'larından kayda alınan özellikler (URL, başlık gibi tanımlayıcı bilgiler alınmaz)
+ASAMA_OZELLIKLERI = ("dosya_boyutu", "mime_type", "model", "video_suresi_sn")
+
+_tuz = (TRAFIK_KAYIT_TUZU or os.urandom(16).hex()).encode()
+_yazici = None
+
+
+def _ozet(deger) -> str:
+    """Değerin tuzlu özeti: aynı girdinin tekrarları eşleşir, değerin kendisi kayda geçmez."""
+    return hmac.new(_tuz, str(deger).encode("utf-8"), hashlib.sha256).hexdigest()[:16]
+
+
+def _dosya_bilgisi(referans: str) -> dict:
+    from app.storage import depo
+    dosya_adi = depo.dosya_adi(referans)
+    yol = depo.yol(dosya_adi)
+    return {
+        "anahtar": _ozet(dosya_adi),
+        "uzanti": os.path.splitext(dosya_adi)[1].lower(),
+        "boyut": os.path.getsize(yol) if os.path.isfile(yol) else None,
+    }
+
+
+def parametreleri_anonimlestir(parametreler: dict) -> dict:
+    """
+    Araç parametrelerini tekrar oynatılabilir ama kimliksiz hale getirir: seçenekler ve sayılar korunur,
+    dosyalar boyut/uzantı/özete, URL ve serbest metinler uzunluk/özete indirgenir.
+    """
+    sonuc = {}
+    for ad, deger in (parametreler or {}).items():
+        if ad in ACIK_PARAMETRELER or isinstance(deger, (bool, int, float)) or deger is None:
+            sonuc[ad] = deger
+        elif ad in DOSYA_PARAMETRELERI and deger:
+            sonuc[ad] = [_dosya_bilgisi(d) for d in deger] if isinstance(deger, list) else _dosya_bilgisi(deger)
+        else:
+            metin = json.dumps(deger, ensure_ascii=False) if not isinstance(deger, str) else deger
+            sonuc[ad] = {"uzunluk": len(metin), "anahtar": _ozet(metin)} if metin else ""
+    return sonuc
+
+
+def asama_ekle(arac: str, asama_adi: str, sure: float, sonuc: str, ozellikler: dict):
+    """metrics.asama tarafından çağrılır; kaydedilen bir çağrının içindeysek aşama süresini kayda ekler."""
+    kayit = _aktif_kayit.get()
+    if kayit is None:
+        return
+    asama = {"arac": arac, "asama": asama_adi, "sure_ms": round(sure * 1000, 3), "sonuc": sonuc}
+    asama.update({k: ozellikler[k] for k in ASAMA_OZELLIKLERI if ozellikler.get(k) is not None})
+    kayit["asamalar"].append(asama)
+
+
+def token_ekle(yon: str, adet: int):
+    kayit = _aktif_kayit.get()
+    if kayit is not None:
+        kayit["token"][yon] = kayit["token"].get(yon, 0) + adet
+
+
+def _kaydi_yaz(kayit: dict):
+    global _yazici
+    try:
+        if _yazici is None:
+            _yazici = jsonl_yazicisi("edumcp.trafik", TRAFIK_KAYIT_DOSYASI, TRAFIK_DOSYA_MAKS_BAYT, 5)
+        _yazici.info("%s", JsonSatiri(kayit))
+    except Exception as e:
+        logger.debug("Trafik kaydı yazılamadı: %s", e)
+
+
+class TrafikKaydedici(Middleware):
+    """
+    MCP araç çağrılarını istemcinin gönderdiği haliyle (toplu araçlar dahil) kaydeden ara katman.
+
+    Her kayıt: çağrı zamanı, araç adı, anonimleştirilmiş parametreler, çağrının toplam süresi ve durumu,
+    arka uç aşamalarının (indirme, yükleme, işleme bekleme, üretim...) süreleri ve token kullanımı.
+    Ön ısıtma gibi sunucu içi çağrılar MCP'den geçmediği için kayda girmez.
+    """
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        if random.random() >= TRAFIK_KAYIT_ORNEKLEME_ORANI:
+            return await call_next(context)
+
+        kayit = {
+            "zaman": datetime.now(timezone.utc).isoformat(),
+            "arac": context.message.name,
+            "parametreler": {},
+            "asamalar": [],
+            "token": {},
+        }
+        try:
+            kayit["parametreler"] = parametreleri_anonimlestir(context.message.arguments)
+        except Exception as e:
+            logger.debug("Parametreler anonimleştirilemedi: %s", e)
+
+        jeton = _aktif_kayit.set(kayit)
+        baslangic = time.perf_counter()
+        durum = "Hata"
+        try:
+            sonuc = await call_next(context)
+            try:
+                durum = json.loads(sonuc.content[0].text).get("durum", "Bilinmiyor")
+            except (AttributeError, IndexError, TypeError, ValueError):
+                durum = "Bilinmiyor"
+            return sonuc
+        finally:
+            _aktif_kayit.reset(jeton)
+            kayit["sure_ms"] = round((time.perf_counter() - baslangic) * 1000, 3)
+            kayit["durum"] = durum
+            _kaydi_yaz(kayit)
@@ -0,0 +1,117 @@
+import os
+import re
+import logging
+from datetime import datetime
+import anyio
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from app.server import mcp
+from app.storage import depo, DOSYA_TURLERI, DosyaCokBuyukHatasi
+
+logger = logging.getLogger(__name__)
+
+PARCA_BOYUTU = 1024 * 1024
+SHA256_DESENI = re.compile(r'^[0-9a-f]{64}$')
+
+
+def _hata(mesaj: str, durum_kodu: int) -> JSONResponse:
+    return JSONResponse({"success": False, "error": mesaj}, status_code=durum_kodu)
+
+
+def _depodaki_boyut(sha256_hex: str, uzanti: str):
+    """Özeti verilen içerik depodaysa (yol, boyut), değilse None; disk erişimi olduğu için thread'de çağrılır."""
+    yol = depo.ozet_ile_bul(sha256_hex, uzanti)
+    if not yol or not depo.erisim(yol):
+        return None
+    try:
+        return yol, os.path.getsize(yol)
+    except OSError:
+        return None
+
+
+async def _multipart_parcalari(yuklenen_dosya):
+    while True:
+        parca = await yuklenen_dosya.read(PARCA_BOYUTU)
+        if not parca:
+            break
+        yield parca
+
+
+@mcp.custom_route("/upload-file", methods=["POST"])
+async def dosya_yukle(request: Request) -> JSONResponse:
+    """
+    Dosyayı MCP sunucusunun kendi HTTP uygulaması üzerinden, akış halinde ortak depoya yükler.
+
+    Ham gövde (application/octet-stream, chunked olabilir) tercih edilir; dosya adı ve türü
+    ?filename=...&file_type=pdf|audio|video sorgu parametreleriyle verilir. Eski web akışıyla uyum
+    için multipart/form-data ("file" ve "file_type" alanları) da kabul edilir. İstemci içerik özetini
+    X-Content-SHA256 başlığında gönderirse ve içerik zaten depodaysa gövde okunmadan cevap döner.
+
+    Multipart yolu eski, tamponlu yoldur: request.form() gövdenin tamamını önce geçici dosyaya yazar,
+    özet ve depoya kopyalama ancak ondan sonra yapılır. Akışlı yükleme ve erken tekrar kontrolü için ham
+    gövde kullanılmalıdır.
+    """
+    icerik_tipi = request.headers.get("content-type", "")
+    multipart = icerik_tipi.startswith("multipart/form-data")
+
+    if multipart:
+        # Eski, tamponlu yol: gövde burada bütünüyle geçici dosyaya alınır
+        form = await request.form()
+        yuklenen_dosya = form.get("file")
+        if yuklenen_dosya is None or not hasattr(yuklenen_dosya, "read"):
+            return _hata("'file' alanı bulunamadı", 400)
+        dosya_turu = form.get("file_type") or request.query_params.get("file_type", "")
+        orijinal_ad = yuklenen_dosya.filename or ""
+    else:
+        dosya_turu = request.query_params.get("file_type", "")
+        orijinal_ad = request.query_params.get("filename") or request.headers.get("x-filename", "")
+
+    orijinal_ad = depo.dosya_adi(orijinal_ad)
+    uzanti = os.path.splitext(orijinal_ad)[1].lower()
+    tur = DOSYA_TURLERI.get(dosya_turu)
+    if tur is None:
+        return _hata(f"Geçersiz file_type. Desteklenenler: {', '.join(DOSYA_TURLERI)}", 400)
+    if uzanti not in tur["uzantilar"]:
+        return _hata(f"Desteklenmeyen uzantı: {uzanti or '(yok)'}. Desteklenenler: {', '.join(tur['uzantilar'])}", 400)
+
+    yanit = {
+        "success": True,
+        "file_type": dosya_turu,
+        "original_filename": orijinal_ad,
+        "upload_time": datetime.now().isoformat(timespec="seconds"),
+    }
+
+    # İçerik zaten depodaysa gövdeyi hiç okumadan anında cevap ver
+    bildirilen_ozet = request.headers.get("x-content-sha256", "").strip().lower()
+    if bildirilen_ozet and not SHA256_DESENI.match(bildirilen_ozet):
+        return _hata("X-Content-SHA256 başlığı 64 karakterlik onaltılık sha256 özeti olmalı", 400)
+    if bildirilen_ozet:
+        mevcut = await anyio.to_thread.run_sync(_depodaki_boyut, bildirilen_ozet, uzanti)
+        if mevcut:
+            mevcut_yol, boyut = mevcut
+            logger.info("Yükleme atlandı, içerik zaten depoda: %s", os.path.basename(mevcut_yol))
+            return JSONResponse(yanit | {
+                "file_path": os.path.basename(mevcut_yol),
+                "sha256": bildirilen_ozet,
+                "file_size": boyut,
+                "deduplicated": True,
+            })
+
+    parcalar = _multipart_parcalari(yuklenen_dosya) if multipart else request.stream()
+    try:
+        sonuc = await depo.akistan_kaydet(parcalar, uzanti, tur["maks_boyut"])
+    except DosyaCokBuyukHatasi as e:
+        return _hata(str(e), 413)
+    except Exception as e:
+        logger.error("Dosya yükleme hatası: %s", e, exc_info=True)
+        return _hata(f"Dosya kaydedilemedi: {str(e)}", 500)
+
+    if bildirilen_ozet and bildirilen_ozet != sonuc["sha256"]:
+        logger.warning("Bildirilen özet ile içerik özeti uyuşmuyor: %s != %s", bildirilen_ozet, sonuc['sha256'])
+
+    return JSONResponse(yanit | {
+        "file_path": sonuc["dosya_adi"],
+        "sha256": sonuc["sha256"],
+        "file_size": sonuc["boyut"],
+        "deduplicated": sonuc["tekrar"],
+    })
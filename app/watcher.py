@@ -0,0 +1,101 @@
+import os
+import asyncio
+import logging
+import anyio
+from app.config import ONISITMA_TARAMA_ARALIGI, ONISITMA_HEDEF_DIL
+from app.metrics import metrikler
+from app.shared_state import durum
+from app.job_queue import isi_yurut
+from app.rate_limiter import sinif_olarak, ARKA_PLAN
+
+logger = logging.getLogger(__name__)
+
+PDF_UZANTILARI = ('.pdf',)
+SES_UZANTILARI = ('.mp3', '.wav', '.flac', '.m4a', '.aac', '.ogg', '.webm')
+VIDEO_UZANTILARI = ('.mp4', '.mkv', '.avi', '.mov', '.flv')
+
+
+class YuklemeIzleyici:
+    """
+    Ortak klasörü tarar, yeni gelen dosyaların varsayılan özetini arka planda önceden hazırlar.
+
+    Dosyalar tek bir düşük öncelikli işçi tarafından sırayla işlenir; böylece kullanıcı çağrılarıyla
+    API kotası için yarışmaz. Sonuçlar araçların paylaştığı önbelleğe düşer, kullanıcının sonraki
+    çağrısı doğrudan önbellekten cevaplanır. Çok süreçli çalışmada klasörü kirayı tutan tek işçi işler;
+    diğerleri yalnızca gördükleri dosya listesini güncel tutar ve kira boşalınca kaldıkları yerden devralır.
+    """
+
+    def __init__(self, klasor: str, tarama_araligi: float = ONISITMA_TARAMA_ARALIGI, hedef_dil: str = ONISITMA_HEDEF_DIL):
+        self.klasor = klasor
+        self.tarama_araligi = tarama_araligi
+        self.hedef_dil = hedef_dil
+        self._gorulen = {}      # dosya adı -> (boyut, değişiklik zamanı)
+        self._bekleyen = {}     # yazımı sürüyor olabilecek dosyalar
+        self._kuyruk = asyncio.Queue()
+        metrikler.olcer_ekle("edumcp_onisitma_kuyrugu", "Ön ısıtma için sırada bekleyen dosya sayısı", self._kuyruk.qsize)
+
+    def _klasoru_tara(self) -> dict:
+        dosyalar = {}
+        try:
+            with os.scandir(self.klasor) as girdiler:
+                for girdi in girdiler:
+                    if girdi.is_file() and not girdi.name.startswith('.'):
+                        bilgi = girdi.stat()
+                        dosyalar[girdi.name] = (bilgi.st_size, bilgi.st_mtime)
+        except FileNotFoundError:
+            logger.warning("İzlenen klasör bulunamadı: %s", self.klasor)
+        return dosyalar
+
+    async def _tarayici(self):
+        # Sunucu açılırken klasörde bulunan dosyalar temel kabul edilir, yalnızca yeni gelenler işlenir
+        self._gorulen = await anyio.to_thread.run_sync(self._klasoru_tara)
+        logger.info("Yükleme izleyici başladı: %s (%s mevcut dosya)", self.klasor, len(self._gorulen))
+        while True:
+            await asyncio.sleep(self.tarama_araligi)
+            guncel = await anyio.to_thread.run_sync(self._klasoru_tara)
+            if not await anyio.to_thread.run_sync(durum.kira_al, "onisitma", self.tarama_araligi * 3):
+                self._gorulen, self._bekleyen = guncel, {}
+                continue
+            for ad, imza in guncel.items():
+                if self._gorulen.get(ad) == imza:
+                    continue
+                # Dosya iki tarama boyunca değişmediyse yazımı tamamlanmış kabul edilir
+                if self._bekleyen.get(ad) == imza:
+                    del self._bekleyen[ad]
+                    self._gorulen[ad] = imza
+                    await self._kuyruk.put(ad)
+                else:
+                    self._bekleyen[ad] = imza
+            for ad in set(self._gorulen) - set(guncel):
+                del self._gorulen[ad]
+
+    async def _isci(self):
+        # Ön ısıtmanın Gemini çağrıları kotayı en düşük öncelikle kullanır; kullanıcı çağrılarını bekletmez
+        with sinif_olarak(ARKA_PLAN):
+            while True:
+                dosya_adi = await self._kuyruk.get()
+                uzanti = os.path.splitext(dosya_adi)[1].lower()
+                try:
+                    if uzanti in PDF_UZANTILARI:
+                        # "kapsamli" sonuç önbellekteyken "kisa" ve "genis" de yerel olarak türetilebilir
+                        logger.info("Ön ısıtma: PDF özeti hazırlanıyor: %s", dosya_adi)
+                        await isi_yurut("pdf", pdf_dosyasi_yolu=dosya_adi, ozet_tipi="kapsamli", hedef_dil=self.hedef_dil)
+                    elif uzanti in SES_UZANTILARI:
+                        logger.info("Ön ısıtma: ses analizi hazırlanıyor: %s", dosya_adi)
+                        await isi_yurut("ses", ses_kaynagi=dosya_adi, cikti_tipi="ozet", hedef_dil=self.hedef_dil)
+                    elif uzanti in VIDEO_UZANTILARI:
+                        logger.info("Ön ısıtma: video özeti hazırlanıyor: %s", dosya_adi)
+                        await isi_yurut("video", video_dosyasi_yolu=dosya_adi, ozet_tipi="kapsamli", hedef_dil=self.hedef_dil)
+                    else:
+                        logger.debug("Ön ısıtma atlandı, desteklenmeyen dosya: %s", dosya_adi)
+                except Exception as e:
+                    logger.error("Ön ısıtma hatası (%s): %s", dosya_adi, e)
+                finally:
+                    self._kuyruk.task_done()
+
+    def baslat(self) -> list:
+        """Tarayıcı ve işçi görevlerini mevcut event loop üzerinde başlatır."""
+        return [
+            asyncio.create_task(self._tarayici(), name="yukleme-izleyici-tarayici"),
+            asyncio.create_task(self._isci(), name="yukleme-izleyici-isci"),
+        ]
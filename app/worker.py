@@ -0,0 +1,170 @@
+"""
+Kalıcı iş kuyruğundaki medya işlerini (PDF, ses, video) yürüten işçi süreci.
+
+    python -m app.worker --eszamanlilik 4 --kapanis-suresi 60
+
+MCP sunucusu IS_KUYRUGU_AKTIF=1 ile çalışırken araçlar işi kuyruğa ekler ve sonucu bekler; indirme,
+Gemini'ye yükleme ve üretim bu süreçte yapılır. İşçiler sunucudan bağımsız olarak yeniden
+başlatılabilir ve ihtiyaca göre birden fazla çalıştırılabilir. Aynı DURUM_VERITABANI ve
+SHARED_UPLOADS_DIR kullanılmalıdır.
+
+SIGTERM/SIGINT ile kapanan işçi yeni iş almaz ve yürüyen işlerin bitmesini en fazla kapanış süresi kadar
+bekler. Süre dolunca kalan işler kuyruğa geri bırakılır; bir sonraki işçi bunları kontrol noktasından, yani
+tamamlanmış indirme, yükleme ve parça sonuçlarını yeniden yapmadan sürdürür.
+"""
+import os
+import json
+import signal
+import asyncio
+import logging
+import argparse
+import anyio
+from app.config import IS_ISCI_ESZAMANLILIK, IS_YOKLAMA_ARALIGI, KAPANIS_BEKLEME_SURESI
+from app.job_queue import is_kuyrugu, isleyici, IPTAL_SONUCU
+from app.shared_state import durum
+from app.rate_limiter import sinif_olarak
+from app.deadlines import butce_olarak
+from app.checkpoints import kontrol_noktasiyla
+from app.logging_config import loglamayi_kur
+
+logger = logging.getLogger(__name__)
+
+# Tamamlanan eski işlerin kuyruktan temizlenme aralığı (sn)
+TEMIZLIK_ARALIGI = 600
+# Yürüyen işin iptal işaretinin (ve kirasının) en fazla bu aralıkla kontrol edilmesi (sn)
+IPTAL_KONTROL_ARALIGI = 2
+
+
+class IsIsleyici:
+    """Kuyruğu yoklayan `eszamanlilik` kadar tüketiciyle işleri bu süreçte yürütür."""
+
+    def __init__(self, eszamanlilik: int = IS_ISCI_ESZAMANLILIK, yoklama_araligi: float = IS_YOKLAMA_ARALIGI,
+                 kapanis_suresi: float = KAPANIS_BEKLEME_SURESI):
+        self.eszamanlilik = eszamanlilik
+        self.yoklama_araligi = yoklama_araligi
+        self.kapanis_suresi = kapanis_suresi
+        self.pid = os.getpid()
+        self._durdur = asyncio.Event()
+        self._yurutulen = set()     # yürütülen iş kimlikleri
+        self._kapanis_kapsami = None
+
+    async def _kirayi_yenile(self, kimlik: str, calisma: asyncio.Task, iptal: asyncio.Event):
+        """Kirayı yeniler; sonucu bekleyen istemci kalmadığı için iş iptal edildiyse işi yarıda keser."""
+        while True:
+            await asyncio.sleep(min(is_kuyrugu.kira_suresi / 3, IPTAL_KONTROL_ARALIGI))
+            if await anyio.to_thread.run_sync(is_kuyrugu.kirayi_uzat, kimlik, self.pid):
+                logger.info("İş iptal edildi, yarıda bırakılıyor: %s", kimlik)
+                iptal.set()
+                calisma.cancel()
+                return
+
+    async def _isi_calistir(self, is_: dict) -> str:
+        # Gemini kotası, işi kuyruğa ekleyen çağrının öncelik sınıfıyla; aşama süreleri onun süre sınırıyla paylaşılır
+        with sinif_olarak(is_["sinif"]), butce_olarak(is_["arac"], son_tarih=is_["son_tarih"]):
+            return await kontrol_noktasiyla(is_["anahtar"], is_["arac"],
+                                            lambda: isleyici(is_["arac"])(**is_["parametreler"]))
+
+    async def _yurut(self, is_: dict):
+        kimlik = is_["kimlik"]
+        logger.info("İş başladı: %s (%s)", kimlik, is_["arac"])
+        calisma = asyncio.create_task(self._isi_calistir(is_))
+        iptal = asyncio.Event()
+        kira = asyncio.create_task(self._kirayi_yenile(kimlik, calisma, iptal))
+        basarili = False
+        try:
+            sonuc = await calisma
+            basarili = True
+        except asyncio.CancelledError:
+            if not iptal.is_set():
+                # İşçi kapanıyor; iş _tuketici'de kuyruğa geri bırakılır
+                raise
+            sonuc = IPTAL_SONUCU
+        except Exception as e:
+            logger.error("İş hatası (%s): %s", kimlik, e, exc_info=True)
+            sonuc = json.dumps({"durum": "Hata", "mesaj": f"İş yürütülürken hata oluştu: {e}"}, ensure_ascii=False)
+        finally:
+            kira.cancel()
+        await anyio.to_thread.run_sync(is_kuyrugu.bitir, kimlik, self.pid, sonuc, basarili, iptal.is_set())
+        logger.info("İş bitti: %s", kimlik)
+
+    async def _tuketici(self):
+        while not self._durdur.is_set():
+            is_ = await anyio.to_thread.run_sync(is_kuyrugu.al, self.pid)
+            if is_ is None:
+                with anyio.move_on_after(self.yoklama_araligi):
+                    await self._durdur.wait()
+                continue
+            self._yurutulen.add(is_["kimlik"])
+            try:
+                await self._yurut(is_)
+            except asyncio.CancelledError:
+                # Kapanışta yarıda kalan iş başka bir işçi (ya da yeniden başlayan bu işçi) için geri bırakılır
+                await anyio.to_thread.run_sync(is_kuyrugu.geri_birak, is_["kimlik"], self.pid)
+                logger.warning("İş kapanış nedeniyle kuyruğa geri bırakıldı: %s", is_["kimlik"])
+                raise
+            finally:
+                self._yurutulen.discard(is_["kimlik"])
+
+    async def _temizlik(self):
+        while True:
+            silinen = await anyio.to_thread.run_sync(is_kuyrugu.eskileri_temizle)
+            if silinen:
+                logger.info("Kuyruktan %s eski iş kaydı silindi", silinen)
+            await asyncio.sleep(TEMIZLIK_ARALIGI)
+
+    def durdur(self):
+        if self._kapanis_kapsami is not None:
+            # Kapanış beklenirken gelen ikinci sinyal: yürüyen işler beklenmeden bırakılır
+            self._kapanis_kapsami.cancel()
+        self._durdur.set()
+
+    async def calistir(self):
+        from app.reaper import uzak_dosya_temizleyici
+        # Sabitlemelerin geçerli sayılması ve metriklerin sunucuda görünmesi için canlılık sinyali
+        durum.nabzi_baslat()
+        uzak_dosya_temizleyici.baslat()
+        temizlik = asyncio.create_task(self._temizlik(), name="is-kuyrugu-temizlik")
+        logger.info("İşçi başladı (pid %s, eşzamanlılık %s)", self.pid, self.eszamanlilik)
+        tuketiciler = [asyncio.create_task(self._tuketici(), name=f"is-tuketici-{i}") for i in range(self.eszamanlilik)]
+        await self._durdur.wait()
+        temizlik.cancel()
+        if self._yurutulen:
+            # Tüketiciler yeni iş almaz; yürüyen işlerini bitirince kendiliğinden çıkar
+            logger.info("İşçi kapanıyor, %s yürüyen işin bitmesi en fazla %s sn beklenecek",
+                        len(self._yurutulen), self.kapanis_suresi)
+            with anyio.move_on_after(self.kapanis_suresi) as self._kapanis_kapsami:
+                await asyncio.wait(tuketiciler)
+        if self._yurutulen:
+            logger.info("Kapanış süresi doldu, %s yürüyen iş kontrol noktasıyla geri bırakılacak", len(self._yurutulen))
+        for gorev in tuketiciler:
+            gorev.cancel()
+        await asyncio.gather(*tuketiciler, return_exceptions=True)
+        # Kuyruğa alınmış Gemini dosya silmeleri tamamlansın
+        await uzak_dosya_temizleyici.bosalt()
+
+
+async def ana(args):
+    isci = IsIsleyici(eszamanlilik=args.eszamanlilik, yoklama_araligi=args.yoklama_araligi,
+                      kapanis_suresi=args.kapanis_suresi)
+    dongu = asyncio.get_running_loop()
+    for sinyal in (signal.SIGINT, signal.SIGTERM):
+        try:
+            dongu.add_signal_handler(sinyal, isci.durdur)
+        except NotImplementedError:
+            # Windows: SIGINT KeyboardInterrupt olarak gelir
+            pass
+    await isci.calistir()
+
+
+def arguman_ayristirici() -> argparse.ArgumentParser:
+    ayristirici = argparse.ArgumentParser(description="edumcp iş kuyruğu işçisi")
+    ayristirici.add_argument("--eszamanlilik", type=int, default=IS_ISCI_ESZAMANLILIK, help="Aynı anda yürütülecek iş sayısı")
+    ayristirici.add_argument("--yoklama-araligi", type=float, default=IS_YOKLAMA_ARALIGI, help="Kuyruk boşken yoklama aralığı (sn)")
+    ayristirici.add_argument("--kapanis-suresi", type=float, default=KAPANIS_BEKLEME_SURESI,
+                             help="Kapanışta yürüyen işlerin bitmesi için beklenen en uzun süre (sn)")
+    return ayristirici
+
+
+if __name__ == "__main__":
+    loglamayi_kur()
+    asyncio.run(ana(arguman_ayristirici().parse_args()))
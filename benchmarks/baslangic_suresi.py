@@ -0,0 +1,143 @@
+"""
+Sunucunun soğuk başlangıç süresini ölçer ve içe aktarma bütçesini denetler.
+
+    python -m benchmarks.baslangic_suresi --tekrar 5 --cikti baslangic.json
+
+İki ölçüm yapılır, her biri temiz bir alt süreçte:
+
+- İçe aktarma: sunucu ve tüm araç modüllerinin içe aktarılma süresi. Bu aşamada ağır bağımlılıkların
+  (AGIR_MODULLER) yüklenmemiş ve araç şemalarının kaydedilmiş olması gerekir.
+- Hazır olma: `python main.py` başlatıldıktan sonra /mcp uç noktasının ilk `initialize` isteğine
+  başarıyla yanıt vermesine kadar geçen süre. Sonrasında araç listesi alınıp tüm araçların
+  kayıtlı olduğu doğrulanır.
+
+Medyan süreler --ice-aktarma-butcesi / --hazir-olma-butcesi değerlerini aşarsa ya da ağır bir
+bağımlılık açılışta yüklenirse `BÜTÇE AŞIMI:` satırları yazılır ve çıkış kodu 1 olur; CI'da
+yuk_uretici.py ile aynı şekilde kullanılabilir.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+import tempfile
+import statistics
+import subprocess
+import httpx
+from fastmcp import Client
+
+# Açılışta yüklenmemesi, ilk araç çağrısına bırakılması gereken modüller
+AGIR_MODULLER = ("google.generativeai", "yt_dlp", "requests", "PyPDF2")
+# server.main'in açılışta içe aktardığı modüllerle birlikte araç modülleri
+ICE_AKTARMA_KODU = f"""
+import sys, json, time
+baslangic = time.perf_counter()
+import app.server, app.tools, app.upload_api, app.metrics_api, app.reaper, app.watcher, app.traffic_recorder
+sure = time.perf_counter() - baslangic
+print(json.dumps({{"sure": sure, "agir_moduller": [m for m in {AGIR_MODULLER!r} if m in sys.modules],
+                  "arac_sayisi": len(app.server.mcp._tool_manager._tools)}}))
+"""
+INITIALIZE = {
+    "jsonrpc": "2.0", "id": 1, "method": "initialize",
+    "params": {"protocolVersion": "2025-06-18", "capabilities": {},
+               "clientInfo": {"name": "baslangic_suresi", "version": "1"}},
+}
+
+
+def _ortam() -> dict:
+    # Gerçek anahtar gerekmez: ölçüm Gemini'ye istek göndermez
+    gecici = tempfile.mkdtemp(prefix="edumcp_baslangic_")
+    return dict(os.environ, GEMINI_API_KEY=os.environ.get("GEMINI_API_KEY", "olcum"),
+                SHARED_UPLOADS_DIR=os.environ.get("SHARED_UPLOADS_DIR", gecici),
+                DURUM_VERITABANI=os.environ.get("DURUM_VERITABANI", os.path.join(gecici, "durum.db")))
+
+
+def ice_aktarmayi_olc() -> dict:
+    cikti = subprocess.run([sys.executable, "-c", ICE_AKTARMA_KODU], env=_ortam(), capture_output=True,
+                           text=True, check=True)
+    return json.loads(cikti.stdout.strip().splitlines()[-1])
+
+
+async def hazir_olmayi_olc(url: str, zaman_asimi: float) -> dict:
+    baslangic = time.perf_counter()
+    sunucu = subprocess.Popen([sys.executable, "main.py"], env=_ortam(),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        async with httpx.AsyncClient(timeout=1) as http:
+            while True:
+                if sunucu.poll() is not None:
+                    raise RuntimeError(f"Sunucu açılışta kapandı (çıkış kodu {sunucu.returncode})")
+                if time.perf_counter() - baslangic > zaman_asimi:
+                    raise TimeoutError(f"Sunucu {zaman_asimi} sn içinde hazır olmadı")
+                try:
+                    yanit = await http.post(f"{url}/mcp", json=INITIALIZE,
+                                            headers={"Accept": "application/json, text/event-stream"})
+                    if yanit.status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.02)
+        hazir = time.perf_counter() - baslangic
+        async with Client(f"{url}/mcp") as istemci:
+            araclar = await istemci.list_tools()
+        return {"sure": hazir, "arac_sayisi": len(araclar)}
+    finally:
+        sunucu.send_signal(signal.SIGINT)
+        try:
+            sunucu.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            sunucu.kill()
+            sunucu.wait()
+
+
+async def ana(args) -> int:
+    ice_aktarmalar, hazir_olmalar = [], []
+    for _ in range(args.tekrar):
+        ice_aktarmalar.append(ice_aktarmayi_olc())
+        hazir_olmalar.append(await hazir_olmayi_olc(args.url, args.zaman_asimi))
+
+    sonuc = {
+        "ice_aktarma_medyan_sn": round(statistics.median(o["sure"] for o in ice_aktarmalar), 3),
+        "ice_aktarma_en_kotu_sn": round(max(o["sure"] for o in ice_aktarmalar), 3),
+        "hazir_olma_medyan_sn": round(statistics.median(o["sure"] for o in hazir_olmalar), 3),
+        "hazir_olma_en_kotu_sn": round(max(o["sure"] for o in hazir_olmalar), 3),
+        "acilista_yuklenen_agir_moduller": sorted({m for o in ice_aktarmalar for m in o["agir_moduller"]}),
+        "kayitli_arac_sayisi": ice_aktarmalar[0]["arac_sayisi"],
+        "listelenen_arac_sayisi": hazir_olmalar[0]["arac_sayisi"],
+    }
+    print(json.dumps(sonuc, ensure_ascii=False, indent=2))
+    if args.cikti:
+        with open(args.cikti, "w", encoding="utf-8") as f:
+            json.dump({"zaman": time.strftime("%Y-%m-%dT%H:%M:%S"), "ayarlar": vars(args), "sonuc": sonuc},
+                      f, ensure_ascii=False, indent=2)
+
+    asimlar = []
+    if sonuc["ice_aktarma_medyan_sn"] > args.ice_aktarma_butcesi:
+        asimlar.append(f"içe aktarma {sonuc['ice_aktarma_medyan_sn']} sn > {args.ice_aktarma_butcesi} sn")
+    if sonuc["hazir_olma_medyan_sn"] > args.hazir_olma_butcesi:
+        asimlar.append(f"hazır olma {sonuc['hazir_olma_medyan_sn']} sn > {args.hazir_olma_butcesi} sn")
+    if sonuc["acilista_yuklenen_agir_moduller"]:
+        asimlar.append(f"açılışta yüklenen ağır modüller: {', '.join(sonuc['acilista_yuklenen_agir_moduller'])}")
+    if sonuc["listelenen_arac_sayisi"] != sonuc["kayitli_arac_sayisi"]:
+        asimlar.append(f"listelenen araç sayısı ({sonuc['listelenen_arac_sayisi']}) kayıtlı araç sayısından "
+                       f"({sonuc['kayitli_arac_sayisi']}) farklı")
+    for asim in asimlar:
+        print(f"BÜTÇE AŞIMI: {asim}", file=sys.stderr)
+    return 1 if asimlar else 0
+
+
+def arguman_ayristirici() -> argparse.ArgumentParser:
+    ayristirici = argparse.ArgumentParser(description="edumcp soğuk başlangıç ölçümü")
+    ayristirici.add_argument("--url", default="http://localhost:8000", help="main.py'nin dinlediği kök adres")
+    ayristirici.add_argument("--tekrar", type=int, default=5, help="Ölçüm tekrar sayısı (medyan raporlanır)")
+    ayristirici.add_argument("--ice-aktarma-butcesi", type=float, default=0.8, help="İzin verilen medyan içe aktarma süresi (sn)")
+    ayristirici.add_argument("--hazir-olma-butcesi", type=float, default=1.2, help="İzin verilen medyan hazır olma süresi (sn)")
+    ayristirici.add_argument("--zaman-asimi", type=float, default=30, help="Tek açılış için azami bekleme (sn)")
+    ayristirici.add_argument("--cikti", help="Sonuçların yazılacağı JSON dosyası")
+    return ayristirici
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(ana(arguman_ayristirici().parse_args())))
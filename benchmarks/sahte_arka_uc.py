@@ -0,0 +1,268 @@
+"""
+Gemini File/Generate API'leri, yt-dlp ve web araması için yerel sahte arka uç.
+
+Gerçek API kotası harcamadan sunucunun hattını (yükleme → işleme bekleme → üretim) ölçebilmek için
+google.generativeai, yt_dlp ve quiz aracının search_web fonksiyonu süreç içinde sahteleriyle değiştirilir.
+Gecikmeler ve hata oranları ortam değişkenleriyle ayarlanır:
+
+    SAHTE_YUKLEME_HIZI_MBPS      Dosya yükleme hızı (MB/sn, varsayılan 50)
+    SAHTE_ISLEME_GECIKMESI       Yüklenen dosyanın PROCESSING durumunda kalma süresi (sn, varsayılan 2)
+    SAHTE_URETIM_GECIKMESI       generate_content ortalama gecikmesi (sn, varsayılan 3)
+    SAHTE_URETIM_SAPMASI         Üretim gecikmesine eklenen rastgele sapma oranı (0-1, varsayılan 0.3)
+    SAHTE_YUKLEME_HATA_ORANI     Yüklemelerin hata ile biteceği oran (0-1, varsayılan 0)
+    SAHTE_URETIM_HATA_ORANI      generate_content çağrılarının 429/503 ile biteceği oran (0-1, varsayılan 0)
+    SAHTE_INDIRME_HIZI_MBPS      yt-dlp indirme hızı (MB/sn, varsayılan 20)
+    SAHTE_VIDEO_BOYUTU_MB        İndirilen sahte videonun boyutu (MB, varsayılan 5)
+    SAHTE_ARAMA_GECIKMESI        Web araması gecikmesi (sn, varsayılan 0.5)
+    SAHTE_TOKEN_ORANI            Yüklenen bayt başına giriş token sayısı (varsayılan 0.001)
+    SAHTE_PROFIL                 Kayıtlı trafikten çıkarılmış zamanlama profili (JSON, bkz. tekrar_oynat.py)
+    SAHTE_TOHUM                  Rastgele sayı üreteci tohumu; verilirse gecikme ve hata dizisi tekrarlanabilir
+
+Profil verildiğinde işleme/üretim/arama gecikmeleri ve video boyutları araç türüne göre (pdf, ses, video,
+soru) kayıtlı örneklerden çekilir; yükleme/indirme hızları ve hata oranları da profilden alınır.
+
+Sahte fonksiyonlar gerçekleri gibi senkron ve bloklayıcıdır (time.sleep); sunucu onları yine
+anyio worker thread'lerinde çalıştırdığı için thread havuzu baskısı da gerçekçi ölçülür.
+"""
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import threading
+from types import SimpleNamespace
+from datetime import datetime, timezone
+
+
+def _ortam(ad: str, varsayilan: float) -> float:
+    return float(os.getenv(ad, str(varsayilan)))
+
+
+def _profili_yukle(yol: str) -> dict:
+    if not yol:
+        return {}
+    with open(yol, encoding="utf-8") as f:
+        return json.load(f)
+
+
+PROFIL = _profili_yukle(os.getenv("SAHTE_PROFIL", ""))
+_rastgele = random.Random(os.getenv("SAHTE_TOHUM") or None)
+
+YUKLEME_HIZI = PROFIL.get("yukleme_hizi_bps") or _ortam("SAHTE_YUKLEME_HIZI_MBPS", 50) * 1024 * 1024
+ISLEME_GECIKMESI = _ortam("SAHTE_ISLEME_GECIKMESI", 2)
+URETIM_GECIKMESI = _ortam("SAHTE_URETIM_GECIKMESI", 3)
+URETIM_SAPMASI = _ortam("SAHTE_URETIM_SAPMASI", 0.3)
+YUKLEME_HATA_ORANI = PROFIL.get("yukleme_hata_orani", _ortam("SAHTE_YUKLEME_HATA_ORANI", 0))
+URETIM_HATA_ORANI = PROFIL.get("uretim_hata_orani", _ortam("SAHTE_URETIM_HATA_ORANI", 0))
+INDIRME_HIZI = PROFIL.get("indirme_hizi_bps") or _ortam("SAHTE_INDIRME_HIZI_MBPS", 20) * 1024 * 1024
+VIDEO_BOYUTU = int(_ortam("SAHTE_VIDEO_BOYUTU_MB", 5) * 1024 * 1024)
+ARAMA_GECIKMESI = _ortam("SAHTE_ARAMA_GECIKMESI", 0.5)
+TOKEN_ORANI = _ortam("SAHTE_TOKEN_ORANI", 0.001)
+
+# Araçların "kapsamli" şemalarının birleşimi; tüm özet katmanları bu sözlükten ayrıştırılabilir
+OZET_YANITI = {
+    "belge_dili": "Türkçe", "video_dili": "Türkçe", "ses_dili": "Türkçe",
+    "baslik": "Sahte içerik", "belge_tipi": "ders notu", "sure": "10:00",
+    "kisa_ozet": "Birinci cümle. İkinci cümle. Üçüncü cümle. Dördüncü cümle.",
+    "genis_ozet": "Ayrıntılı özet paragrafı. " * 20, "detayli_ozet": "Ayrıntılı özet paragrafı. " * 20,
+    "transkript": "Konuşma metni. " * 50,
+    "sayfa_ozetleri": [{"sayfa": "1-3", "konu": "Giriş", "aciklama": "Giriş bölümü"}],
+    "zaman_damgalari": [{"zaman": "0:30", "aciklama": "Giriş"}],
+    "kilit_ogrenme_noktalari": ["Madde 1", "Madde 2", "Madde 3"],
+    "tablolar_ve_grafikler": [], "gorsel_materyaller": [], "bahsedilen_kaynaklar": [],
+    "metodoloji": "Yok", "ilgili_konular": ["Konu 1", "Konu 2"],
+    "anahtar_kelimeler": ["a", "b", "c", "d", "e"], "etiketler": ["#a", "#b"],
+    "ogrenme_ciktilari": ["Çıktı 1", "Çıktı 2", "Çıktı 3"],
+    "belge_sonrasi_ogrenilecekler": "Öğrenilecekler. İkinci cümle.",
+    "video_sonrasi_ogrenilecekler": "Öğrenilecekler. İkinci cümle.",
+    "detayli_analiz": "Analiz", "yazar_bilgileri": {}, "alinti_onerileri": [],
+}
+
+SORU_YANITI = {
+    "konu": "Sahte konu",
+    "sorular": [{"soru_no": i, "tip": "coktan_secmeli", "soru": f"Soru {i}?", "secenekler": ["A", "B", "C", "D"],
+                 "dogru_cevap": "A", "aciklama": "Açıklama"} for i in range(1, 6)],
+    "genel_bilgiler": {"toplam_puan": "100", "sure_tahmini": "15 dakika"},
+}
+
+
+def _ornek(anahtar: str, grup: str, varsayilan):
+    """Profilde bu grup için kayıtlı örnek varsa birini seçer, yoksa varsayilan() döndürür."""
+    ornekler = PROFIL.get(anahtar)
+    if isinstance(ornekler, dict):
+        ornekler = ornekler.get(grup)
+    return _rastgele.choice(ornekler) if ornekler else varsayilan()
+
+
+def _grup(mime_type: str) -> str:
+    mime_type = mime_type or ""
+    if "pdf" in mime_type:
+        return "pdf"
+    return "ses" if mime_type.startswith("audio/") else "video"
+
+
+class SahteHata(Exception):
+    """Gemini istemcisinin kota/sunucu hatalarını taklit eder; mesaj HTTP kodunu içerir."""
+
+    def __init__(self, kod: int, mesaj: str):
+        super().__init__(f"{kod} {mesaj}")
+        self.code = kod
+
+
+class _SahteDosyaDeposu:
+    def __init__(self):
+        self._dosyalar = {}
+        self._kilit = threading.Lock()
+        self.sayaclar = {"yukleme": 0, "silme": 0, "uretim": 0, "hata": 0}
+
+    def ekle(self, dosya):
+        with self._kilit:
+            self._dosyalar[dosya.name] = dosya
+            self.sayaclar["yukleme"] += 1
+
+    def al(self, ad: str):
+        with self._kilit:
+            return self._dosyalar.get(ad)
+
+    def sil(self, ad: str):
+        with self._kilit:
+            self._dosyalar.pop(ad, None)
+            self.sayaclar["silme"] += 1
+
+    def listele(self):
+        with self._kilit:
+            return list(self._dosyalar.values())
+
+
+_depo = _SahteDosyaDeposu()
+
+
+class SahteDosya:
+    def __init__(self, boyut: int, mime_type: str):
+        self.name = f"files/sahte-{uuid.uuid4().hex[:12]}"
+        self.mime_type = mime_type
+        self.size_bytes = boyut
+        self.create_time = datetime.now(timezone.utc)
+        self.error = None
+        self._hazir_zamani = time.monotonic() + _ornek("isleme_sn", _grup(mime_type), lambda: ISLEME_GECIKMESI)
+
+    @property
+    def state(self):
+        return SimpleNamespace(name="ACTIVE" if time.monotonic() >= self._hazir_zamani else "PROCESSING")
+
+
+def upload_file(path=None, mime_type=None, **kwargs):
+    boyut = os.path.getsize(path)
+    time.sleep(boyut / YUKLEME_HIZI)
+    if _rastgele.random() < YUKLEME_HATA_ORANI:
+        _depo.sayaclar["hata"] += 1
+        raise SahteHata(503, "Service Unavailable (sahte yükleme hatası)")
+    dosya = SahteDosya(boyut, mime_type)
+    _depo.ekle(dosya)
+    return dosya
+
+
+def get_file(name):
+    dosya = _depo.al(name)
+    if dosya is None:
+        raise SahteHata(404, f"File not found: {name}")
+    return dosya
+
+
+def delete_file(name):
+    _depo.sil(name)
+
+
+def list_files(**kwargs):
+    return iter(_depo.listele())
+
+
+class GenerativeModel:
+    def __init__(self, model_name=None, **kwargs):
+        self.model_name = model_name if (model_name or "").startswith("models/") else f"models/{model_name}"
+
+    def generate_content(self, contents, **kwargs):
+        parcalar = contents if isinstance(contents, list) else [contents]
+        metin = " ".join(p for p in parcalar if isinstance(p, str))
+        dosyalar = [p for p in parcalar if isinstance(p, SahteDosya)]
+        dosya_boyutu = sum(d.size_bytes for d in dosyalar)
+        grup = _grup(dosyalar[0].mime_type) if dosyalar else "soru"
+        time.sleep(_ornek("uretim_sn", grup,
+                          lambda: max(0.0, _rastgele.gauss(URETIM_GECIKMESI, URETIM_GECIKMESI * URETIM_SAPMASI))))
+        _depo.sayaclar["uretim"] += 1
+        if _rastgele.random() < URETIM_HATA_ORANI:
+            _depo.sayaclar["hata"] += 1
+            raise _rastgele.choice([SahteHata(429, "Resource has been exhausted (sahte kota hatası)"),
+                                 SahteHata(503, "The model is overloaded (sahte sunucu hatası)")])
+        yanit = SORU_YANITI if "soru" in metin.lower() and "sorular" in metin else OZET_YANITI
+        yanit_metni = json.dumps(yanit, ensure_ascii=False)
+        return SimpleNamespace(
+            text=yanit_metni,
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=len(metin) // 4 + int(dosya_boyutu * TOKEN_ORANI),
+                candidates_token_count=len(yanit_metni) // 4,
+            ),
+        )
+
+
+class SahteYoutubeDL:
+    """yt_dlp.YoutubeDL yerine geçer: bilgi çıkarma anında, indirme SAHTE_INDIRME_HIZI_MBPS hızında."""
+
+    def __init__(self, secenekler=None):
+        self.secenekler = secenekler or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def extract_info(self, url, download=False):
+        return {"title": f"Sahte video {url[-11:]}", "uploader": "sahte", "duration": 600, "view_count": 0}
+
+    def download(self, urller):
+        sablon = self.secenekler.get("outtmpl", "%(id)s.%(ext)s")
+        if isinstance(sablon, dict):
+            sablon = sablon.get("default")
+        hedef = sablon.replace("%(ext)s", "mp4")
+        boyut = int(_ornek("video_boyutlari", None, lambda: VIDEO_BOYUTU))
+        # Gerçek yt-dlp gibi .part dosyasına yazar ve ilerleme kancalarını çağırır (iptal kancada yükselir)
+        with open(hedef + ".part", "wb") as f:
+            # Her videonun içeriği farklı olsun; aynı içerik depoda tekilleşmesin
+            f.write(os.urandom(min(boyut, 64 * 1024)))
+            f.truncate(boyut)
+        adim = max(boyut // 20, 1)
+        for inen in range(0, boyut, adim):
+            time.sleep(min(adim, boyut - inen) / INDIRME_HIZI)
+            for kanca in self.secenekler.get("progress_hooks", []):
+                kanca({"status": "downloading", "downloaded_bytes": inen, "total_bytes": boyut, "filename": hedef})
+        os.replace(hedef + ".part", hedef)
+        return 0
+
+
+async def sahte_search_web(query, max_results=5):
+    await asyncio.sleep(_ornek("arama_sn", None, lambda: ARAMA_GECIKMESI))
+    return [{"title": f"Sonuç {i}", "snippet": query, "link": f"https://ornek.com/{i}", "date": ""}
+            for i in range(max_results)]
+
+
+def sayaclar() -> dict:
+    return dict(_depo.sayaclar)
+
+
+def kur():
+    """Sahteleri yerleştirir. app.tools içe aktarılmadan önce ya da sonra çağrılabilir."""
+    import google.generativeai as genai
+    import yt_dlp
+
+    genai.configure = lambda **kwargs: None
+    genai.upload_file = upload_file
+    genai.get_file = get_file
+    genai.delete_file = delete_file
+    genai.list_files = list_files
+    genai.GenerativeModel = GenerativeModel
+    yt_dlp.YoutubeDL = SahteYoutubeDL
+
+    from app.tools import quiz_generator
+    quiz_generator.search_web = sahte_search_web
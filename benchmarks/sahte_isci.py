@@ -0,0 +1,20 @@
+"""
+İş kuyruğu işçisini sahte Gemini/yt-dlp arka ucuyla başlatır; IS_KUYRUGU_AKTIF=1 ile çalışan
+sahte_sunucu'nun kuyruğa bıraktığı işleri yürütür.
+
+    IS_KUYRUGU_AKTIF=1 python -m benchmarks.sahte_sunucu
+    python -m benchmarks.sahte_isci --eszamanlilik 4
+"""
+import asyncio
+
+# Ortam değişkenleri (ortak klasör, iz dosyası, API anahtarı) sahte sunucuyla aynı ayarlanır
+from benchmarks import sahte_sunucu  # noqa: F401
+from benchmarks import sahte_arka_uc  # noqa: E402
+
+
+if __name__ == "__main__":
+    from app.logging_config import loglamayi_kur
+    from app import worker
+    loglamayi_kur()
+    sahte_arka_uc.kur()
+    asyncio.run(worker.ana(worker.arguman_ayristirici().parse_args()))
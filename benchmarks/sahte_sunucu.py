@@ -0,0 +1,34 @@
+"""
+MCP sunucusunu sahte Gemini/yt-dlp/arama arka ucuyla başlatır - gerçek API kotası harcanmaz.
+
+    python -m benchmarks.sahte_sunucu
+
+Gecikme ve hata oranları için benchmarks/sahte_arka_uc.py içindeki SAHTE_* ortam değişkenlerine bakın.
+"""
+import os
+import tempfile
+
+# app.config içe aktarılmadan önce ayarlanmalı
+os.environ.setdefault("GEMINI_API_KEY", "sahte-anahtar")
+os.environ.setdefault("SHARED_UPLOADS_DIR", os.path.join(tempfile.gettempdir(), "edumcp_benchmark_uploads"))
+os.environ.setdefault("IZ_DOSYASI", os.path.join(tempfile.gettempdir(), "edumcp_benchmark_izler", "izler.jsonl"))
+
+from benchmarks import sahte_arka_uc  # noqa: E402
+
+
+def http_uygulamasi():
+    """Çok süreçli çalışmada (SUNUCU_ISCI_SAYISI > 1) her işçide sahte arka ucu kurup uygulamayı üretir."""
+    sahte_arka_uc.kur()
+    from app.server import http_uygulamasi as sunucu_uygulamasi
+    return sunucu_uygulamasi()
+
+
+def main():
+    os.makedirs(os.environ["SHARED_UPLOADS_DIR"], exist_ok=True)
+    sahte_arka_uc.kur()
+    from app.server import calistir
+    calistir(uygulama_fabrikasi="benchmarks.sahte_sunucu:http_uygulamasi")
+
+
+if __name__ == "__main__":
+    main()
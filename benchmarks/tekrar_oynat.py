@@ -0,0 +1,255 @@
+"""
+Kayıtlı üretim trafiğini (TRAFIK_KAYDI_AKTIF=1 ile yazılan JSONL) sahte arka uçlu sunucuya tekrar oynatır.
+
+    # Kayıttan zamanlama profilini çıkar, sahte sunucuyu bu profille başlat ve trafiği kayıttaki
+    # varış aralıklarıyla (burada 10 kat hızlandırılmış) yeniden gönder
+    python -m benchmarks.tekrar_oynat trafik/trafik.jsonl --sunucu-baslat --hiz 10 --cikti tekrar.json
+
+    # Sadece profil çıkar (sunucuyu elle SAHTE_PROFIL=profil.json ile başlatmak için)
+    python -m benchmarks.tekrar_oynat trafik/trafik.jsonl --profil-yaz profil.json
+
+İstekler kayıttaki sırayla ve aralıklarla, yanıt beklenmeden (açık döngü) gönderilir. Aynı dosya/URL/metin
+özetine sahip kayıtlar aynı girdiye eşlenir, böylece önbellek isabetleri ve eşzamanlılık şekli korunur.
+Sonuç dosyası yuk_uretici.py ile aynı biçimdedir; --karsilastir ile önceki tekrar sonucuna göre gerileme aranır.
+"""
+import os
+import sys
+import json
+import time
+import random
+import string
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from collections import defaultdict
+from datetime import datetime
+import httpx
+from fastmcp import Client
+from benchmarks.yuk_uretici import KaynakIzleyici, arac_cagir, dosya_yukle, ozetle, tabloyu_yazdir, karsilastir, yuzdelik
+
+# Dosya parametresinin /upload-file'a hangi file_type ile yükleneceği
+DOSYA_PARAMETRESI_TURU = {
+    "pdf_dosyasi_yolu": "pdf", "pdf_dosyalari": "pdf",
+    "ses_dosyasi_yolu": "audio", "ses_dosyalari": "audio",
+    "video_dosyasi_yolu": "video",
+}
+# Kayıtta boyutu bilinmeyen dosyalar için kullanılan boyut
+VARSAYILAN_DOSYA_BOYUTU = 1024 * 1024
+# gemini_files.islenmesini_bekle durum kontrol aralığı (sn); kayıtlı bekleme süreleri bu çözünürlüktedir
+KONTROL_ARALIGI = 5
+
+
+def kayitlari_oku(dosyalar: list) -> list:
+    kayitlar = []
+    for dosya in dosyalar:
+        with open(dosya, encoding="utf-8") as f:
+            kayitlar.extend(json.loads(satir) for satir in f if satir.strip())
+    return sorted(kayitlar, key=lambda k: k["zaman"])
+
+
+def profil_cikar(kayitlar: list) -> dict:
+    """
+    Kayıtlardaki aşama sürelerinden sahte arka uç profili (bkz. sahte_arka_uc.py, SAHTE_PROFIL) çıkarır.
+
+    İşleme süreleri kayıtta durum kontrol aralığına yuvarlanmış olduğundan her örnekten yarım aralık
+    düşülür; sahte arka uç aynı kontrol döngüsünden geçince kayıttaki bekleme süresine yakın sonuç verir.
+    """
+    uretim, isleme, arama, video_boyutlari = defaultdict(list), defaultdict(list), [], []
+    yukleme_bayt = yukleme_sure = indirme_bayt = indirme_sure = 0.0
+    uretim_sayisi = uretim_hata = yukleme_sayisi = yukleme_hata = 0
+    for kayit in kayitlar:
+        for asama in kayit.get("asamalar", []):
+            sure = asama["sure_ms"] / 1000
+            basarili = asama["sonuc"] == "basarili"
+            if asama["asama"] == "uretim":
+                uretim[asama["arac"]].append(round(sure, 3))
+                uretim_sayisi += 1
+                uretim_hata += not basarili
+            elif asama["asama"] == "isleme_bekleme" and basarili:
+                isleme[asama["arac"]].append(round(max(0.0, sure - KONTROL_ARALIGI / 2), 3))
+            elif asama["asama"] == "yukleme":
+                yukleme_sayisi += 1
+                yukleme_hata += not basarili
+                if basarili and asama.get("dosya_boyutu"):
+                    yukleme_bayt += asama["dosya_boyutu"]
+                    yukleme_sure += sure
+            elif asama["asama"] == "indirme" and basarili and asama.get("dosya_boyutu"):
+                indirme_bayt += asama["dosya_boyutu"]
+                indirme_sure += sure
+                video_boyutlari.append(asama["dosya_boyutu"])
+            elif asama["asama"] == "web_arama":
+                arama.append(round(sure, 3))
+
+    profil = {"uretim_sn": dict(uretim), "isleme_sn": dict(isleme), "arama_sn": arama, "video_boyutlari": video_boyutlari}
+    if yukleme_sure:
+        profil["yukleme_hizi_bps"] = yukleme_bayt / yukleme_sure
+    if indirme_sure:
+        profil["indirme_hizi_bps"] = indirme_bayt / indirme_sure
+    if uretim_sayisi:
+        profil["uretim_hata_orani"] = round(uretim_hata / uretim_sayisi, 4)
+    if yukleme_sayisi:
+        profil["yukleme_hata_orani"] = round(yukleme_hata / yukleme_sayisi, 4)
+    return profil
+
+
+class GirdiEslestirici:
+    """Kayıttaki anonim girdileri (özet anahtarlı) sunucuya gönderilebilir gerçek girdilere çevirir."""
+
+    def __init__(self, http: httpx.AsyncClient, rastgele: random.Random):
+        self.http = http
+        self.rastgele = rastgele
+        self._eslesmeler = {}
+
+    async def _dosya(self, parametre: str, bilgi: dict) -> str:
+        if bilgi["anahtar"] not in self._eslesmeler:
+            self._eslesmeler[bilgi["anahtar"]] = await dosya_yukle(
+                self.http, DOSYA_PARAMETRESI_TURU[parametre], bilgi["uzanti"], bilgi["boyut"] or VARSAYILAN_DOSYA_BOYUTU)
+        return self._eslesmeler[bilgi["anahtar"]]
+
+    def _metin(self, parametre: str, bilgi: dict) -> str:
+        if bilgi["anahtar"] not in self._eslesmeler:
+            if parametre == "video_url":
+                video_kimligi = "".join(self.rastgele.choices(string.ascii_letters + string.digits, k=11))
+                self._eslesmeler[bilgi["anahtar"]] = f"https://youtu.be/{video_kimligi}"
+            else:
+                tohum = f"Tekrar {bilgi['anahtar']} "
+                self._eslesmeler[bilgi["anahtar"]] = (tohum * (bilgi["uzunluk"] // len(tohum) + 1))[:bilgi["uzunluk"]]
+        return self._eslesmeler[bilgi["anahtar"]]
+
+    async def argumanlar(self, parametreler: dict) -> dict:
+        sonuc = {}
+        for ad, deger in parametreler.items():
+            if ad in DOSYA_PARAMETRESI_TURU and isinstance(deger, list):
+                sonuc[ad] = [await self._dosya(ad, d) for d in deger]
+            elif ad in DOSYA_PARAMETRESI_TURU and isinstance(deger, dict):
+                sonuc[ad] = await self._dosya(ad, deger)
+            elif isinstance(deger, dict) and "uzunluk" in deger:
+                sonuc[ad] = self._metin(ad, deger)
+            else:
+                sonuc[ad] = deger
+        return sonuc
+
+
+async def tekrar_oynat(args, kayitlar: list) -> list:
+    """Kayıtları varış aralıklarını koruyarak (hiz ile ölçeklenmiş) gönderir; araç bazında sonuç döndürür."""
+    ilk_zaman = datetime.fromisoformat(kayitlar[0]["zaman"])
+    sonuclar = []
+    async with httpx.AsyncClient(base_url=args.url, timeout=600) as http:
+        eslestirici = GirdiEslestirici(http, random.Random(args.tohum))
+        plan = []
+        for kayit in kayitlar:
+            ofset = (datetime.fromisoformat(kayit["zaman"]) - ilk_zaman).total_seconds() / args.hiz
+            plan.append((ofset, kayit["arac"], await eslestirici.argumanlar(kayit.get("parametreler", {})), kayit))
+
+        olcumler = defaultdict(lambda: {"sureler": [], "hata": 0, "kayitli": []})
+        istemciler = [Client(f"{args.url}/mcp", timeout=600) for _ in range(args.istemci_sayisi)]
+        for istemci in istemciler:
+            await istemci.__aenter__()
+        try:
+            async def gonder(sira: int, ofset: float, arac: str, argumanlar: dict, kayit: dict):
+                await asyncio.sleep(max(0.0, baslangic + ofset - time.perf_counter()))
+                sure, basarili = await arac_cagir(istemciler[sira % len(istemciler)], arac, argumanlar)
+                for anahtar in (arac, "tumu"):
+                    olcum = olcumler[anahtar]
+                    if basarili:
+                        olcum["sureler"].append(sure)
+                    else:
+                        olcum["hata"] += 1
+                    olcum["kayitli"].append(kayit.get("sure_ms", 0) / 1000)
+
+            async with KaynakIzleyici(http) as kaynak:
+                baslangic = time.perf_counter()
+                await asyncio.gather(*(gonder(i, *adim) for i, adim in enumerate(plan)))
+                gecen = time.perf_counter() - baslangic
+        finally:
+            for istemci in istemciler:
+                await istemci.__aexit__(None, None, None)
+
+    for arac, olcum in sorted(olcumler.items(), key=lambda o: (o[0] == "tumu", o[0])):
+        kayitli = sorted(olcum["kayitli"])
+        sonuc = {"senaryo": f"tekrar:{arac}", "eszamanlilik": args.istemci_sayisi}
+        sonuc |= ozetle(olcum["sureler"], olcum["hata"], gecen)
+        sonuc |= {"kayitli_p50_sn": round(yuzdelik(kayitli, 0.50), 3), "kayitli_p95_sn": round(yuzdelik(kayitli, 0.95), 3)}
+        if arac == "tumu":
+            sonuc |= kaynak.rapor()
+        sonuclar.append(sonuc)
+    return sonuclar
+
+
+async def _sunucuyu_bekle(url: str, zaman_asimi: float = 60):
+    son = time.monotonic() + zaman_asimi
+    async with httpx.AsyncClient(base_url=url, timeout=2) as http:
+        while time.monotonic() < son:
+            try:
+                if (await http.get("/metrics")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise TimeoutError(f"Sahte sunucu {zaman_asimi} sn içinde hazır olmadı: {url}")
+
+
+def sahte_sunucuyu_baslat(profil: dict, tohum: str) -> subprocess.Popen:
+    profil_dosyasi = os.path.join(tempfile.mkdtemp(prefix="edumcp_tekrar_"), "profil.json")
+    with open(profil_dosyasi, "w", encoding="utf-8") as f:
+        json.dump(profil, f)
+    ortam = dict(os.environ, SAHTE_PROFIL=profil_dosyasi, SAHTE_TOHUM=str(tohum))
+    return subprocess.Popen([sys.executable, "-m", "benchmarks.sahte_sunucu"], env=ortam)
+
+
+async def ana(args) -> int:
+    kayitlar = kayitlari_oku(args.kayit)
+    if args.sinir:
+        kayitlar = kayitlar[:args.sinir]
+    if not kayitlar:
+        print("Kayıt bulunamadı", file=sys.stderr)
+        return 2
+    profil = profil_cikar(kayitlar)
+    if args.profil_yaz:
+        with open(args.profil_yaz, "w", encoding="utf-8") as f:
+            json.dump(profil, f, ensure_ascii=False, indent=2)
+        return 0
+
+    sunucu = sahte_sunucuyu_baslat(profil, args.tohum) if args.sunucu_baslat else None
+    try:
+        if sunucu:
+            await _sunucuyu_bekle(args.url)
+        sonuclar = await tekrar_oynat(args, kayitlar)
+    finally:
+        if sunucu:
+            sunucu.terminate()
+            sunucu.wait(timeout=30)
+
+    tabloyu_yazdir(sonuclar)
+    if args.cikti:
+        with open(args.cikti, "w", encoding="utf-8") as f:
+            json.dump({"zaman": time.strftime("%Y-%m-%dT%H:%M:%S"), "ayarlar": vars(args), "profil": profil,
+                       "sonuclar": sonuclar}, f, ensure_ascii=False, indent=2)
+    if args.karsilastir:
+        gerilemeler = karsilastir(sonuclar, args.karsilastir, args.tolerans)
+        for gerileme in gerilemeler:
+            print(f"GERİLEME: {gerileme}", file=sys.stderr)
+        if gerilemeler:
+            return 1
+    return 0
+
+
+def arguman_ayristirici() -> argparse.ArgumentParser:
+    ayristirici = argparse.ArgumentParser(description="edumcp trafik tekrar oynatıcı")
+    ayristirici.add_argument("kayit", nargs="+", help="Trafik kayıt dosyaları (JSONL, dönen yedekler dahil)")
+    ayristirici.add_argument("--url", default="http://localhost:8000", help="Sunucu kök adresi")
+    ayristirici.add_argument("--hiz", type=float, default=1.0, help="Zaman ölçeği; 10 = kayıttan 10 kat hızlı")
+    ayristirici.add_argument("--sinir", type=int, default=0, help="Oynatılacak en fazla kayıt (0: tümü)")
+    ayristirici.add_argument("--istemci-sayisi", type=int, default=8, help="İsteklerin dağıtılacağı MCP oturumu sayısı")
+    ayristirici.add_argument("--tohum", default="0", help="Girdi eşleme ve sahte arka uç için rastgele tohum")
+    ayristirici.add_argument("--sunucu-baslat", action="store_true", help="Kayıttan çıkan profille sahte sunucuyu başlat")
+    ayristirici.add_argument("--profil-yaz", help="Sadece sahte arka uç profilini bu dosyaya yaz ve çık")
+    ayristirici.add_argument("--cikti", help="Sonuçların yazılacağı JSON dosyası")
+    ayristirici.add_argument("--karsilastir", help="Karşılaştırılacak önceki sonuç dosyası")
+    ayristirici.add_argument("--tolerans", type=float, default=0.15, help="İzin verilen kötüleşme oranı")
+    return ayristirici
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(ana(arguman_ayristirici().parse_args())))
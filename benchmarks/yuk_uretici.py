@@ -0,0 +1,278 @@
+"""
+MCP araçlarını streamable-http üzerinden belirli eşzamanlılık seviyelerinde çağıran yük üreticisi.
+
+Önce sahte arka uçlu sunucuyu başlatın, sonra senaryoları çalıştırın:
+
+    python -m benchmarks.sahte_sunucu
+    python -m benchmarks.yuk_uretici --senaryo pdf,video,karisik --eszamanlilik 1,8,32 --istek-sayisi 64 \
+        --cikti sonuclar.json --karsilastir onceki_sonuclar.json
+
+Her senaryo/eşzamanlılık çifti için p50/p95/p99 gecikme, verim (istek/sn), hata sayısı ve sunucunun
+/metrics uç noktasından okunan CPU süresi ile tepe bellek kullanımı raporlanır. --karsilastir ile verilen
+önceki sonuçlara göre p95 gecikme veya verim --tolerans oranından fazla kötüleşirse çıkış kodu 1 olur.
+"""
+import io
+import os
+import sys
+import json
+import time
+import re
+import random
+import string
+import asyncio
+import argparse
+import httpx
+from PyPDF2 import PdfWriter
+from fastmcp import Client
+
+SENARYOLAR = ("pdf", "ses", "video", "soru")
+# "karisik" senaryosunda araçların ağırlıkları
+KARISIK_AGIRLIKLAR = {"pdf": 0.4, "ses": 0.2, "video": 0.2, "soru": 0.2}
+DOSYA_TURU = {"pdf": ("pdf", ".pdf"), "ses": ("audio", ".mp3")}
+
+
+def yuzdelik(degerler: list, oran: float) -> float:
+    """En yakın sıra yöntemiyle yüzdelik değer (degerler sıralı olmalı)."""
+    if not degerler:
+        return 0.0
+    sira = max(0, min(len(degerler) - 1, int(round(oran * len(degerler) + 0.5)) - 1))
+    return degerler[sira]
+
+
+def ozetle(sureler: list, hatalar: int, gecen: float) -> dict:
+    sirali = sorted(sureler)
+    return {
+        "istek": len(sureler) + hatalar,
+        "basarili": len(sureler),
+        "hata": hatalar,
+        "p50_sn": round(yuzdelik(sirali, 0.50), 3),
+        "p95_sn": round(yuzdelik(sirali, 0.95), 3),
+        "p99_sn": round(yuzdelik(sirali, 0.99), 3),
+        "ortalama_sn": round(sum(sirali) / len(sirali), 3) if sirali else 0.0,
+        "verim_istek_sn": round((len(sureler) + hatalar) / gecen, 3) if gecen else 0.0,
+        "sure_sn": round(gecen, 3),
+    }
+
+
+def _metrikleri_ayristir(metin: str) -> dict:
+    degerler = {}
+    for satir in metin.splitlines():
+        if not satir or satir.startswith("#"):
+            continue
+        seri, _, deger = satir.rpartition(" ")
+        # Çok süreçli sunucuda süreç metrikleri isci="<pid>" etiketiyle gelir; işçiler toplanır
+        ad, _, etiketler = seri.partition("{")
+        if etiketler and not re.fullmatch(r'isci="\d+"}', etiketler):
+            continue
+        try:
+            degerler[ad] = degerler.get(ad, 0.0) + float(deger)
+        except ValueError:
+            pass
+    return degerler
+
+
+class KaynakIzleyici:
+    """Senaryo boyunca sunucunun /metrics çıktısını örnekleyip CPU süresi ve tepe belleği hesaplar."""
+
+    def __init__(self, http: httpx.AsyncClient, aralik: float = 0.5):
+        self.http = http
+        self.aralik = aralik
+        self.tepe_bellek = 0.0
+        self.tepe_thread = 0.0
+        self._ilk = None
+        self._son = None
+        self._gorev = None
+
+    async def _oku(self):
+        try:
+            yanit = await self.http.get("/metrics")
+            degerler = _metrikleri_ayristir(yanit.text)
+        except httpx.HTTPError:
+            return None
+        self.tepe_bellek = max(self.tepe_bellek, degerler.get("edumcp_islem_bellek_bayt", 0.0))
+        self.tepe_thread = max(self.tepe_thread, degerler.get("edumcp_islem_thread_sayisi", 0.0))
+        return degerler
+
+    async def _dongu(self):
+        while True:
+            await asyncio.sleep(self.aralik)
+            await self._oku()
+
+    async def __aenter__(self):
+        self._ilk = await self._oku()
+        self._gorev = asyncio.create_task(self._dongu())
+        return self
+
+    async def __aexit__(self, *args):
+        self._gorev.cancel()
+        self._son = await self._oku()
+
+    def rapor(self) -> dict:
+        if not self._ilk or not self._son:
+            return {}
+        return {
+            "cpu_sn": round(self._son.get("edumcp_islem_cpu_saniye_toplam", 0) - self._ilk.get("edumcp_islem_cpu_saniye_toplam", 0), 3),
+            "tepe_bellek_mb": round(self.tepe_bellek / 1024 / 1024, 1),
+            "tepe_thread": int(self.tepe_thread),
+        }
+
+
+def _ornek_pdf(dolgu: bytes) -> bytes:
+    """Ön planlayıcının okuyabileceği tek sayfalık geçerli bir PDF; boyut ek dosya olarak gömülen dolguyla ayarlanır."""
+    yazici = PdfWriter()
+    yazici.add_blank_page(612, 792)
+    yazici.add_attachment("dolgu.bin", dolgu)
+    cikti = io.BytesIO()
+    yazici.write(cikti)
+    return cikti.getvalue()
+
+
+async def dosya_yukle(http: httpx.AsyncClient, dosya_turu: str, uzanti: str, boyut: int) -> str:
+    """Benzersiz içerikli bir dosyayı /upload-file ile depoya yükler, araçlara verilecek adı döndürür."""
+    # Başta rastgele baytlar içerik özetini benzersiz yapar, kalanı sıfırla doldurulur
+    icerik = os.urandom(min(boyut, 4096)) + bytes(max(0, boyut - 4096))
+    if uzanti == ".pdf":
+        icerik = _ornek_pdf(icerik)
+    yanit = await http.post("/upload-file", params={"file_type": dosya_turu, "filename": f"yuk{uzanti}"},
+                            content=icerik, headers={"Content-Type": "application/octet-stream"})
+    yanit.raise_for_status()
+    return yanit.json()["file_path"]
+
+
+def _video_kimligi() -> str:
+    return "".join(random.choices(string.ascii_letters + string.digits, k=11))
+
+
+async def istekleri_hazirla(http: httpx.AsyncClient, senaryo: str, adet: int, boyutlar: dict, onbellek_orani: float) -> list:
+    """Her isteğin (araç adı, argümanlar) çiftini hazırlar; giriş dosyaları zamanlama dışında yüklenir."""
+    istekler = []
+    onceki = {}
+    for i in range(adet):
+        tur = senaryo if senaryo != "karisik" else random.choices(list(KARISIK_AGIRLIKLAR), list(KARISIK_AGIRLIKLAR.values()))[0]
+        if tur in onceki and random.random() < onbellek_orani:
+            istekler.append(onceki[tur])
+            continue
+        if tur == "pdf":
+            istek = ("pdf_ozetle", {"pdf_dosyasi_yolu": await dosya_yukle(http, *DOSYA_TURU["pdf"], boyutlar["pdf"]), "ozet_tipi": "kapsamli"})
+        elif tur == "ses":
+            istek = ("ses_dosyasini_transkript_et", {"ses_dosyasi_yolu": await dosya_yukle(http, *DOSYA_TURU["ses"], boyutlar["ses"]), "cikti_tipi": "ozet"})
+        elif tur == "video":
+            istek = ("videoyu_ozetle", {"video_url": f"https://youtu.be/{_video_kimligi()}", "ozet_tipi": "kapsamli"})
+        else:
+            istek = ("soru_olustur", {"konu": f"Yük testi konusu {i}", "soru_sayisi": 5, "web_arama": True})
+        onceki[tur] = istek
+        istekler.append(istek)
+    return istekler
+
+
+async def arac_cagir(istemci: Client, arac: str, argumanlar: dict):
+    """Aracı çağırır; (süre, başarılı mı) döndürür. Araç hataları JSON'daki durum alanından okunur."""
+    baslangic = time.perf_counter()
+    try:
+        sonuc = await istemci.call_tool(arac, argumanlar)
+        metin = sonuc.content[0].text if sonuc.content else ""
+        basarili = json.loads(metin).get("durum") == "Başarılı"
+    except Exception:
+        basarili = False
+    return time.perf_counter() - baslangic, basarili
+
+
+async def senaryoyu_calistir(mcp_url: str, istekler: list, eszamanlilik: int) -> dict:
+    """İstekleri eszamanlilik kadar bağımsız MCP istemcisiyle (ayrı oturumlar) tüketir."""
+    kuyruk = asyncio.Queue()
+    for istek in istekler:
+        kuyruk.put_nowait(istek)
+    sureler, hatalar = [], 0
+
+    async def isci():
+        nonlocal hatalar
+        async with Client(mcp_url, timeout=600) as istemci:
+            while not kuyruk.empty():
+                arac, argumanlar = kuyruk.get_nowait()
+                sure, basarili = await arac_cagir(istemci, arac, argumanlar)
+                if basarili:
+                    sureler.append(sure)
+                else:
+                    hatalar += 1
+
+    baslangic = time.perf_counter()
+    await asyncio.gather(*(isci() for _ in range(eszamanlilik)))
+    return ozetle(sureler, hatalar, time.perf_counter() - baslangic)
+
+
+def tabloyu_yazdir(sonuclar: list):
+    basliklar = ("senaryo", "eszamanlilik", "istek", "hata", "p50_sn", "p95_sn", "p99_sn", "verim_istek_sn", "cpu_sn", "tepe_bellek_mb")
+    print(" | ".join(f"{b:>14}" for b in basliklar))
+    for s in sonuclar:
+        print(" | ".join(f"{str(s.get(b, '-')):>14}" for b in basliklar))
+
+
+def karsilastir(sonuclar: list, onceki_dosya: str, tolerans: float) -> list:
+    """Önceki çalıştırmaya göre p95 gecikmesi artan veya verimi düşen senaryoları döndürür."""
+    with open(onceki_dosya, encoding="utf-8") as f:
+        onceki = {(s["senaryo"], s["eszamanlilik"]): s for s in json.load(f)["sonuclar"]}
+    gerilemeler = []
+    for s in sonuclar:
+        eski = onceki.get((s["senaryo"], s["eszamanlilik"]))
+        if not eski:
+            continue
+        if eski["p95_sn"] and s["p95_sn"] > eski["p95_sn"] * (1 + tolerans):
+            gerilemeler.append(f"{s['senaryo']}@{s['eszamanlilik']}: p95 {eski['p95_sn']} → {s['p95_sn']} sn")
+        if eski["verim_istek_sn"] and s["verim_istek_sn"] < eski["verim_istek_sn"] * (1 - tolerans):
+            gerilemeler.append(f"{s['senaryo']}@{s['eszamanlilik']}: verim {eski['verim_istek_sn']} → {s['verim_istek_sn']} istek/sn")
+    return gerilemeler
+
+
+def _liste(deger: str) -> list:
+    return [p.strip() for p in deger.split(",") if p.strip()]
+
+
+async def ana(args) -> int:
+    senaryolar = _liste(args.senaryo)
+    for senaryo in senaryolar:
+        if senaryo not in SENARYOLAR + ("karisik",):
+            print(f"Bilinmeyen senaryo: {senaryo}", file=sys.stderr)
+            return 2
+    boyutlar = {"pdf": int(args.pdf_boyutu_mb * 1024 * 1024), "ses": int(args.ses_boyutu_mb * 1024 * 1024)}
+    sonuclar = []
+    async with httpx.AsyncClient(base_url=args.url, timeout=600) as http:
+        for senaryo in senaryolar:
+            for eszamanlilik in (int(e) for e in _liste(args.eszamanlilik)):
+                istekler = await istekleri_hazirla(http, senaryo, args.istek_sayisi, boyutlar, args.onbellek_orani)
+                async with KaynakIzleyici(http) as kaynak:
+                    sonuc = await senaryoyu_calistir(f"{args.url}/mcp", istekler, eszamanlilik)
+                sonuc = {"senaryo": senaryo, "eszamanlilik": eszamanlilik} | sonuc | kaynak.rapor()
+                sonuclar.append(sonuc)
+                print(json.dumps(sonuc, ensure_ascii=False), file=sys.stderr)
+
+    tabloyu_yazdir(sonuclar)
+    if args.cikti:
+        with open(args.cikti, "w", encoding="utf-8") as f:
+            json.dump({"zaman": time.strftime("%Y-%m-%dT%H:%M:%S"), "ayarlar": vars(args), "sonuclar": sonuclar},
+                      f, ensure_ascii=False, indent=2)
+    if args.karsilastir:
+        gerilemeler = karsilastir(sonuclar, args.karsilastir, args.tolerans)
+        for gerileme in gerilemeler:
+            print(f"GERİLEME: {gerileme}", file=sys.stderr)
+        if gerilemeler:
+            return 1
+    return 0
+
+
+def arguman_ayristirici() -> argparse.ArgumentParser:
+    ayristirici = argparse.ArgumentParser(description="edumcp yük üreticisi")
+    ayristirici.add_argument("--url", default="http://localhost:8000", help="Sunucu kök adresi")
+    ayristirici.add_argument("--senaryo", default="pdf,ses,video,soru,karisik", help="Virgülle ayrılmış senaryolar")
+    ayristirici.add_argument("--eszamanlilik", default="1,8,32", help="Virgülle ayrılmış eşzamanlılık seviyeleri")
+    ayristirici.add_argument("--istek-sayisi", type=int, default=32, help="Her senaryo/seviye için istek sayısı")
+    ayristirici.add_argument("--pdf-boyutu-mb", type=float, default=2)
+    ayristirici.add_argument("--ses-boyutu-mb", type=float, default=8)
+    ayristirici.add_argument("--onbellek-orani", type=float, default=0.0, help="Aynı girdiyi tekrar kullanan isteklerin oranı")
+    ayristirici.add_argument("--cikti", help="Sonuçların yazılacağı JSON dosyası")
+    ayristirici.add_argument("--karsilastir", help="Karşılaştırılacak önceki sonuç dosyası")
+    ayristirici.add_argument("--tolerans", type=float, default=0.15, help="İzin verilen kötüleşme oranı")
+    return ayristirici
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(ana(arguman_ayristirici().parse_args())))
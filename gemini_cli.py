@@ -4,12 +4,15 @@ import time
 import json
 import asyncio
 import hashlib
+import anyio
+import httpx
 from dotenv import load_dotenv
 
 # --- 3p SDK'ler --------------------------------------------------------------
 from google import genai                         # Google Gemini SDK
 from google.genai import types
 from fastmcp import Client                       # MCP istemcisi
+from fastmcp.client.messages import MessageHandler
 # -----------------------------------------------------------------------------
 
 load_dotenv()
@@ -26,11 +29,127 @@ if not GEMINI_API_KEY or not MCP_URL:
 # Gemini istemcisi (asenkron API'ye ihtiyacımız var → .aio alt-modülü)
 gemini = genai.Client(api_key=GEMINI_API_KEY)
 
-# Uzak MCP sunucusuna bağlanacak FastMCP istemcisi
-mcp_client = Client(
-    MCP_URL
-    # token yoksa BearerAuth'ı atlamak için koşullu ekle
-    )
+SOHBET_MODELI = "gemini-2.5-pro"
+OZET_MODELI   = "gemini-2.5-flash"            # eski turların arka planda özetlenmesi için
+
+# Geçmiş bu kadar girdi token'ını aşınca eski turlar özetlenir; son GECMIS_KORUNAN_TUR tur aynen kalır
+GECMIS_TOKEN_BUTCESI = int(os.getenv("GECMIS_TOKEN_BUTCESI", "32000"))
+GECMIS_KORUNAN_TUR   = int(os.getenv("GECMIS_KORUNAN_TUR", "4"))
+# Sistem promptu, araç tanımları ve özetin Gemini tarafında önbellekte tutulma süresi (sn)
+ISTEM_ONBELLEK_SURESI = int(os.getenv("ISTEM_ONBELLEK_SURESI", "3600"))
+
+# Bir kullanıcı mesajında modelin art arda yapabileceği en fazla araç çağrısı turu
+MAKS_ARAC_TURU = 10
+# Araç çağrısı sürerken MCP oturumunun hâlâ açık olduğunun kontrol edilme aralığı (sn)
+OTURUM_KONTROL_ARALIGI = 1
+
+
+class _AracListesiIzleyici(MessageHandler):
+    """Sunucu araç listesinin değiştiğini bildirince önbelleği geçersiz kılar."""
+
+    def __init__(self, oturum):
+        self.oturum = oturum
+
+    async def on_tool_list_changed(self, message):
+        self.oturum.araclar_onbellegi = None
+
+
+# Yeniden bağlanmayı gerektiren taşıma hataları; araç ve protokol hataları yeniden denenmez
+BAGLANTI_HATALARI = (ConnectionError, httpx.TransportError, anyio.ClosedResourceError, anyio.BrokenResourceError)
+
+
+class McpOturumu:
+    """
+    Sohbet boyunca açık kalan tek MCP oturumu.
+
+    Oturum ilk kullanımda açılır ve tüm mesajlarda yeniden kullanılır; bağlantı koparsa (sunucu yeniden
+    başladı, oturum sona erdi) bir sonraki çağrıda yeniden kurulur. Araç listesi bir kez alınır ve yalnızca
+    sunucu araç listesi değişti bildirimi gönderince ya da yeniden bağlanınca tazelenir.
+
+    Araç çağrıları eşzamanlı yürüdüğü için bağlanma bir kilitle korunur; her bağlantıya artan bir numara
+    verilir ve kopan bağlantıyı yalnızca o numarayı hâlâ güncel gören ilk çağrı yeniden kurar.
+    """
+
+    def __init__(self, url: str):
+        # token yoksa BearerAuth'ı atlamak için koşullu ekle
+        self.istemci = Client(url, message_handler=_AracListesiIzleyici(self))
+        self.araclar_onbellegi = None
+        self._kilit = asyncio.Lock()
+        self._baglanti_no = 0
+
+    async def baglan(self) -> int:
+        """Oturum kapalıysa açar; kullanılan bağlantının numarasını döndürür."""
+        async with self._kilit:
+            if not self.istemci.is_connected():
+                await self._ac()
+            return self._baglanti_no
+
+    async def _yeniden_baglan(self, baglanti_no: int):
+        async with self._kilit:
+            # Başka bir çağrı aynı kopuşu fark edip yeniden bağlandıysa o bağlantı kullanılır
+            if self._baglanti_no == baglanti_no:
+                await self._ac()
+
+    async def _ac(self):
+        await self._sifirla()
+        await self.istemci.__aenter__()
+        self.araclar_onbellegi = None
+        self._baglanti_no += 1
+
+    async def _sifirla(self):
+        # Kopmuş oturumun kalıntılarını temizler; oturumu düşüren hata zaten bilindiği için yeniden yükseltilmez
+        try:
+            await self.istemci.close()
+        except Exception:
+            pass
+
+    async def _oturumda(self, cagri):
+        """
+        `cagri` oturum açık kaldığı sürece beklenir. Oturum düşerse (ör. yeniden başlayan sunucu eski oturum
+        kimliğini reddeder) yanıtı hiç gelmeyecek çağrı iptal edilir ve ConnectionError yükseltilir.
+        """
+        gorev = asyncio.ensure_future(cagri)
+        try:
+            while not gorev.done():
+                await asyncio.wait({gorev}, timeout=OTURUM_KONTROL_ARALIGI)
+                if not gorev.done() and not self.istemci.is_connected():
+                    raise ConnectionError("MCP oturumu kapandı")
+            return gorev.result()
+        finally:
+            gorev.cancel()
+
+    async def araclar(self) -> list:
+        """Sunucunun araçları, Gemini araç tanımı olarak (list[types.Tool])."""
+        if self.araclar_onbellegi is None:
+            mcp_araclari = await self._yeniden_denenerek(self.istemci.list_tools)
+            self.araclar_onbellegi = [types.Tool(function_declarations=[
+                types.FunctionDeclaration(name=arac.name, description=arac.description,
+                                          parameters_json_schema=arac.inputSchema)
+                for arac in mcp_araclari
+            ])]
+        return self.araclar_onbellegi
+
+    async def arac_cagir(self, ad: str, argumanlar: dict):
+        """Aracı çağırır (mcp.types.CallToolResult); araç hataları yükseltilmez, sonuçta isError ile döner."""
+        return await self._yeniden_denenerek(lambda: self.istemci.call_tool_mcp(ad, argumanlar))
+
+    async def _yeniden_denenerek(self, fonksiyon):
+        # Bağlantı hatasında bir kez yeniden bağlanıp tekrar dener. Aynı araç çağrısının tekrarı sunucuda
+        # yürüyen özdeş işe katılır ya da onun kontrol noktasından devam eder.
+        baglanti_no = await self.baglan()
+        try:
+            return await self._oturumda(fonksiyon())
+        except BAGLANTI_HATALARI as e:
+            print(f"[MCP bağlantısı koptu, yeniden bağlanılıyor: {e}]")
+            await self._yeniden_baglan(baglanti_no)
+            return await self._oturumda(fonksiyon())
+
+    async def kapat(self):
+        await self._sifirla()
+
+
+# Uzak MCP sunucusuna bağlanacak, sohbet boyunca açık kalan oturum
+mcp_oturumu = McpOturumu(MCP_URL)
 
 MCP = {
     "type": "url",
@@ -45,50 +164,199 @@ Eğitim Asistanısın. Kullanıcının sorusuna cevap ver. gerekli toolları ça
 
 """
 
+# --------------------------- Araç Çağrıları ---------------------------------
+async def arac_yaniti(cagri):
+    """
+    Modelin istediği aracı MCP üzerinden çağırır ve sonucu Gemini fonksiyon yanıtına çevirir. Araç
+    çalışırken ve bitince kullanıcıya bir durum satırı yazılır.
+    """
+    print(f"  [{cagri.name} çalışıyor...]", flush=True)
+    baslangic = time.time()
+    try:
+        sonuc = await mcp_oturumu.arac_cagir(cagri.name, dict(cagri.args or {}))
+        metin = "\n".join(getattr(parca, "text", "") for parca in sonuc.content)
+        yanit = {"error": metin} if sonuc.isError else {"result": metin}
+    except Exception as e:
+        yanit = {"error": str(e)}
+    durum = "hata verdi" if "error" in yanit else "tamamlandı"
+    print(f"  [{cagri.name} {durum}, {time.time() - baslangic:.1f} sn]", flush=True)
+    return types.Part.from_function_response(name=cagri.name, response=yanit)
+
+# --------------------------- Konuşma Geçmişi --------------------------------
+class GecmisYoneticisi:
+    """
+    Konuşma geçmişini token bütçesinde tutar.
+
+    Son istekteki girdi token'ı GECMIS_TOKEN_BUTCESI'ni aşınca, son GECMIS_KORUNAN_TUR tur dışındaki
+    turlar arka planda OZET_MODELI ile özetlenir. Yanıt özetin bitmesini beklemez; özet hazır olunca
+    sonraki istekler kısalmış geçmişle gider.
+
+    Sistem promptu, araç tanımları ve özet her istekte aynı kalan önekti. Bu önek Gemini tarafında
+    önbelleğe (cached content) alınır; yalnızca özet ya da araç listesi değişince yeniden oluşturulur.
+    Model önbellek için fazla kısa bulursa önek normal istekle gönderilir. Sabit önek Gemini'nin
+    örtük önbelleğinden de yararlanır.
+    """
+
+    def __init__(self, sistem_promptu: str, token_butcesi: int = GECMIS_TOKEN_BUTCESI,
+                 korunan_tur: int = GECMIS_KORUNAN_TUR):
+        self.sistem_promptu = sistem_promptu
+        self.token_butcesi = token_butcesi
+        self.korunan_tur = max(korunan_tur, 1)
+        self.ozet = ""
+        self.mesajlar = []          # özetlenmemiş turlar: {"role": "user"/"assistant", "content": ...}
+        self._ozetleme = None
+        self._onbellek = None       # (önek anahtarı, önbellek adı ya da None, geçerlilik sonu)
+
+    def ekle(self, rol: str, icerik: str):
+        self.mesajlar.append({"role": rol, "content": icerik})
+
+    def geri_al(self):
+        """Yanıtsız kalan son kullanıcı mesajını geçmişten çıkarır."""
+        self.mesajlar.pop()
+
+    def icerikler(self) -> list:
+        return [
+            types.Content(role="model" if msg["role"] == "assistant" else "user", parts=[types.Part(text=msg["content"])])
+            for msg in self.mesajlar
+        ]
+
+    def _sistem_talimati(self) -> str:
+        if not self.ozet:
+            return self.sistem_promptu
+        return f"{self.sistem_promptu}\n\nÖNCEKİ KONUŞMANIN ÖZETİ:\n{self.ozet}"
+
+    async def yapilandirma(self, araclar: list, **ayarlar) -> types.GenerateContentConfig:
+        """Sabit öneki önbellekten (yoksa istekte) taşıyan istek yapılandırması."""
+        sistem = self._sistem_talimati()
+        anahtar = hashlib.sha256(json.dumps([sistem, [t.model_dump(mode="json") for t in araclar]],
+                                            sort_keys=True).encode()).hexdigest()
+        if self._onbellek is None or self._onbellek[0] != anahtar or self._onbellek[2] < time.time() + 60:
+            await self._onbellegi_birak()
+            try:
+                onbellek = await gemini.aio.caches.create(
+                    model=SOHBET_MODELI,
+                    config=types.CreateCachedContentConfig(
+                        system_instruction=sistem, tools=araclar, ttl=f"{ISTEM_ONBELLEK_SURESI}s",
+                        display_name="egitim-asistani"),
+                )
+                self._onbellek = (anahtar, onbellek.name, time.time() + ISTEM_ONBELLEK_SURESI)
+            except Exception:
+                # Önek önbellek alt sınırının altında (ya da önbellek kullanılamıyor); bu önek için tekrar denenmez
+                self._onbellek = (anahtar, None, time.time() + ISTEM_ONBELLEK_SURESI)
+        if self._onbellek[1] is not None:
+            return types.GenerateContentConfig(cached_content=self._onbellek[1], **ayarlar)
+        return types.GenerateContentConfig(system_instruction=sistem, tools=araclar, **ayarlar)
+
+    async def _onbellegi_birak(self):
+        if self._onbellek is not None and self._onbellek[1] is not None:
+            try:
+                await gemini.aio.caches.delete(name=self._onbellek[1])
+            except Exception:
+                pass
+        self._onbellek = None
+
+    def kullanim_kaydet(self, kullanim):
+        """Son isteğin girdi token sayısı bütçeyi aştıysa eski turların özetlenmesini başlatır."""
+        token = getattr(kullanim, "prompt_token_count", None) or 0
+        if token <= self.token_butcesi or (self._ozetleme is not None and not self._ozetleme.done()):
+            return
+        kesim = len(self.mesajlar) - 2 * self.korunan_tur
+        # Kalan geçmiş kullanıcı mesajıyla başlamalı
+        while kesim > 0 and self.mesajlar[kesim]["role"] != "user":
+            kesim -= 1
+        if kesim > 0:
+            self._ozetleme = asyncio.create_task(self._ozetle(kesim))
+
+    async def _ozetle(self, kesim: int):
+        eski = self.mesajlar[:kesim]
+        dokum = "\n".join(f"{'Asistan' if msg['role'] == 'assistant' else 'Kullanıcı'}: {msg['content']}" for msg in eski)
+        istem = (
+            "Aşağıdaki eğitim asistanı konuşmasını, sonraki yanıtlar için gereken her şeyi koruyarak özetle: "
+            "kullanıcının hedefleri ve seviyesi, işlenen konular, verilen önemli cevaplar, kullanılan dosya adları "
+            "ve araç sonuçlarından çıkan bilgiler, açık kalan sorular. Sadece özeti yaz.\n\n"
+            + (f"ÖNCEKİ ÖZET:\n{self.ozet}\n\n" if self.ozet else "")
+            + f"KONUŞMA:\n{dokum}"
+        )
+        try:
+            yanit = await gemini.aio.models.generate_content(model=OZET_MODELI, contents=istem,
+                                                             config=types.GenerateContentConfig(temperature=0.2))
+        except Exception as e:
+            print(f"\n[Geçmiş özetlenemedi: {e}]")
+            return
+        if not yanit.text:
+            return
+        # Özetlenirken eklenen mesajlar korunur; yalnızca özetlenen baştaki turlar düşülür
+        self.ozet = yanit.text.strip()
+        self.mesajlar = self.mesajlar[kesim:]
+
+    async def kapat(self):
+        if self._ozetleme is not None:
+            self._ozetleme.cancel()
+        await self._onbellegi_birak()
+
 # --------------------------- Ana LLM Çağrısı ---------------------------------
-async def ai_chat(messages, system_prompt):
+async def ai_chat(gecmis):
     """
     Gemini + MCP ile sohbet
     """
     try:
-        # 1) MCP oturumunu aç → session otomatik keşif + araç çağrıları
-        async with mcp_client:
-            # 2) Mesajları Gemini formatında düzenle
-            content_list = []
-            
-            # Sistem promptu ilk kullanıcı mesajıyla birleştir
-            if messages:
-                first_user_msg = messages[0]["content"]
-                system_with_user = f"{system_prompt}\n\nKullanıcı: {first_user_msg}"
-                content_list.append(
-                    types.Content(role="user", parts=[types.Part(text=system_with_user)])
-                )
-                
-                # Geri kalan mesajları ekle
-                for msg in messages[1:]:
-                    role = "model" if msg["role"] == "assistant" else "user"
-                    content_list.append(
-                        types.Content(role=role, parts=[types.Part(text=msg["content"])])
-                    )
-
-            # 3) Gemini'ye istek gönder
-            response = await gemini.aio.models.generate_content(
-                model="gemini-2.5-pro",
+        # 1) Açık MCP oturumundan önbellekteki araç listesini al (ilk mesajda bağlanır ve keşfeder)
+        araclar = await mcp_oturumu.araclar()
+
+        # 2) Özetlenmemiş turları Gemini formatında düzenle; sistem promptu, araçlar ve eski turların
+        #    özeti her istekte aynı kalan önektedir (mümkünse Gemini önbelleğinden)
+        content_list = gecmis.icerikler()
+
+        ayarlar = dict(
+            automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True),
+            max_output_tokens=8192*2,
+            temperature=0.5,
+        )
+
+        # 3) Gemini'ye akışlı istek gönder ve metni geldikçe yaz; model araç isterse açık oturum üzerinden
+        #    çağırıp sonucu geri ver
+        print("Eğitim Asistanı: ", end="", flush=True)
+        content_out = ""
+        satir_acik = True           # imleç "Eğitim Asistanı: " satırında
+        for tur in range(MAKS_ARAC_TURU):
+            # Yapılandırma her turda alınır: uzun bir araç çağrısı sırasında süresi dolan önbellek yenilenir
+            config = await gecmis.yapilandirma(araclar, **ayarlar)   # araçlar: MCP araç tanımları (her istekte yeniden keşif yapılmaz)
+            model_parcalari, cagrilar, kullanim = [], [], None
+            async for parca in await gemini.aio.models.generate_content_stream(
+                model=SOHBET_MODELI,
                 contents=content_list,
-                config=types.GenerateContentConfig(
-                    tools=[mcp_client.session],   # MCP araç listesini ekle
-                    max_output_tokens=8192*2, 
-                    temperature=0.5,
-                )
-            )
+                config=config,
+            ):
+                kullanim = parca.usage_metadata or kullanim
+                aday = parca.candidates[0] if parca.candidates else None
+                for part in (aday.content.parts or []) if aday and aday.content else []:
+                    model_parcalari.append(part)
+                    if part.function_call:
+                        cagrilar.append(part.function_call)
+                    elif part.text and not part.thought:
+                        if not satir_acik:
+                            print("Eğitim Asistanı: ", end="", flush=True)
+                            satir_acik = True
+                        print(part.text, end="", flush=True)
+                        content_out += part.text
+            if tur == 0:
+                # Geçmişin boyu ilk istekle ölçülür; tur içindeki araç sonuçları geçmişe yazılmaz
+                gecmis.kullanim_kaydet(kullanim)
+            if not cagrilar:
+                break
+            print()
+            satir_acik = False
+            # Modelin aynı turda istediği araçlar birlikte çalıştırılır
+            content_list.append(types.Content(role="model", parts=model_parcalari))
+            content_list.append(types.Content(role="user", parts=list(
+                await asyncio.gather(*(arac_yaniti(cagri) for cagri in cagrilar))
+            )))
 
-            print("Eğitim Asistanı: ", end="", flush=True)
-            content_out = response.text if response.text else ""
-            print(content_out)
-            return content_out.strip()
+        print()
+        return content_out.strip()
 
     except Exception as e:
-        print(f"Hata oluştu: {e}")
+        print(f"\nHata oluştu: {e}")
         return ""
 
 # --------------------------- CLI Yardımcıları --------------------------------
@@ -122,7 +390,7 @@ KRİTİK KURALLAR:
 - Sonuç yoksa sadece "Bulunamadı" de
 """
     
-    messages = []
+    gecmis = GecmisYoneticisi(system_message_with_id)
     
     # İlk hoşgeldin mesajı
     print("Eğitim Asistanı: Merhaba! Size nasıl yardımcı olabilirim? ")
@@ -130,23 +398,24 @@ KRİTİK KURALLAR:
     
     while True:
         try:
-            user_input = input("Kullanıcı: ").strip()
+            # input() thread'de beklenir ki açık MCP oturumu (bildirimler, bağlantı) arka planda işlemeye devam etsin
+            user_input = (await asyncio.to_thread(input, "Kullanıcı: ")).strip()
             if user_input.lower() == "/çıkış":
                 print("Uygulamadan çıkılıyor...")
                 break
             if not user_input:
                 continue
                 
-            messages.append({"role": "user", "content": user_input})
-            answer = await ai_chat(messages, system_message_with_id)
+            gecmis.ekle("user", user_input)
+            answer = await ai_chat(gecmis)
             
             # Gelen yanıt boşsa (örneğin API veri döndürmediyse) mesaj listesine ekleme
             if answer and answer.strip():
-                messages.append({"role": "assistant", "content": answer})
+                gecmis.ekle("assistant", answer)
             else:
                 print("Asistan'dan boş yanıt geldi. Lütfen sorunuzu tekrar deneyin.")
                 # Boş yanıtları mesaj geçmişine ekleme
-                messages.pop()  # Son kullanıcı mesajını da geri al
+                gecmis.geri_al()  # Son kullanıcı mesajını da geri al
                 
         except (EOFError, KeyboardInterrupt):
             print("\nUygulamadan çıkılıyor...")
@@ -154,5 +423,8 @@ KRİTİK KURALLAR:
         except Exception as e:
             print(f"Hata: {e}")
 
+    await gecmis.kapat()
+    await mcp_oturumu.kapat()
+
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,12 +1,8 @@
-import logging
-import asyncio
-from app.server import main
+from app.server import calistir
 
 
 # 5. MCP SUNUCUSUNU BAŞLATMA
 # -----------------------------------------------------------------------------
 if __name__ == "__main__":
-    from app.tools import *
-    
-    # FastMCP sunucusunu çalıştır
-    asyncio.run(main())
\ No newline at end of file
+    # FastMCP sunucusunu çalıştır (SUNUCU_ISCI_SAYISI > 1 ise çok süreçli)
+    calistir()